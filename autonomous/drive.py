@@ -1,17 +1,34 @@
-from magicbot import AutonomousStateMachine, timed_state, tunable
+from magicbot import AutonomousStateMachine, state
 
 from components.chassis import Chassis
+from controllers.trajectory_follower import TrajectoryFollower
 from utilities.game import is_red
+from utilities.trajectory import get_trajectory, load_trajectories
 
 
 class Drive(AutonomousStateMachine):
     MODE_NAME = "Drive Forward"
 
     chassis_component: Chassis
+    trajectory_follower: TrajectoryFollower
 
-    vx = tunable(2.0)
+    def setup(self) -> None:
+        # Map the trajectories now rather than in the first loop of the match
+        load_trajectories()
 
-    @timed_state(first=True, duration=1.0)
-    def driving(self) -> None:
-        vx = -self.vx if is_red() else self.vx
-        self.chassis_component.drive_field(vx, 0, 0)
+    @state(first=True)
+    def driving(self, initial_call: bool) -> None:
+        if initial_call:
+            trajectory = get_trajectory("drive_forward", is_red())
+            if trajectory is None:
+                self.done()
+                return
+            self.trajectory_follower.follow(
+                trajectory.shifted_to(self.chassis_component.get_pose())
+            )
+        if self.trajectory_follower.is_finished():
+            self.done()
+
+    def done(self) -> None:
+        super().done()
+        self.trajectory_follower.stop()
@@ -1,9 +1,11 @@
-from magicbot import AutonomousStateMachine, state, timed_state, tunable
+from magicbot import AutonomousStateMachine, state
 
 from components.chassis import Chassis
 from components.shooter import Shooter
 from controllers.shooter import ShooterController
+from controllers.trajectory_follower import TrajectoryFollower
 from utilities.game import is_red
+from utilities.trajectory import get_trajectory, load_trajectories
 
 
 class ShootDrive(AutonomousStateMachine):
@@ -12,8 +14,11 @@ class ShootDrive(AutonomousStateMachine):
     chassis_component: Chassis
     shooter_component: Shooter
     shooter_controller: ShooterController
+    trajectory_follower: TrajectoryFollower
 
-    vx = tunable(2.0)
+    def setup(self) -> None:
+        # Map the trajectories now rather than in the first loop of the match
+        load_trajectories()
 
     @state(first=True)
     def shooting(self) -> None:
@@ -24,7 +29,19 @@ class ShootDrive(AutonomousStateMachine):
         ):
             self.next_state(self.driving)
 
-    @timed_state(duration=1.0)
-    def driving(self) -> None:
-        vx = -self.vx if is_red() else self.vx
-        self.chassis_component.drive_field(vx, 0, 0)
+    @state
+    def driving(self, initial_call: bool) -> None:
+        if initial_call:
+            trajectory = get_trajectory("drive_forward", is_red())
+            if trajectory is None:
+                self.done()
+                return
+            self.trajectory_follower.follow(
+                trajectory.shifted_to(self.chassis_component.get_pose())
+            )
+        if self.trajectory_follower.is_finished():
+            self.done()
+
+    def done(self) -> None:
+        super().done()
+        self.trajectory_follower.stop()
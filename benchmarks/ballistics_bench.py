@@ -0,0 +1,84 @@
+"""
+Compare the cost of solving ballistics with the lookup tables.
+
+Run with `python -m benchmarks.ballistics_bench`.
+"""
+import math
+import timeit
+
+import numpy as np
+from wpimath.geometry import Pose2d, Translation3d
+
+from components.turret import Turret
+from utilities.ballistics import calculate_ballistics, calculate_ballistics_batch
+from utilities.functions import constrain_angle, interpolate
+from utilities.game import FIELD_LENGTH, FIELD_WIDTH
+
+
+def legacy_calculate_ballistics(
+    robot_pose: Pose2d, target_position: Translation3d
+) -> tuple[float, float, float, float, float]:
+    """The high goal solve as it was before the tables were precompiled."""
+    turret_trans = (
+        robot_pose.translation()
+        + Turret.TRANSLATION3D.toTranslation2d().rotateBy(robot_pose.rotation())
+    )
+    dy = target_position.y - turret_trans.y
+    dx = target_position.x - turret_trans.x
+    distance = math.hypot(dy, dx)
+    turret_angle = constrain_angle(math.atan2(dy, dx) - robot_pose.rotation().radians())
+    ranges = [0.0, 1.5, 2.0, 3.0, 5.0, 5.01]
+    angles = [
+        math.radians(45),
+        math.radians(30),
+        math.radians(30),
+        math.radians(30),
+        math.radians(30),
+        math.radians(30),
+    ]
+    top_speeds = [27.5, 27.5, 30.0, 35.0, 50.0, 0.0]
+    bottom_speeds = [22.5, 22.5, 25.0, 30.0, 50.0, 0.0]
+    return (
+        turret_angle,
+        interpolate(distance, ranges, angles),
+        interpolate(distance, ranges, top_speeds),
+        interpolate(distance, ranges, bottom_speeds),
+        distance,
+    )
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    count = 10_000
+    poses = np.column_stack(
+        (
+            rng.uniform(0, FIELD_LENGTH, count),
+            rng.uniform(0, FIELD_WIDTH, count),
+            rng.uniform(-math.pi, math.pi, count),
+        )
+    )
+    pose_objs = [Pose2d(x, y, heading) for x, y, heading in poses]
+    target = Translation3d(1.0, 2.0, 0.9)
+
+    def run_legacy() -> None:
+        for pose in pose_objs:
+            legacy_calculate_ballistics(pose, target)
+
+    def run_single() -> None:
+        for pose in pose_objs:
+            calculate_ballistics(pose, target)
+
+    def run_batch() -> None:
+        calculate_ballistics_batch(poses, (target.x, target.y, target.z))
+
+    for name, func in (
+        ("legacy per-pose", run_legacy),
+        ("table per-pose", run_single),
+        ("table batch", run_batch),
+    ):
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name:>16}: {seconds / count * 1e6:8.3f} us/pose")
+
+
+if __name__ == "__main__":
+    main()
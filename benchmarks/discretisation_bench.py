@@ -0,0 +1,97 @@
+"""
+Compare how far the robot drifts from a straight line when translating
+while rotating with no skew correction, the old fudge factor, and the pose
+exponential discretisation.
+
+Each loop the commanded field relative velocity is converted to robot
+relative speeds from the true heading, corrected, and then held by the
+modules for a loop period, starting after an actuation latency.
+
+Run with `python -m benchmarks.discretisation_bench`.
+"""
+import math
+from typing import Callable
+
+from wpimath.geometry import Pose2d, Rotation2d, Translation2d, Twist2d
+from wpimath.kinematics import ChassisSpeeds
+
+from utilities.functions import discretise_speeds
+
+LOOP_PERIOD = 0.02  # s
+SUBSTEPS = 20
+DURATION = 2.0  # s
+LATENCIES = (0.0, 0.02, 0.1)  # s
+
+# Field relative vx, vy (m/s) and omega (rad/s)
+MANOEUVRES = (
+    (2.0, 0.0, 3.0),
+    (3.0, 1.0, 6.0),
+    (1.0, 0.0, 10.0),
+)
+
+Correction = Callable[[ChassisSpeeds, float], ChassisSpeeds]
+
+
+def no_correction(speeds: ChassisSpeeds, latency: float) -> ChassisSpeeds:
+    return speeds
+
+
+def fudge(speeds: ChassisSpeeds, latency: float) -> ChassisSpeeds:
+    """The correction Chassis.execute used to make, scaled by trial in sim."""
+    translation = Translation2d(speeds.vx, speeds.vy).rotateBy(
+        Rotation2d(-speeds.omega * 5 * LOOP_PERIOD)
+    )
+    return ChassisSpeeds(translation.x, translation.y, speeds.omega)
+
+
+def discretise(speeds: ChassisSpeeds, latency: float) -> ChassisSpeeds:
+    return discretise_speeds(speeds, LOOP_PERIOD, latency)
+
+
+CORRECTIONS: dict[str, Correction] = {
+    "none": no_correction,
+    "fudge": fudge,
+    "discretise": discretise,
+}
+
+
+def drift(
+    manoeuvre: tuple[float, float, float], correction: Correction, latency: float
+) -> float:
+    """Distance (m) between where the robot ends up and where it should be."""
+    vx, vy, omega = manoeuvre
+    pose = Pose2d()
+    dt = LOOP_PERIOD / SUBSTEPS
+    latency_steps = round(latency / dt)
+    # Commands waiting to take effect, one per substep
+    pending = [ChassisSpeeds()] * latency_steps
+    speeds = ChassisSpeeds()
+
+    for step in range(round(DURATION / dt)):
+        if step % SUBSTEPS == 0:
+            command = correction(
+                ChassisSpeeds.fromFieldRelativeSpeeds(vx, vy, omega, pose.rotation()),
+                latency,
+            )
+        pending.append(command)
+        speeds = pending.pop(0)
+        pose = pose.exp(Twist2d(speeds.vx * dt, speeds.vy * dt, speeds.omega * dt))
+
+    moving_time = DURATION - latency_steps * dt
+    return math.hypot(pose.x - vx * moving_time, pose.y - vy * moving_time)
+
+
+def main() -> None:
+    for latency in LATENCIES:
+        print(f"actuation latency {latency * 1000:.0f} ms, drift after {DURATION} s:")
+        for manoeuvre in MANOEUVRES:
+            drifts = ", ".join(
+                f"{name} {drift(manoeuvre, correction, latency) * 100:5.1f} cm"
+                for name, correction in CORRECTIONS.items()
+            )
+            vx, vy, omega = manoeuvre
+            print(f"  ({vx}, {vy}) m/s at {omega} rad/s: {drifts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare the accuracy of the poses estimated from each tag on its own with
+those estimated from every tag in a frame together, over simulated frames
+of the tags on a grid seen with realistic noise.
+
+Run with `python -m benchmarks.multi_tag_bench`.
+"""
+from __future__ import annotations
+
+import math
+from typing import NamedTuple
+
+import numpy as np
+from photonvision import PhotonTrackedTarget
+from wpimath.geometry import (
+    Pose2d,
+    Pose3d,
+    Rotation2d,
+    Rotation3d,
+    Transform3d,
+    Translation3d,
+)
+
+from components.vision import estimate_poses_from_apriltag
+from utilities.game import apriltag_layout
+from utilities.multi_tag import estimate_multi_tag_pose
+
+ROBOT_TO_CAMERA = Transform3d(Translation3d(0.05, 0, 0.83), Rotation3d())
+TAG_IDS = (6, 7, 8)
+
+
+def simulate_target(
+    robot_pose: Pose2d,
+    tag_id: int,
+    rng: np.random.Generator,
+    range_noise: float = 0.01,
+    rotation_noise: float = math.radians(4),
+) -> PhotonTrackedTarget:
+    """
+    A target seen from a robot pose. Like real tag detections, the distance
+    to the tag is measured much better than which way it faces.
+    """
+    camera = Pose3d(robot_pose).transformBy(ROBOT_TO_CAMERA)
+    tag = apriltag_layout.getTagPose(tag_id)
+    assert tag is not None
+    camera_to_target = Transform3d(camera, tag)
+    translation = camera_to_target.translation()
+    translation = translation * (1 + rng.normal(0, range_noise))
+    rotation = camera_to_target.rotation().rotateBy(
+        Rotation3d(*rng.normal(0, rotation_noise, 3))
+    )
+    noisy = Transform3d(translation, rotation)
+    yaw = -math.degrees(math.atan2(translation.y, translation.x))
+    return PhotonTrackedTarget(yaw, 0.0, 1.0, 0.0, tag_id, noisy, noisy, 0.1, [], [])
+
+
+class Accuracy(NamedTuple):
+    measurements: int
+    # RMS distance (m) and heading error (rad) from the true poses
+    translation_error: float
+    heading_error: float
+
+
+def rms(errors: list[float]) -> float:
+    return math.sqrt(float(np.mean(np.square(errors))))
+
+
+def compare_accuracy(frames: int = 100, seed: int = 2) -> tuple[Accuracy, Accuracy]:
+    """
+    The accuracy of the single tag and the multi-tag poses estimated from
+    simulated frames of tags 6, 7 and 8, from around the blue grid.
+    """
+    rng = np.random.default_rng(seed)
+    camera_to_robot = ROBOT_TO_CAMERA.inverse()
+    single_errors = []
+    single_heading_errors = []
+    multi_errors = []
+    multi_heading_errors = []
+    for _ in range(frames):
+        robot_pose = Pose2d(
+            rng.uniform(2.5, 4.0),
+            rng.uniform(1.5, 3.5),
+            Rotation2d(math.pi + rng.uniform(-0.3, 0.3)),
+        )
+        targets = [simulate_target(robot_pose, tag_id, rng) for tag_id in TAG_IDS]
+
+        for target in targets:
+            poses = estimate_poses_from_apriltag(camera_to_robot, target)
+            assert poses is not None
+            best_pose = poses[0]
+            single_errors.append(
+                best_pose.translation().distance(robot_pose.translation())
+            )
+            single_heading_errors.append(
+                abs((best_pose.rotation() - robot_pose.rotation()).radians())
+            )
+
+        estimate = estimate_multi_tag_pose(camera_to_robot, targets)
+        assert estimate is not None
+        multi_errors.append(
+            estimate.pose.translation().distance(robot_pose.translation())
+        )
+        multi_heading_errors.append(
+            abs((estimate.pose.rotation() - robot_pose.rotation()).radians())
+        )
+
+    return (
+        Accuracy(len(single_errors), rms(single_errors), rms(single_heading_errors)),
+        Accuracy(len(multi_errors), rms(multi_errors), rms(multi_heading_errors)),
+    )
+
+
+def main() -> None:
+    single, multi = compare_accuracy()
+    print("RMS error of poses estimated from simulated frames of three tags:")
+    for name, accuracy in (("single tag", single), ("multi-tag", multi)):
+        print(
+            f"  {name:>10}: {accuracy.translation_error:.3f} m,"
+            f" {accuracy.heading_error:.3f} rad"
+            f" from {accuracy.measurements} measurements"
+        )
+
+
+if __name__ == "__main__":
+    main()
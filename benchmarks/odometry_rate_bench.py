@@ -0,0 +1,109 @@
+"""
+Measure how far swerve odometry drifts from the true pose at different
+update rates during fast manoeuvres.
+
+The robot follows a weaving, spinning path simulated in fine steps,
+and odometry only sees the gyro and module positions at its update rate,
+as it would when sampled from the main loop or the odometry thread.
+
+Run with `python -m benchmarks.odometry_rate_bench`.
+"""
+import math
+
+import numpy as np
+from wpimath.geometry import Pose2d, Rotation2d, Translation2d, Twist2d
+from wpimath.kinematics import (
+    ChassisSpeeds,
+    SwerveDrive4Kinematics,
+    SwerveDrive4Odometry,
+    SwerveModulePosition,
+)
+
+from components.chassis import Chassis
+
+SIM_RATE = 1000  # Hz
+DURATION = 10.0  # s
+RATES = (50, 100, 200, 250)  # Hz
+
+MODULE_TRANSLATIONS = [
+    Translation2d(Chassis.WHEEL_BASE / 2, Chassis.TRACK_WIDTH / 2),
+    Translation2d(-Chassis.WHEEL_BASE / 2, Chassis.TRACK_WIDTH / 2),
+    Translation2d(-Chassis.WHEEL_BASE / 2, -Chassis.TRACK_WIDTH / 2),
+    Translation2d(Chassis.WHEEL_BASE / 2, -Chassis.TRACK_WIDTH / 2),
+]
+
+
+def commanded_speeds(t: float) -> ChassisSpeeds:
+    """Field relative speeds of a fast weaving path while spinning."""
+    return ChassisSpeeds(
+        3.0 * math.cos(0.8 * t),
+        2.5 * math.sin(1.7 * t),
+        4.0 * math.sin(0.6 * t),
+    )
+
+
+def simulate(rates: tuple[int, ...]) -> dict[int, tuple[float, float]]:
+    """
+    Drive the path, returning the final and maximum position error (m)
+    of odometry updated at each rate.
+    """
+    kinematics = SwerveDrive4Kinematics(*MODULE_TRANSLATIONS)
+    true_pose = Pose2d()
+    distances = np.zeros(4)
+    angles = np.zeros(4)
+
+    def positions() -> (
+        tuple[
+            SwerveModulePosition,
+            SwerveModulePosition,
+            SwerveModulePosition,
+            SwerveModulePosition,
+        ]
+    ):
+        m0, m1, m2, m3 = (
+            SwerveModulePosition(d, Rotation2d(a)) for d, a in zip(distances, angles)
+        )
+        return m0, m1, m2, m3
+
+    odometries = {
+        rate: SwerveDrive4Odometry(kinematics, Rotation2d(), positions())
+        for rate in rates
+    }
+    errors: dict[int, list[float]] = {rate: [] for rate in rates}
+
+    dt = 1 / SIM_RATE
+    for step in range(1, int(DURATION * SIM_RATE) + 1):
+        t = step * dt
+        field_speeds = commanded_speeds(t)
+        speeds = ChassisSpeeds.fromFieldRelativeSpeeds(
+            field_speeds, true_pose.rotation()
+        )
+        states = kinematics.toSwerveModuleStates(speeds)
+        for i, state in enumerate(states):
+            distances[i] += state.speed * dt
+            angles[i] = state.angle.radians()
+        true_pose = true_pose.exp(
+            Twist2d(speeds.vx * dt, speeds.vy * dt, speeds.omega * dt)
+        )
+
+        for rate, odometry in odometries.items():
+            if step % (SIM_RATE // rate) == 0:
+                odometry.update(true_pose.rotation(), *positions())
+                errors[rate].append(
+                    odometry.getPose().translation().distance(true_pose.translation())
+                )
+
+    return {rate: (errors[rate][-1], max(errors[rate])) for rate in rates}
+
+
+def main() -> None:
+    print(f"{DURATION:.0f} s of weaving and spinning, up to 3 m/s and 4 rad/s")
+    for rate, (final, worst) in simulate(RATES).items():
+        print(
+            f"{rate:>4} Hz: final error {final * 100:6.2f} cm,"
+            f" max error {worst * 100:6.2f} cm"
+        )
+
+
+if __name__ == "__main__":
+    main()
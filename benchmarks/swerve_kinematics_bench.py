@@ -0,0 +1,76 @@
+"""
+Compare the time Chassis.execute takes with wpimath's kinematics and the
+vectorised kinematics, and the time to evaluate many chassis speed
+commands offline with each.
+
+Run with `python -m benchmarks.swerve_kinematics_bench`.
+"""
+import logging
+import timeit
+
+import numpy as np
+import wpilib
+from magicbot.magic_tunable import setup_tunables
+from wpimath.kinematics import ChassisSpeeds
+
+from components.chassis import Chassis
+from components.turret import ITurret
+from utilities import loop_cache, swerve_kinematics
+from utilities.telemetry import FieldPublisher
+
+COMMANDS = 10000
+
+
+def make_chassis() -> Chassis:
+    chassis = Chassis()
+    chassis.control_loop_wait_time = 0.02
+    chassis.field_publisher = FieldPublisher(wpilib.Field2d())
+    chassis.logger = logging.getLogger("chassis")
+    chassis.data_log = wpilib.DataLogManager.getLog()
+    chassis.turret_component = ITurret()
+    setup_tunables(chassis, "chassis")
+    chassis.setup()
+    return chassis
+
+
+def time_execute(chassis: Chassis, vectorised: bool) -> float:
+    """Mean time (s) for one call to execute."""
+    chassis.vectorised_kinematics = vectorised
+    rng = np.random.default_rng(0)
+    commands = rng.uniform(-3, 3, (200, 3)).tolist()
+
+    def execute() -> None:
+        for command in commands:
+            loop_cache.start_iteration(0.0)
+            chassis.drive_local(*command)
+            chassis.execute()
+
+    return min(timeit.repeat(execute, number=1, repeat=5)) / len(commands)
+
+
+def main() -> None:
+    chassis = make_chassis()
+    for vectorised in (False, True):
+        name = "vectorised" if vectorised else "wpimath"
+        print(f"execute ({name}): {time_execute(chassis, vectorised) * 1e6:.1f} us")
+
+    commands = np.random.default_rng(0).uniform(-3, 3, (COMMANDS, 3))
+
+    def wpimath_batch() -> None:
+        for vx, vy, omega in commands.tolist():
+            chassis.kinematics.desaturateWheelSpeeds(
+                chassis.kinematics.toSwerveModuleStates(ChassisSpeeds(vx, vy, omega)),
+                chassis.max_wheel_speed,
+            )
+
+    def vectorised_batch() -> None:
+        speeds, _ = chassis.swerve_kinematics.to_module_states(commands)
+        swerve_kinematics.desaturate(speeds, chassis.max_wheel_speed)
+
+    for name, batch in (("wpimath", wpimath_batch), ("vectorised", vectorised_batch)):
+        elapsed = min(timeit.repeat(batch, number=1, repeat=3))
+        print(f"{COMMANDS} module states ({name}): {elapsed * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
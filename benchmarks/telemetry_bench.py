@@ -0,0 +1,68 @@
+"""
+Compare the time spent per loop publishing poses to the Field2d directly
+every loop, as the robot used to, with the FieldPublisher.
+
+Run with `python -m benchmarks.telemetry_bench`.
+"""
+import math
+import time
+
+import wpilib
+from wpimath.geometry import Pose2d, Rotation2d, Translation2d
+
+from utilities.telemetry import FieldPublisher
+
+LOOPS = 500
+LOOP_PERIOD = 0.02  # s
+NAMES = ("fused_pose", "target", "turret") + tuple(f"s_module_{i}" for i in range(4))
+
+
+def poses(loop: int, moving: bool) -> list[Pose2d]:
+    t = loop * LOOP_PERIOD if moving else 0.0
+    return [
+        Pose2d(Translation2d(2 + math.cos(t) + i, 3 + math.sin(t)), Rotation2d(t))
+        for i in range(len(NAMES))
+    ]
+
+
+def time_direct(field: wpilib.Field2d, moving: bool) -> tuple[float, int]:
+    """Mean time (s) per loop, and the number of poses sent."""
+    objects = [field.getObject(name) for name in NAMES]
+    elapsed = 0.0
+    for loop in range(LOOPS):
+        loop_poses = poses(loop, moving)
+        start = time.perf_counter()
+        for obj, pose in zip(objects, loop_poses):
+            obj.setPose(pose)
+        elapsed += time.perf_counter() - start
+    return elapsed / LOOPS, LOOPS * len(NAMES)
+
+
+def time_publisher(field: wpilib.Field2d, moving: bool) -> tuple[float, int]:
+    """Mean time (s) per loop, and the number of poses sent."""
+    publisher = FieldPublisher(field)
+    elapsed = 0.0
+    sent = 0
+    for loop in range(LOOPS):
+        loop_poses = poses(loop, moving)
+        start = time.perf_counter()
+        for name, pose in zip(NAMES, loop_poses):
+            publisher.set_pose(name, pose)
+        sent += publisher.publish(loop * LOOP_PERIOD)
+        elapsed += time.perf_counter() - start
+    return elapsed / LOOPS, sent
+
+
+def main() -> None:
+    for moving in (False, True):
+        state = "moving" if moving else "stationary"
+        direct, direct_sent = time_direct(wpilib.Field2d(), moving)
+        published, published_sent = time_publisher(wpilib.Field2d(), moving)
+        print(
+            f"{state}: direct {direct * 1e6:.1f} us/loop ({direct_sent} poses sent),"
+            f" publisher {published * 1e6:.1f} us/loop ({published_sent} poses sent)"
+        )
+
+
+if __name__ == "__main__":
+    main()
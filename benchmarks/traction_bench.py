@@ -0,0 +1,109 @@
+"""
+Compare the fixed module acceleration limit with the traction controller's
+adaptive limits, accelerating the robot in a straight line on surfaces
+with more and less grip.
+
+The wheels follow their rate limited setpoints closely, but the robot can
+only accelerate as fast as friction allows; beyond that the wheels slip,
+and odometry from them runs ahead of the robot.
+
+Run with `python -m benchmarks.traction_bench`.
+"""
+from __future__ import annotations
+
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+from components.chassis import Chassis, SwerveModule
+from utilities.traction import GRAVITY, TractionController
+
+LOOP_PERIOD = 0.02  # s
+SUBSTEPS = 10
+DURATION = 2.0  # s
+TARGET_SPEED = 4.0  # m/s
+# Time constant (s) of the drive motors' velocity control
+WHEEL_TIME_CONSTANT = 0.04
+IMU_NOISE = 0.3  # m/s^2
+ENCODER_NOISE = 0.02  # m/s
+
+# Most acceleration before the wheels slip, as a fraction of gravity
+SURFACES = {
+    "grippy carpet": 1.8,
+    "worn carpet": 1.1,
+    "pushing": 0.7,
+}
+
+MODULE_TRANSLATIONS = [
+    (x * Chassis.WHEEL_BASE / 2, y * Chassis.TRACK_WIDTH / 2)
+    for x, y in ((1, 1), (-1, 1), (-1, -1), (1, -1))
+]
+
+
+class Result(NamedTuple):
+    # Time (s) for the robot to reach 95% of the target speed
+    time_to_speed: float
+    # Distance (m) between where odometry thinks the robot is and where it is
+    odometry_error: float
+
+
+def drive_straight(friction: float, adaptive: bool, seed: int = 0) -> Result:
+    rng = np.random.default_rng(seed)
+    traction = TractionController(
+        MODULE_TRANSLATIONS, initial_limit=SwerveModule.accel_limit
+    )
+    modules = len(MODULE_TRANSLATIONS)
+    limits = np.full(modules, float(SwerveModule.accel_limit))
+    setpoints = np.zeros(modules)
+    wheel_speeds = np.zeros(modules)
+    robot_speed = 0.0
+    acceleration = 0.0
+    distance = 0.0
+    odometry = 0.0
+    time_to_speed = math.inf
+    max_acceleration = friction * GRAVITY
+    dt = LOOP_PERIOD / SUBSTEPS
+
+    for loop in range(round(DURATION / LOOP_PERIOD)):
+        if adaptive:
+            limits = traction.update(
+                wheel_speeds + rng.normal(0, ENCODER_NOISE, modules),
+                acceleration + rng.normal(0, IMU_NOISE),
+                0.0,
+                LOOP_PERIOD,
+            )
+        setpoints = np.minimum(setpoints + limits * LOOP_PERIOD, TARGET_SPEED)
+
+        start_speed = robot_speed
+        for _ in range(SUBSTEPS):
+            wheel_speeds += (setpoints - wheel_speeds) * (dt / WHEEL_TIME_CONSTANT)
+            change = wheel_speeds.mean() - robot_speed
+            robot_speed += math.copysign(
+                min(abs(change), max_acceleration * dt), change
+            )
+            distance += robot_speed * dt
+            odometry += wheel_speeds.mean() * dt
+        acceleration = (robot_speed - start_speed) / LOOP_PERIOD
+
+        if robot_speed >= TARGET_SPEED * 0.95 and math.isinf(time_to_speed):
+            time_to_speed = (loop + 1) * LOOP_PERIOD
+
+    return Result(time_to_speed, abs(odometry - distance))
+
+
+def main() -> None:
+    print(f"accelerating to {TARGET_SPEED} m/s, odometry error after {DURATION} s:")
+    for surface, friction in SURFACES.items():
+        results = ", ".join(
+            f"{name} {result.time_to_speed:.2f} s {result.odometry_error * 100:5.1f} cm"
+            for name, result in (
+                ("fixed", drive_straight(friction, adaptive=False)),
+                ("adaptive", drive_straight(friction, adaptive=True)),
+            )
+        )
+        print(f"  {surface} ({friction} g): {results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare the time to aim of the fixed turret flip rules and the flip planner
+from random robot poses and turret states.
+
+Run with `python -m benchmarks.turret_flip_bench`.
+"""
+import math
+
+import numpy as np
+from wpimath.geometry import Pose2d
+from wpimath.trajectory import TrapezoidProfileRadians
+
+from components.tilt import MAX_ANGLE
+from components.turret import Turret
+from utilities.ballistics import calculate_ballistics
+from utilities.flip_planner import FlipPlanner
+from utilities.game import (
+    FIELD_WIDTH,
+    GoalHeight,
+    GridColumn,
+    find_closest_grid_tag_id,
+    get_goal_position,
+)
+
+
+def legacy_flip(
+    turret_angle: float, tilt_angle: float, current_turret_angle: float
+) -> tuple[float, float]:
+    """The fixed flip rules ShooterController used before the planner."""
+    if turret_angle < Turret.NEGATIVE_SOFT_LIMIT_ANGLE:
+        turret_angle += math.pi
+        tilt_angle = -tilt_angle
+    if turret_angle > Turret.POSITIVE_SOFT_LIMIT_ANGLE:
+        turret_angle -= math.pi
+        tilt_angle = -tilt_angle
+    if turret_angle > math.pi / 2.0 and current_turret_angle < 0.0:
+        turret_angle -= math.pi
+        tilt_angle = -tilt_angle
+    if turret_angle < -math.pi / 2.0 and current_turret_angle > 0.0:
+        turret_angle += math.pi
+        tilt_angle = -tilt_angle
+    return turret_angle, tilt_angle
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    trials = 5000
+    # Time to aim is all we care about here, so choose on time alone
+    planner = FlipPlanner(hysteresis=0.0)
+
+    legacy_times = []
+    planner_times = []
+    for _ in range(trials):
+        pose = Pose2d(
+            rng.uniform(1.5, 6.0),
+            rng.uniform(0.0, FIELD_WIDTH),
+            rng.uniform(-math.pi, math.pi),
+        )
+        target = get_goal_position(
+            find_closest_grid_tag_id(pose), GoalHeight.HIGH, GridColumn.CENTRE
+        )
+        bs = calculate_ballistics(pose, target)
+        turret_state = TrapezoidProfileRadians.State(
+            rng.uniform(
+                Turret.NEGATIVE_SOFT_LIMIT_ANGLE, Turret.POSITIVE_SOFT_LIMIT_ANGLE
+            ),
+            0.0,
+        )
+        # Coming out of recovery, the tilt is raised to its pre-intake angle
+        tilt_state = TrapezoidProfileRadians.State(MAX_ANGLE, 0.0)
+
+        legacy_aim = legacy_flip(bs.turret_angle, bs.tilt_angle, turret_state.position)
+        legacy_times.append(planner.time_to_aim(turret_state, tilt_state, *legacy_aim))
+
+        planned_aim = planner.plan(
+            bs.turret_angle, bs.tilt_angle, turret_state, tilt_state
+        )
+        planner_times.append(
+            planner.time_to_aim(turret_state, tilt_state, *planned_aim)
+        )
+
+    for name, times in (("fixed rules", legacy_times), ("planner", planner_times)):
+        print(
+            f"{name:>12}: mean {np.mean(times):.3f} s,"
+            f" p95 {np.percentile(times, 95):.3f} s,"
+            f" max {np.max(times):.3f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
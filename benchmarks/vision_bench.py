@@ -0,0 +1,157 @@
+"""
+Compare the cost of estimating the single tag poses of a camera frame with
+and without the cached camera transforms and tag poses, and the main loop
+time each frame takes when it's estimated in execute or on the worker thread.
+
+Run with `python -m benchmarks.vision_bench`.
+"""
+import math
+import timeit
+from typing import Optional
+
+import numpy as np
+import wpilib
+from magicbot.magic_tunable import setup_tunables
+from photonvision import PhotonPipelineResult, PhotonTrackedTarget
+from wpimath.geometry import (
+    Pose2d,
+    Pose3d,
+    Rotation2d,
+    Rotation3d,
+    Transform3d,
+    Translation3d,
+)
+from wpimath.kinematics import SwerveModulePosition
+
+from components.turret import Turret
+from components.vision import VisualLocaliser, estimate_poses_from_apriltag
+from utilities.camera_transforms import CameraTransformCache
+from utilities.game import apriltag_layout
+from utilities.replay import ReplayChassis, ReplayTurret
+from utilities.telemetry import FieldPublisher
+
+CAMERA_POSITION = Translation3d(0.05, 0.0, 0.53)
+CAMERA_ROTATION = Rotation3d(0, math.radians(-15), 0)
+
+
+def legacy_estimate_poses(
+    cam_to_robot: Transform3d, target: PhotonTrackedTarget
+) -> Optional[tuple[Pose2d, Pose2d, float]]:
+    """A target's poses as they were estimated before the caches."""
+    tag_pose = apriltag_layout.getTagPose(target.getFiducialId())
+    if tag_pose is None:
+        return None
+    best_pose = tag_pose.transformBy(
+        target.getBestCameraToTarget().inverse()
+    ).transformBy(cam_to_robot)
+    alternate_pose = (
+        tag_pose.transformBy(target.getAlternateCameraToTarget().inverse())
+        .transformBy(cam_to_robot)
+        .toPose2d()
+    )
+    return best_pose.toPose2d(), alternate_pose, best_pose.z
+
+
+def legacy_camera_to_robot(turret_angle: float) -> Transform3d:
+    turret_rotation = Rotation3d.fromDegrees(0, 0, math.degrees(turret_angle))
+    camera_rotation = CAMERA_ROTATION.rotateBy(turret_rotation)
+    camera_position = CAMERA_POSITION.rotateBy(turret_rotation) + Turret.TRANSLATION3D
+    return Transform3d(camera_position, camera_rotation).inverse()
+
+
+class BenchCamera:
+    """A new frame of the given targets every time it's asked for."""
+
+    def __init__(self, targets: list[PhotonTrackedTarget]) -> None:
+        self.targets = targets
+
+    def getLatestResult(self) -> PhotonPipelineResult:
+        result = PhotonPipelineResult(0.0, self.targets)
+        result.setTimestamp(wpilib.Timer.getFPGATimestamp())
+        return result
+
+
+def compare_main_loop(targets: list[PhotonTrackedTarget], count: int) -> None:
+    """
+    Time the main loop's share of each frame: polling and estimating as
+    well as filtering it in execute, or only filtering the frames the
+    worker thread has already estimated.
+    """
+    chassis = ReplayChassis()
+    chassis.update(
+        wpilib.Timer.getFPGATimestamp(),
+        Rotation2d(),
+        (SwerveModulePosition(),) * 4,
+    )
+    localiser = VisualLocaliser(
+        "bench",
+        CAMERA_POSITION,
+        CAMERA_ROTATION,
+        FieldPublisher(wpilib.Field2d()),
+        chassis,  # type: ignore[arg-type]
+        ReplayTurret(),  # type: ignore[arg-type]
+    )
+    setup_tunables(localiser, "bench")
+    localiser.camera = BenchCamera(targets)  # type: ignore[assignment]
+    # Adding to the estimator costs the main loop the same either way
+    localiser.add_to_estimator = False
+    localiser.use_multi_tag = False
+
+    def run_inline() -> None:
+        for _ in range(count):
+            if (frame := localiser.poll()) is not None:
+                localiser.process_frame(frame)
+
+    def run_threaded() -> None:
+        for frame in frames:
+            localiser.process_frame(frame)
+
+    frames = [frame for _ in range(count) if (frame := localiser.poll()) is not None]
+    assert len(frames) == count
+    inline = min(timeit.repeat(run_inline, number=1, repeat=10)) / count
+    threaded = min(timeit.repeat(run_threaded, number=1, repeat=10)) / count
+    print(f"{'execute':>8}: {inline * 1e6:8.3f} us/frame of main loop")
+    print(f"{'thread':>8}: {threaded * 1e6:8.3f} us/frame of main loop")
+    print(f"{'saved':>8}: {(inline - threaded) * 1e6:8.3f} us/frame")
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    count = 1000
+    turret_angles = rng.uniform(-1.5, 1.5, count)
+    robot = Pose3d(Pose2d(3.5, 2.7, math.pi))
+    targets = []
+    for tag_id in (6, 7, 8):
+        tag = apriltag_layout.getTagPose(tag_id)
+        assert tag is not None
+        camera_to_target = Transform3d(robot, tag)
+        targets.append(
+            PhotonTrackedTarget(
+                0, 0, 1, 0, tag_id, camera_to_target, camera_to_target, 0, [], []
+            )
+        )
+    cache = CameraTransformCache(CAMERA_POSITION, CAMERA_ROTATION, Turret.TRANSLATION3D)
+
+    def run_legacy() -> None:
+        for turret_angle in turret_angles:
+            camera_to_robot = legacy_camera_to_robot(turret_angle)
+            for target in targets:
+                legacy_estimate_poses(camera_to_robot, target)
+
+    def run_cached() -> None:
+        for turret_angle in turret_angles:
+            camera_to_robot = cache.camera_to_robot(turret_angle)
+            for target in targets:
+                estimate_poses_from_apriltag(camera_to_robot, target)
+
+    # Fill the cache, as a match does within its first few seconds
+    run_cached()
+    for name, func in (("legacy", run_legacy), ("cached", run_cached)):
+        seconds = min(timeit.repeat(func, number=1, repeat=10))
+        print(f"{name:>8}: {seconds / count * 1e6:8.3f} us/frame of {len(targets)}")
+
+    compare_main_loop(targets, count)
+
+
+if __name__ == "__main__":
+    main()
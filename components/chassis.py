@@ -1,11 +1,17 @@
+import cmath
 import math
+import threading
+import time
 from logging import Logger
+from typing import NamedTuple, Optional
 
 import ctre
 import ctre.sensors
 import magicbot
 import navx
+import numpy as np
 import wpilib
+import wpiutil.log
 from magicbot import feedback
 from wpimath.controller import SimpleMotorFeedforwardMeters
 from wpimath.estimator import SwerveDrive4PoseEstimator
@@ -17,9 +23,34 @@ from wpimath.kinematics import (
     SwerveModuleState,
 )
 
+from components.turret import ITurret
 from ids import CancoderIds, TalonIds
+from utilities import loop_cache, swerve_kinematics
 from utilities.ctre import FALCON_CPR, FALCON_FREE_RPS
-from utilities.functions import constrain_angle, rate_limit_module
+from utilities.functions import (
+    constrain_angle,
+    discretise_speeds,
+    rate_limit_module,
+)
+from utilities.input_log import (
+    ESTIMATED_POSE,
+    ODOMETRY_INPUTS,
+    RESET_POSE,
+    ModulePositions,
+    encode_odometry,
+    encode_reset,
+)
+from utilities.pose_history import PoseHistory
+from utilities.telemetry import FieldPublisher
+from utilities.traction import GRAVITY, TractionController
+
+
+class ModuleSensors(NamedTuple):
+    """Sensor readings from a swerve module, taken at the same time."""
+
+    angle: float  # rad, from the steer motor's integrated encoder
+    speed: float  # m/s
+    distance: float  # m
 
 
 class SwerveModule:
@@ -56,7 +87,9 @@ class SwerveModule:
         *_id: can ids of steer and drive motors and absolute encoder
         """
         self.translation = Translation2d(x, y)
-        self.state = SwerveModuleState(0, Rotation2d(0))
+        # m/s and rad
+        self.speed_setpoint = 0.0
+        self.angle_setpoint = 0.0
         self.do_smooth = True
 
         # Create Motor and encoder objects
@@ -107,20 +140,41 @@ class SwerveModule:
         """Gets steer angle (radians) from absolute encoder"""
         return math.radians(self.encoder.getAbsolutePosition())
 
+    def read_sensors(self) -> ModuleSensors:
+        """Read all the module's sensors from the motor controllers."""
+        loop_cache.count_reads(3)
+        return ModuleSensors(
+            angle=self.steer.getSelectedSensorPosition() * self.STEER_COUNTS_TO_RAD,
+            # velocity is in counts / 100ms, convert to m/s
+            speed=self.drive.getSelectedSensorVelocity()
+            * self.DRIVE_COUNTS_TO_METRES
+            * 10,
+            distance=self.drive.getSelectedSensorPosition()
+            * self.DRIVE_COUNTS_TO_METRES,
+        )
+
+    @loop_cache.cached_per_loop
+    def get_sensors(self) -> ModuleSensors:
+        """Get this loop's sensor readings, reading them on first use each loop."""
+        return self.read_sensors()
+
+    def invalidate_sensors(self) -> None:
+        """Force the sensors to be read again, e.g. after resetting an encoder."""
+        loop_cache.invalidate(self, "get_sensors")
+
     def get_angle_integrated(self) -> float:
         """Gets steer angle from motor's integrated relative encoder"""
-        return self.steer.getSelectedSensorPosition() * self.STEER_COUNTS_TO_RAD
+        return self.get_sensors().angle
 
     def get_rotation(self) -> Rotation2d:
         """Get the steer angle as a Rotation2d"""
         return Rotation2d(self.get_angle_integrated())
 
     def get_speed(self) -> float:
-        # velocity is in counts / 100ms, return in m/s
-        return self.drive.getSelectedSensorVelocity() * self.DRIVE_COUNTS_TO_METRES * 10
+        return self.get_sensors().speed
 
     def get_distance_traveled(self) -> float:
-        return self.drive.getSelectedSensorPosition() * self.DRIVE_COUNTS_TO_METRES
+        return self.get_sensors().distance
 
     def set(self, desired_state: SwerveModuleState):
         if self.module_locked:
@@ -128,27 +182,35 @@ class SwerveModule:
 
         # smooth wheel velocity vector
         if self.do_smooth:
-            self.state = rate_limit_module(self.state, desired_state, self.accel_limit)
+            state = rate_limit_module(self.state, desired_state, self.accel_limit)
         else:
-            self.state = desired_state
-        self.state = SwerveModuleState.optimize(self.state, self.get_rotation())
-
-        if abs(self.state.speed) < 0.01 and not self.module_locked:
+            state = desired_state
+        state = SwerveModuleState.optimize(state, self.get_rotation())
+        self.apply(state.speed, state.angle.radians())
+
+    @property
+    def state(self) -> SwerveModuleState:
+        """The state the module was last driven to."""
+        return SwerveModuleState(self.speed_setpoint, Rotation2d(self.angle_setpoint))
+
+    def apply(self, speed: float, angle: float) -> None:
+        """Drive the module at a speed and angle already smoothed and optimised."""
+        self.speed_setpoint = speed
+        self.angle_setpoint = angle
+        if abs(speed) < 0.01 and not self.module_locked:
             self.drive.set(ctre.ControlMode.Velocity, 0)
             self.steer.set(ctre.ControlMode.PercentOutput, 0)
             return
 
         current_angle = self.get_angle_integrated()
-        target_displacement = constrain_angle(
-            self.state.angle.radians() - current_angle
-        )
+        target_displacement = constrain_angle(angle - current_angle)
         target_angle = target_displacement + current_angle
         self.steer.set(
             ctre.ControlMode.Position, target_angle * self.STEER_RAD_TO_COUNTS
         )
 
         # rescale the speed target based on how close we are to being correctly aligned
-        target_speed = self.state.speed * math.cos(target_displacement) ** 2
+        target_speed = speed * math.cos(target_displacement) ** 2
         speed_volt = self.drive_ff.calculate(target_speed)
         self.drive.set(
             ctre.ControlMode.Velocity,
@@ -157,16 +219,35 @@ class SwerveModule:
             speed_volt / self.MAX_DRIVE_VOLTS,
         )
 
+    def set_drive_voltage(self, volts: float) -> None:
+        """Drive the wheel open loop with the module held straight, for characterisation."""
+        self.steer.set(ctre.ControlMode.Position, 0)
+        # Voltage compensation scales output to MAX_DRIVE_VOLTS
+        self.drive.set(ctre.ControlMode.PercentOutput, volts / self.MAX_DRIVE_VOLTS)
+
+    def set_steer_voltage(self, volts: float) -> None:
+        """Turn the module open loop with the wheel stopped, for characterisation."""
+        self.drive.set(ctre.ControlMode.PercentOutput, 0)
+        self.steer.setVoltage(volts)
+
+    def read_steer_velocity(self) -> float:
+        """Read the steer angular velocity (rad/s) from the motor controller."""
+        # velocity is in counts / 100ms
+        return self.steer.getSelectedSensorVelocity() * self.STEER_COUNTS_TO_RAD * 10
+
     def sync_steer_encoders(self) -> None:
         self.steer.setSelectedSensorPosition(
             self.get_angle_absolute() * self.STEER_RAD_TO_COUNTS
         )
+        self.invalidate_sensors()
 
     def get_position(self) -> SwerveModulePosition:
-        return SwerveModulePosition(self.get_distance_traveled(), self.get_rotation())
+        sensors = self.get_sensors()
+        return SwerveModulePosition(sensors.distance, Rotation2d(sensors.angle))
 
     def get(self) -> SwerveModuleState:
-        return SwerveModuleState(self.get_speed(), self.get_rotation())
+        sensors = self.get_sensors()
+        return SwerveModuleState(sensors.speed, Rotation2d(sensors.angle))
 
 
 class Chassis:
@@ -175,23 +256,45 @@ class Chassis:
     # metres between centre of front and back wheels
     WHEEL_BASE = 0.68665
 
+    # (x, y) of the front left, back left, back right and front right modules
+    MODULE_LOCATIONS = (
+        (WHEEL_BASE / 2, TRACK_WIDTH / 2),
+        (-WHEEL_BASE / 2, TRACK_WIDTH / 2),
+        (-WHEEL_BASE / 2, -TRACK_WIDTH / 2),
+        (WHEEL_BASE / 2, -TRACK_WIDTH / 2),
+    )
+
     # size including bumpers
     LENGTH = 1.0105
     WIDTH = 0.8705
     DRIVE_CURRENT_THRESHOLD = 35
     # maxiumum speed for any wheel
     max_wheel_speed = FALCON_FREE_RPS * SwerveModule.DRIVE_MOTOR_REV_TO_METRES
+    # How far back (s) to keep the robot's state, long enough for the oldest
+    # camera frames we use
+    POSE_HISTORY_DURATION = 1.0
+
+    turret_component: ITurret
 
     control_loop_wait_time: float
 
     chassis_speeds = magicbot.will_reset_to(ChassisSpeeds(0, 0, 0))
-    field: wpilib.Field2d
+    field_publisher: FieldPublisher
     logger: Logger
+    data_log: wpiutil.log.DataLog
 
     send_modules = magicbot.tunable(False)
-    do_fudge = magicbot.tunable(True)
+    do_fudge = magicbot.tunable(False)
+    do_discretise = magicbot.tunable(True)
+    # Time (s) from commanding speeds until the modules act on them.
+    # This is about what the old fudge factor corrected for in the sim;
+    # it still needs measuring on the robot.
+    actuation_latency = magicbot.tunable(0.1)
     do_smooth = magicbot.tunable(True)
     swerve_lock = magicbot.tunable(False)
+    vectorised_kinematics = magicbot.tunable(True)
+    # Adapt the module acceleration limits to the traction we detect
+    traction_control = magicbot.tunable(True)
 
     def setup(self) -> None:
         self.imu = navx.AHRS.create_spi()
@@ -199,60 +302,99 @@ class Chassis:
         self.modules = [
             # Front Left
             SwerveModule(
-                self.WHEEL_BASE / 2,
-                self.TRACK_WIDTH / 2,
+                *self.MODULE_LOCATIONS[0],
                 TalonIds.drive_1,
                 TalonIds.steer_1,
                 CancoderIds.swerve_1,
             ),
             # Back Left
             SwerveModule(
-                -self.WHEEL_BASE / 2,
-                self.TRACK_WIDTH / 2,
+                *self.MODULE_LOCATIONS[1],
                 TalonIds.drive_2,
                 TalonIds.steer_2,
                 CancoderIds.swerve_2,
             ),
             # Back Right
             SwerveModule(
-                -self.WHEEL_BASE / 2,
-                -self.TRACK_WIDTH / 2,
+                *self.MODULE_LOCATIONS[2],
                 TalonIds.drive_3,
                 TalonIds.steer_3,
                 CancoderIds.swerve_3,
             ),
             # Front Right
             SwerveModule(
-                self.WHEEL_BASE / 2,
-                -self.TRACK_WIDTH / 2,
+                *self.MODULE_LOCATIONS[3],
                 TalonIds.drive_4,
                 TalonIds.steer_4,
                 CancoderIds.swerve_4,
             ),
         ]
 
-        self.kinematics = SwerveDrive4Kinematics(
-            self.modules[0].translation,
-            self.modules[1].translation,
-            self.modules[2].translation,
-            self.modules[3].translation,
+        self.kinematics = self.create_kinematics()
+        self.swerve_kinematics = swerve_kinematics.SwerveKinematics(
+            [(module.translation.x, module.translation.y) for module in self.modules]
+        )
+        self.lock_angles = np.array([module.central_angle for module in self.modules])
+        self.traction = TractionController(
+            self.swerve_kinematics.translations,
+            initial_limit=SwerveModule.accel_limit,
+        )
+        self._last_imu_heading = 0.0
+        # Everything the estimator is given, to replay it with tools.replay
+        self.odometry_log_entry = wpiutil.log.DoubleArrayLogEntry(
+            self.data_log, ODOMETRY_INPUTS
+        )
+        self.reset_log_entry = wpiutil.log.DoubleArrayLogEntry(
+            self.data_log, RESET_POSE
+        )
+        self.pose_log_entry = wpiutil.log.DoubleArrayLogEntry(
+            self.data_log, ESTIMATED_POSE
         )
         self.sync_all()
         self.imu.zeroYaw()
         self.imu.resetDisplacement()
-        self.estimator = SwerveDrive4PoseEstimator(
+        # Held whenever the estimator is used, as the odometry thread updates it
+        self.estimator_lock = threading.Lock()
+        self.odometry_thread: Optional[threading.Thread] = None
+        self.odometry_stop = threading.Event()
+        self.estimator = self.create_estimator(
             self.kinematics,
             self.imu.getRotation2d(),
             self.get_module_positions(),
             Pose2d(3, 0, 0),
+        )
+        self.pose_history = PoseHistory(
+            math.ceil(self.POSE_HISTORY_DURATION / self.control_loop_wait_time) + 1
+        )
+        self.set_pose(Pose2d(4, Chassis.WIDTH / 2, Rotation2d()))
+
+    @classmethod
+    def create_kinematics(cls) -> SwerveDrive4Kinematics:
+        return SwerveDrive4Kinematics(
+            *(Translation2d(x, y) for x, y in cls.MODULE_LOCATIONS)
+        )
+
+    @staticmethod
+    def create_estimator(
+        kinematics: SwerveDrive4Kinematics,
+        gyro_angle: Rotation2d,
+        module_positions: tuple[
+            SwerveModulePosition,
+            SwerveModulePosition,
+            SwerveModulePosition,
+            SwerveModulePosition,
+        ],
+        pose: Pose2d,
+    ) -> SwerveDrive4PoseEstimator:
+        """The pose estimator, also used to replay logs without hardware."""
+        return SwerveDrive4PoseEstimator(
+            kinematics,
+            gyro_angle,
+            module_positions,
+            pose,
             stateStdDevs=(0.05, 0.05, 0.01),
             visionMeasurementStdDevs=(0.4, 0.4, math.inf),
         )
-        self.field_obj = self.field.getObject("fused_pose")
-        self.module_objs: list[wpilib.FieldObject2d] = []
-        for idx, _module in enumerate(self.modules):
-            self.module_objs.append(self.field.getObject("s_module_" + str(idx)))
-        self.set_pose(Pose2d(4, Chassis.WIDTH / 2, Rotation2d()))
 
     def drive_field(self, vx: float, vy: float, omega: float) -> None:
         """Field oriented drive commands"""
@@ -269,7 +411,13 @@ class Chassis:
         # rotate desired velocity to compensate for skew caused by discretization
         # see https://www.chiefdelphi.com/t/field-relative-swervedrive-drift-even-with-simulated-perfect-modules/413892/
 
-        if self.do_fudge:
+        if self.do_discretise:
+            desired_speeds = discretise_speeds(
+                self.chassis_speeds,
+                self.control_loop_wait_time,
+                self.actuation_latency,
+            )
+        elif self.do_fudge:
             # in the sim i found using 5 instead of 0.5 did a lot better
             desired_speed_translation = Translation2d(
                 self.chassis_speeds.vx, self.chassis_speeds.vy
@@ -287,24 +435,110 @@ class Chassis:
         if self.swerve_lock:
             self.do_smooth = False
 
-        desired_states = self.kinematics.toSwerveModuleStates(desired_speeds)
-        desired_states = self.kinematics.desaturateWheelSpeeds(
-            desired_states, attainableMaxSpeed=self.max_wheel_speed
-        )
+        self.update_traction()
 
-        for state, module in zip(desired_states, self.modules):
+        for module in self.modules:
             module.module_locked = self.swerve_lock
             module.do_smooth = self.do_smooth
-            module.set(state)
+
+        if self.vectorised_kinematics:
+            self.set_module_states(desired_speeds)
+        else:
+            desired_states = self.kinematics.toSwerveModuleStates(desired_speeds)
+            desired_states = self.kinematics.desaturateWheelSpeeds(
+                desired_states, attainableMaxSpeed=self.max_wheel_speed
+            )
+            for state, module in zip(desired_states, self.modules):
+                module.set(state)
 
         self.update_odometry()
 
+    def set_module_states(self, speeds: ChassisSpeeds) -> None:
+        """
+        Work out every module's state for robot relative chassis speeds in
+        one pass, then drive the modules to them.
+        """
+        if self.swerve_lock:
+            module_speeds = np.zeros(len(self.modules))
+            angles = self.lock_angles
+        else:
+            module_speeds, angles = self.swerve_kinematics.to_module_states(
+                (speeds.vx, speeds.vy, speeds.omega)
+            )
+            module_speeds = swerve_kinematics.desaturate(
+                module_speeds, self.max_wheel_speed
+            )
+
+        if self.do_smooth:
+            module_speeds, angles = swerve_kinematics.rate_limit(
+                [module.speed_setpoint for module in self.modules],
+                [module.angle_setpoint for module in self.modules],
+                module_speeds,
+                angles,
+                [module.accel_limit for module in self.modules],
+                self.control_loop_wait_time,
+            )
+        module_speeds, angles = swerve_kinematics.optimize(
+            module_speeds,
+            angles,
+            [module.get_angle_integrated() for module in self.modules],
+        )
+
+        for module, speed, angle in zip(
+            self.modules, module_speeds.tolist(), angles.tolist()
+        ):
+            module.apply(speed, angle)
+
+    def update_traction(self) -> None:
+        """Set each module's acceleration limit from the traction it has."""
+        heading = self.imu.getRotation2d().radians()
+        omega = constrain_angle(heading - self._last_imu_heading)
+        omega /= self.control_loop_wait_time
+        self._last_imu_heading = heading
+        if not self.traction_control:
+            for module in self.modules:
+                module.accel_limit = SwerveModule.accel_limit
+            return
+
+        limits = self.traction.update(
+            [
+                cmath.rect(module.get_speed(), module.get_angle_integrated())
+                for module in self.modules
+            ],
+            self.get_imu_acceleration(),
+            omega,
+            self.control_loop_wait_time,
+        )
+        for module, limit in zip(self.modules, limits.tolist()):
+            module.accel_limit = limit
+
+    @feedback
+    def get_accel_limits(self) -> list[float]:
+        """Acceleration limit (m/s^2) of each module."""
+        return [module.accel_limit for module in self.modules]
+
+    @loop_cache.cached_per_loop
+    def get_imu_acceleration(self) -> complex:
+        """Robot relative acceleration (m/s^2) measured by the IMU, as ax + ay * 1j."""
+        loop_cache.count_reads(3)
+        # The navX gives its gravity compensated acceleration in the world
+        # frame, so rotate it back by the heading into the robot's frame
+        world = complex(
+            self.imu.getWorldLinearAccelX(), self.imu.getWorldLinearAccelY()
+        )
+        heading = self.imu.getRotation2d().radians()
+        return world * cmath.exp(-1j * heading) * GRAVITY
+
     def on_enable(self) -> None:
         # update the odometry so the pose estimator dosent have an empty buffer
         self.update_odometry()
+        self.traction.reset()
+        self._last_imu_heading = self.imu.getRotation2d().radians()
 
     @magicbot.feedback
+    @loop_cache.cached_per_loop
     def get_imu_speed(self) -> float:
+        loop_cache.count_reads(2)
         return math.hypot(self.imu.getVelocityX(), self.imu.getVelocityY())
 
     def lock_swerve(self) -> None:
@@ -325,40 +559,130 @@ class Chassis:
             self.local_speed, -self.get_rotation()
         )
 
+    def start_odometry_thread(self, rate: float) -> None:
+        """Update odometry at the given rate (Hz) from a separate thread."""
+        self.stop_odometry_thread()
+        self.odometry_stop.clear()
+        self.odometry_thread = threading.Thread(
+            target=self._run_odometry_thread,
+            args=(1 / rate,),
+            name="odometry",
+            daemon=True,
+        )
+        self.odometry_thread.start()
+
+    def stop_odometry_thread(self) -> None:
+        """Go back to updating odometry from the main loop."""
+        if self.odometry_thread is not None:
+            self.odometry_stop.set()
+            self.odometry_thread.join()
+            self.odometry_thread = None
+
+    def _run_odometry_thread(self, period: float) -> None:
+        next_update = time.monotonic()
+        while not self.odometry_stop.is_set():
+            self._update_odometry_threaded()
+            # Keep to a fixed schedule rather than sleeping a period after
+            # each update, but don't try to catch up on missed updates
+            next_update = max(next_update + period, time.monotonic())
+            self.odometry_stop.wait(next_update - time.monotonic())
+
+    def _update_odometry_threaded(self) -> None:
+        positions = self.read_module_positions()
+        gyro_angle = self.imu.getRotation2d()
+        with self.estimator_lock:
+            self.estimator.update(gyro_angle, positions)
+        self.odometry_log_entry.append(encode_odometry(gyro_angle, positions))
+
     def update_odometry(self) -> None:
-        self.estimator.update(self.imu.getRotation2d(), self.get_module_positions())
-        self.field_obj.setPose(self.get_pose())
+        if self.odometry_thread is None:
+            gyro_angle = self.imu.getRotation2d()
+            positions = self.get_module_positions()
+            with self.estimator_lock:
+                self.estimator.update(gyro_angle, positions)
+            self.odometry_log_entry.append(encode_odometry(gyro_angle, positions))
+        robot_location = self.get_pose()
+        self.pose_log_entry.append(
+            [robot_location.x, robot_location.y, robot_location.rotation().radians()]
+        )
+        self.pose_history.add(
+            wpilib.Timer.getFPGATimestamp(),
+            robot_location,
+            self.turret_component.get_angle(),
+            self.get_velocity(),
+        )
+        self.field_publisher.set_pose("fused_pose", robot_location)
         if self.send_modules:
-            robot_location = self.estimator.getEstimatedPosition()
+            heading = robot_location.rotation()
             for idx, module in enumerate(self.modules):
-                module_location = (
-                    robot_location.translation()
-                    + module.translation.rotateBy(robot_location.rotation())
-                )
-                module_rotation = module.get_rotation().rotateBy(
-                    robot_location.rotation()
+                x = module.translation.x
+                y = module.translation.y
+                self.field_publisher.set_pose_xy(
+                    f"s_module_{idx}",
+                    robot_location.x + x * heading.cos() - y * heading.sin(),
+                    robot_location.y + x * heading.sin() + y * heading.cos(),
+                    module.get_angle_integrated() + heading.radians(),
                 )
-                self.module_objs[idx].setPose(Pose2d(module_location, module_rotation))
+
+    def set_drive_voltage(self, volts: float) -> None:
+        """Drive every wheel open loop, straight ahead, for characterisation."""
+        for module in self.modules:
+            module.set_drive_voltage(volts)
+
+    def set_steer_voltage(self, volts: float) -> None:
+        """Turn every module open loop, for characterisation."""
+        for module in self.modules:
+            module.set_steer_voltage(volts)
+
+    def read_drive_distance(self) -> float:
+        """Mean distance (m) the wheels have travelled, read from the motors."""
+        return sum(m.read_sensors().distance for m in self.modules) / len(self.modules)
+
+    def read_drive_speed(self) -> float:
+        """Mean speed (m/s) of the wheels, read from the motors."""
+        return sum(m.read_sensors().speed for m in self.modules) / len(self.modules)
+
+    def read_steer_angle(self) -> float:
+        """Mean integrated steer angle (rad) of the modules, read from the motors."""
+        return sum(m.read_sensors().angle for m in self.modules) / len(self.modules)
+
+    def read_steer_velocity(self) -> float:
+        """Mean steer angular velocity (rad/s) of the modules."""
+        return sum(m.read_steer_velocity() for m in self.modules) / len(self.modules)
 
     def sync_all(self) -> None:
         for m in self.modules:
             m.sync_steer_encoders()
 
     def set_pose(self, pose: Pose2d) -> None:
-        self.estimator.resetPosition(
-            self.imu.getRotation2d(), self.get_module_positions(), pose
-        )
-        self.field.setRobotPose(pose)
-        self.field_obj.setPose(pose)
+        gyro_angle = self.imu.getRotation2d()
+        with self.estimator_lock:
+            positions = self.get_odometry_positions()
+            self.estimator.resetPosition(gyro_angle, positions, pose)
+        self.reset_log_entry.append(encode_reset(pose, gyro_angle, positions))
+        self.pose_history.clear()
+        self.field_publisher.set_pose("Robot", pose)
+        self.field_publisher.set_pose("fused_pose", pose)
 
     def zero_yaw(self) -> None:
         """Sets pose to current pose but with a heading of zero"""
-        cur_pose = self.estimator.getEstimatedPosition()
-        self.estimator.resetPosition(
-            self.imu.getRotation2d(),
-            self.get_module_positions(),
-            Pose2d(cur_pose.translation(), Rotation2d(0)),
-        )
+        gyro_angle = self.imu.getRotation2d()
+        with self.estimator_lock:
+            positions = self.get_odometry_positions()
+            cur_pose = self.estimator.getEstimatedPosition()
+            pose = Pose2d(cur_pose.translation(), Rotation2d(0))
+            self.estimator.resetPosition(gyro_angle, positions, pose)
+        self.reset_log_entry.append(encode_reset(pose, gyro_angle, positions))
+
+    def add_vision_measurement(
+        self,
+        pose: Pose2d,
+        timestamp: float,
+        std_devs: tuple[float, float, float],
+    ) -> None:
+        """Fuse a pose measured at the given FPGA timestamp into the estimate."""
+        with self.estimator_lock:
+            self.estimator.addVisionMeasurement(pose, timestamp, std_devs)
 
     def get_module_positions(
         self,
@@ -375,24 +699,58 @@ class Chassis:
             self.modules[3].get_position(),
         )
 
+    def read_module_positions(self) -> ModulePositions:
+        """Read the module positions directly, bypassing the per loop cache."""
+        m0, m1, m2, m3 = (module.read_sensors() for module in self.modules)
+        return (
+            SwerveModulePosition(m0.distance, Rotation2d(m0.angle)),
+            SwerveModulePosition(m1.distance, Rotation2d(m1.angle)),
+            SwerveModulePosition(m2.distance, Rotation2d(m2.angle)),
+            SwerveModulePosition(m3.distance, Rotation2d(m3.angle)),
+        )
+
+    def get_odometry_positions(self) -> ModulePositions:
+        """
+        Get the module positions as fresh as those the estimator was last
+        updated with, so resetting it doesn't lose the travel in between.
+        """
+        if self.odometry_thread is None:
+            return self.get_module_positions()
+        return self.read_module_positions()
+
     def get_pose(self) -> Pose2d:
         """Get the current location of the robot relative to ???"""
-        return self.estimator.getEstimatedPosition()
+        with self.estimator_lock:
+            return self.estimator.getEstimatedPosition()
+
+    def get_pose_at(self, timestamp: float) -> Pose2d:
+        """
+        Get the location of the robot at an FPGA timestamp, interpolating
+        between the poses recorded each loop.
+        """
+        pose = self.pose_history.pose_at(timestamp)
+        return self.get_pose() if pose is None else pose
 
     def get_rotation(self) -> Rotation2d:
         """Get the current heading of the robot."""
         return self.get_pose().rotation()
 
     @feedback
+    @loop_cache.cached_per_loop
     def get_tilt(self) -> float:
+        loop_cache.count_reads()
         return math.radians(self.imu.getRoll())
 
     @feedback
+    @loop_cache.cached_per_loop
     def get_tilt_rate(self) -> float:
+        loop_cache.count_reads()
         return math.radians(self.imu.getRawGyroY())
 
     @feedback
+    @loop_cache.cached_per_loop
     def get_drive_current(self) -> float:
+        loop_cache.count_reads(len(self.modules))
         return sum(abs(x.drive.getStatorCurrent()) for x in self.modules)
 
     @feedback
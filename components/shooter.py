@@ -8,6 +8,7 @@ from wpimath.controller import (
 )
 
 from ids import SparkMaxIds, TalonIds
+from utilities import loop_cache
 
 FLYWHEEL_SPEED_ERROR_TOLERANCE: float = 10
 
@@ -73,13 +74,45 @@ class Shooter:
         # rotate back motors so the cube is picked up by the flywheels
         self.back_motor_speed = BACK_MOTOR_SHOOTING_SPEED
 
+    @loop_cache.cached_per_loop
+    def get_top_flywheel_velocity(self) -> float:
+        return self.read_top_flywheel_velocity()
+
+    @loop_cache.cached_per_loop
+    def get_bottom_flywheel_velocity(self) -> float:
+        return self.read_bottom_flywheel_velocity()
+
+    def read_top_flywheel_velocity(self) -> float:
+        """Read the top flywheel's velocity, bypassing the per loop cache."""
+        loop_cache.count_reads()
+        return self.top_flywheel_encoder.getVelocity()
+
+    def read_bottom_flywheel_velocity(self) -> float:
+        """Read the bottom flywheel's velocity, bypassing the per loop cache."""
+        loop_cache.count_reads()
+        return self.bottom_flywheel_encoder.getVelocity()
+
+    def read_top_flywheel_position(self) -> float:
+        return self.top_flywheel_encoder.getPosition()
+
+    def read_bottom_flywheel_position(self) -> float:
+        return self.bottom_flywheel_encoder.getPosition()
+
+    def set_top_flywheel_voltage(self, volts: float) -> None:
+        """Drive the top flywheel open loop, for characterisation."""
+        self.top_flywheel.setVoltage(volts)
+
+    def set_bottom_flywheel_voltage(self, volts: float) -> None:
+        """Drive the bottom flywheel open loop, for characterisation."""
+        self.bottom_flywheel.setVoltage(volts)
+
     @feedback
     def top_flywheel_error(self) -> float:
-        return self.top_flywheel_speed - self.top_flywheel_encoder.getVelocity()
+        return self.top_flywheel_speed - self.get_top_flywheel_velocity()
 
     @feedback
     def bottom_flywheel_error(self) -> float:
-        return self.bottom_flywheel_speed - self.bottom_flywheel_encoder.getVelocity()
+        return self.bottom_flywheel_speed - self.get_bottom_flywheel_velocity()
 
     def top_flywheel_at_speed(self) -> bool:
         return abs(self.top_flywheel_error()) < FLYWHEEL_SPEED_ERROR_TOLERANCE
@@ -104,7 +137,12 @@ class Shooter:
     @feedback
     def is_loaded(self) -> bool:
         """Get whether the shooter is loaded."""
-        return bool(self.back_motor.isRevLimitSwitchClosed() or self._has_cube)
+        return self.is_limit_switch_closed() or self._has_cube
+
+    @loop_cache.cached_per_loop
+    def is_limit_switch_closed(self) -> bool:
+        loop_cache.count_reads()
+        return bool(self.back_motor.isRevLimitSwitchClosed())
 
     def set_has_cube(self) -> None:
         self._has_cube = True
@@ -117,6 +155,10 @@ class Shooter:
         self.bottom_flywheel_speed = 0.0
         self.back_motor_speed = 0.0
 
+    def stop_back_motor(self) -> None:
+        """Stop feeding or loading, leaving the flywheels spinning."""
+        self.back_motor_speed = 0.0
+
     def is_loading(self) -> bool:
         return self.top_flywheel_speed < 0 and self.bottom_flywheel_speed < 0
 
@@ -7,6 +7,7 @@ from wpimath.controller import ProfiledPIDControllerRadians
 from wpimath.trajectory import TrapezoidProfileRadians
 
 from ids import DioChannels, SparkMaxIds
+from utilities import loop_cache
 from utilities.functions import clamp
 
 INTAKING_ANGLE: float = math.radians(90)
@@ -22,6 +23,10 @@ MAX_ANGLE: float = math.radians(60)
 class Tilt:
     goal_angle = tunable(0.0)
 
+    ROTATION_CONSTRAINTS = TrapezoidProfileRadians.Constraints(
+        maxVelocity=MAX_ANGULAR_VELOCITY, maxAcceleration=MAX_ANGULAR_ACCELERATION
+    )
+
     def __init__(self) -> None:
         self.motor = CANSparkMax(
             SparkMaxIds.tilt_motor, CANSparkMax.MotorType.kBrushless
@@ -33,11 +38,8 @@ class Tilt:
         self.absolute_encoder.setDistancePerRotation(-math.pi)
         self.absolute_encoder.setPositionOffset(TILT_ENCODER_ANGLE_OFFSET)
 
-        rotation_contraints = TrapezoidProfileRadians.Constraints(
-            maxVelocity=MAX_ANGULAR_VELOCITY, maxAcceleration=MAX_ANGULAR_ACCELERATION
-        )
         self.rotation_controller = ProfiledPIDControllerRadians(
-            16.0, 0.01, 0.0, rotation_contraints
+            16.0, 0.01, 0.0, self.ROTATION_CONSTRAINTS
         )
         SmartDashboard.putData("tilt_pid", self.rotation_controller)
 
@@ -48,6 +50,7 @@ class Tilt:
         )
 
     @feedback
+    @loop_cache.cached_per_loop
     def get_angle(self) -> float:
         """
         Get the tilt angle in radians.
@@ -55,10 +58,15 @@ class Tilt:
         0 is the shooter pointing upwards along the vertical axis,
         positive downwards along the front of the shooter.
         """
+        return self.read_angle()
+
+    def read_angle(self) -> float:
+        """Read the tilt angle from the encoder, bypassing the per loop cache."""
         # We have an issue caused by wrapping when the mechanism
         # is initialised in the wrong place.
         # We can't actually move more than a full revolution,
         # so we can force it to the right range.
+        loop_cache.count_reads()
         angle = self.absolute_encoder.getDistance()
         while angle > math.radians(100):  # Measured max is 98.8 deg
             angle -= math.pi
@@ -66,6 +74,19 @@ class Tilt:
             angle += math.pi
         return angle
 
+    def get_velocity(self) -> float:
+        """
+        Get the angular velocity (rad/s) the tilt is being driven at.
+
+        The absolute encoder is too noisy to differentiate,
+        so this is the velocity of the motion profile.
+        """
+        return self.rotation_controller.getSetpoint().velocity
+
+    def set_voltage(self, volts: float) -> None:
+        """Drive the tilt open loop, for characterisation."""
+        self.motor.setVoltage(volts)
+
     def goto_intaking(self) -> None:
         self.goal_angle = INTAKING_ANGLE
 
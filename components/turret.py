@@ -8,6 +8,7 @@ from wpimath.geometry import Translation3d
 from wpimath.trajectory import TrapezoidProfileRadians
 
 from ids import DioChannels, SparkMaxIds
+from utilities import loop_cache
 
 GEAR_RATIO: float = (10 / 1) * (4 / 1) * (140 / 18)
 ANGLE_ERROR_TOLERANCE: float = radians(1)
@@ -27,6 +28,9 @@ class ITurret:
     def get_angle(self) -> float:
         return 0.0
 
+    def get_velocity(self) -> float:
+        return 0.0
+
     def set_angle(self, angle: float) -> None:
         pass
 
@@ -49,6 +53,9 @@ class Turret(ITurret):
     index_found = tunable(False)
 
     TRANSLATION3D: Translation3d = Translation3d(-0.2, 0, 0.3)
+    ROTATION_CONSTRAINTS = TrapezoidProfileRadians.Constraints(
+        maxVelocity=MAX_ANGULAR_VELOCITY, maxAcceleration=MAX_ANGULAR_ACCELERATION
+    )
 
     def __init__(self) -> None:
         # Create the hardware object handles
@@ -66,11 +73,8 @@ class Turret(ITurret):
         self.encoder = self.motor.getEncoder()
         self.encoder.setPositionConversionFactor(tau / GEAR_RATIO)
         self.encoder.setVelocityConversionFactor((tau / 60) / GEAR_RATIO)
-        rotation_contraints = TrapezoidProfileRadians.Constraints(
-            maxVelocity=MAX_ANGULAR_VELOCITY, maxAcceleration=MAX_ANGULAR_ACCELERATION
-        )
         self.rotation_controller = ProfiledPIDControllerRadians(
-            16.0, 0.05, 0.0, rotation_contraints
+            16.0, 0.05, 0.0, self.ROTATION_CONSTRAINTS
         )
 
     def set_angle(self, angle: float) -> None:
@@ -80,9 +84,29 @@ class Turret(ITurret):
         self.goal_angle = clamped_angle
 
     @feedback
+    @loop_cache.cached_per_loop
     def get_angle(self) -> float:
+        return self.read_angle()
+
+    def read_angle(self) -> float:
+        """Read the angle from the encoder, bypassing the per loop cache."""
+        loop_cache.count_reads()
         return self.encoder.getPosition()
 
+    @feedback
+    @loop_cache.cached_per_loop
+    def get_velocity(self) -> float:
+        return self.read_velocity()
+
+    def read_velocity(self) -> float:
+        """Read the angular velocity from the encoder, bypassing the per loop cache."""
+        loop_cache.count_reads()
+        return self.encoder.getVelocity()
+
+    def set_voltage(self, volts: float) -> None:
+        """Drive the turret open loop, for characterisation."""
+        self.motor.setVoltage(volts)
+
     @feedback
     def at_angle(self) -> bool:
         # return abs(current angle - reference) < Tolerance
@@ -92,11 +116,15 @@ class Turret(ITurret):
         ) and self.index_found
 
     @feedback
+    @loop_cache.cached_per_loop
     def at_positive_limit(self) -> bool:
+        loop_cache.count_reads()
         return not self.positive_limit_switch.get()
 
     @feedback
+    @loop_cache.cached_per_loop
     def at_negative_limit(self) -> bool:
+        loop_cache.count_reads()
         return not self.negative_limit_switch.get()
 
     @feedback
@@ -160,4 +188,5 @@ class Turret(ITurret):
     # override the current angle to be angle
     def set_to_angle(self, angle):
         self.encoder.setPosition(angle)
+        loop_cache.invalidate(self, "get_angle")
         self.index_found = True
@@ -1,16 +1,79 @@
+import collections
 import math
+import threading
 import typing
-from typing import Optional
+from typing import NamedTuple, Optional
 
+import numpy as np
 import wpilib
 import wpiutil.log
 from magicbot import tunable
 from photonvision import PhotonCamera, PhotonTrackedTarget
-from wpimath.geometry import Pose2d, Rotation3d, Transform3d, Translation3d
+from wpimath.geometry import (
+    Pose2d,
+    Rotation3d,
+    Transform2d,
+    Transform3d,
+    Translation3d,
+)
 
 from components.chassis import Chassis
 from components.turret import ITurret, Turret
-from utilities.game import apriltag_layout
+from utilities.camera_transforms import CameraTransformCache, get_tag_pose
+from utilities.functions import constrain_angle
+from utilities.input_log import VISION_FRAME_PREFIX, encode_frame
+from utilities.multi_tag import MultiTagEstimate, estimate_multi_tag_pose
+from utilities.telemetry import FieldPublisher
+from utilities.vision_uncertainty import FEATURES, UncertaintyModel, get_features
+
+# Tags more ambiguous than this are used only when one pose is clearly right
+MAX_AMBIGUITY = 0.25
+# Difference in cost between the poses of a tag for the choice to be clear,
+# about a 50 to 1 likelihood ratio
+CLEAR_CHOICE_MARGIN = 8.0
+# How far (rad, m) from the estimator's pose the right pose is expected to
+# be. The estimator's heading follows the gyro, so is trusted far more than
+# its position, which odometry loses in collisions.
+ESTIMATOR_HEADING_STD = 0.1
+ESTIMATOR_TRANSLATION_STD = 1.0
+# How far (m) from the last measurement, moved by odometry, the right pose
+# is expected to be, and how old (s) that measurement can be
+VISION_PREDICTION_STD = 0.5
+VISION_HISTORY_AGE = 1.0
+# Squared standard score of a measurement's difference from the estimator's
+# pose beyond which it's rejected, the 99th percentile of the chi-squared
+# distribution with three degrees of freedom (x, y, heading)
+INNOVATION_GATE = 11.34
+# How far (m) the estimator's position is expected to be from the truth just
+# after a vision measurement, and how much further for every metre driven
+ODOMETRY_STD = 0.05
+ODOMETRY_DRIFT = 0.1
+# When this many measurements rejected within a window (s) agree with each
+# other, the estimator is wrong rather than them, so the robot is moved to
+# where they put it. They agree when each is within the 99th percentile of
+# the chi-squared distribution with two degrees of freedom of their mean.
+RELOCALISE_COUNT = 5
+RELOCALISE_WINDOW = 1.0
+RELOCALISE_GATE = 9.21
+
+
+class FrameTarget(NamedTuple):
+    target: PhotonTrackedTarget
+    best_pose: Pose2d
+    alt_pose: Pose2d
+    # Height (m) of the best pose, which should be near the floor
+    z: float
+
+
+class Frame(NamedTuple):
+    """The poses estimated from one camera frame."""
+
+    timestamp: float
+    # Tags in the field layout that were seen, with their single tag poses
+    targets: list[FrameTarget]
+    multi_tag: Optional[MultiTagEstimate]
+    # The tags the multi-tag pose was estimated from
+    multi_tag_targets: list[PhotonTrackedTarget]
 
 
 class VisualLocaliser:
@@ -19,12 +82,27 @@ class VisualLocaliser:
     using information from a single PhotonVision camera.
     """
 
+    # Where to log targets and frames. Injected after construction, so
+    # nothing is logged when a log is being replayed.
+    data_log: wpiutil.log.DataLog
+
     add_to_estimator = tunable(True)
+    # Combine every tag in a frame into one measurement, when there's more than one
+    use_multi_tag = tunable(True)
     should_log = tunable(False)
+    # Log every frame's targets, to replay them with tools.replay
+    log_frames = tunable(True)
 
-    rejected_in_row = tunable(0.0)
+    # Squared standard score of the last measurement against the estimator
+    innovation = tunable(0.0)
+    relocalisations = tunable(0.0)
     last_pose_z = tunable(0.0, writeDefault=False)
     range = tunable(0.0)
+    pose_choice_margin = tunable(0.0)
+    multi_tag_residual = tunable(0.0)
+
+    # Most frames waiting for the main loop when estimating on a thread
+    FRAME_QUEUE_LENGTH = 8
 
     def __init__(
         self,
@@ -34,131 +112,371 @@ class VisualLocaliser:
         pos: Translation3d,
         # The camera rotation.
         rot: Rotation3d,
-        field: wpilib.Field2d,
-        data_log: wpiutil.log.DataLog,
+        field_publisher: FieldPublisher,
         chassis_component: Chassis,
         turret_component: ITurret,
     ) -> None:
+        self.name = name
         self.camera = PhotonCamera(name)
         self.camera_rotation = rot
         self.camera_position = pos
+        self.camera_transforms = CameraTransformCache(pos, rot, Turret.TRANSLATION3D)
         self.last_timestamp = -1
 
-        self.field_pos_obj = field.getObject("vision_pose_" + name)
-        self.pose_log_entry = wpiutil.log.DoubleArrayLogEntry(
-            data_log, "vision_pose_" + name
-        )
+        self.field_publisher = field_publisher
+        self.field_object_name = "vision_pose_" + name
+        # Created in setup, which isn't called when replaying a log
+        self.pose_log_entry: Optional[wpiutil.log.DoubleArrayLogEntry] = None
+        self.frame_log_entry: Optional[wpiutil.log.DoubleArrayLogEntry] = None
 
         self.chassis_component = chassis_component
         self.turret_component = turret_component
+        self.uncertainty = UncertaintyModel()
+        # Timestamp and pose of the last measurement added to the estimator
+        self.last_measurement: Optional[tuple[float, Pose2d]] = None
+        # Timestamps, poses and translation std devs of recent measurements
+        # the gate rejected, oldest first
+        self.rejected: collections.deque[
+            tuple[float, Pose2d, float]
+        ] = collections.deque()
+
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        # Frames estimated on the thread, waiting for the main loop
+        self.frames: collections.deque[Frame] = collections.deque(
+            maxlen=self.FRAME_QUEUE_LENGTH
+        )
+
+    def setup(self) -> None:
+        self.pose_log_entry = wpiutil.log.DoubleArrayLogEntry(
+            self.data_log, "vision_pose_" + self.name
+        )
+        self.frame_log_entry = wpiutil.log.DoubleArrayLogEntry(
+            self.data_log, VISION_FRAME_PREFIX + self.name
+        )
 
     def execute(self) -> None:
+        # Only what the worker thread has queued since the last loop
+        for _ in range(len(self.frames)):
+            self.process_frame(self.frames.popleft())
+        if self.thread is None and (frame := self.poll()) is not None:
+            self.process_frame(frame)
+
+    def start_thread(self, period: float = 0.01) -> None:
+        """
+        Poll the camera and estimate poses from its frames on a background
+        thread, leaving only adding them to the estimator to execute.
+        """
+        self.stop_thread()
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run_thread,
+            args=(period,),
+            name=f"{self.field_object_name}_thread",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def stop_thread(self) -> None:
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def _run_thread(self, period: float) -> None:
+        while not self.stop_event.wait(period):
+            if (frame := self.poll()) is not None:
+                # The queue is bounded, so the oldest frames are dropped
+                # if the main loop falls behind
+                self.frames.append(frame)
+
+    def poll(self) -> Optional[Frame]:
+        """Estimate poses from the camera's latest frame, if it's new."""
         # if results didn't see any targets
         if not (results := self.camera.getLatestResult()).hasTargets():
-            return
+            return None
 
         # if we have already processed these results
         timestamp = results.getTimestamp()
-        if timestamp == self.last_timestamp and wpilib.RobotBase.isReal():
-            return
+        if timestamp == self.last_timestamp and (
+            wpilib.RobotBase.isReal() or self.thread is not None
+        ):
+            return None
         self.last_timestamp = timestamp
 
         # old results cause pose estimator to crash and aren't very useful anyway
         if abs(wpilib.Timer.getFPGATimestamp() - timestamp) > 0.5:
-            return
+            return None
 
-        turret_rotation = Rotation3d.fromDegrees(
-            0, 0, math.degrees(self.turret_component.get_angle())
-        )
+        # Use the robot's state from when the frame was captured. This runs
+        # on the worker thread, so it mustn't touch the turret's per loop
+        # cached getters; the history is safe to read from any thread.
+        history = self.chassis_component.pose_history
+        turret_angle = history.turret_angle_at(timestamp)
+        turret_velocity = history.turret_velocity_at(timestamp)
+        if turret_angle is None or turret_velocity is None:
+            # Odometry hasn't run yet, so there's nothing to place it with
+            return None
 
-        camera_rotation = self.camera_rotation.rotateBy(turret_rotation)
-        camera_position = (
-            self.camera_position.rotateBy(turret_rotation) + Turret.TRANSLATION3D
-        )
-        camera_to_robot = Transform3d(camera_position, camera_rotation).inverse()
-        for target in results.getTargets():
-            poses = estimate_poses_from_apriltag(camera_to_robot, target)
-            if poses is None:
-                # tag doesn't exist
-                continue
-            self.range = target.getBestCameraToTarget().inverse().translation().norm()
+        camera_to_robot = self.camera_transforms.camera_to_robot(turret_angle)
+        if self.log_frames and self.frame_log_entry is not None:
+            self.frame_log_entry.append(
+                encode_frame(
+                    timestamp,
+                    turret_velocity,
+                    camera_to_robot,
+                    results.getTargets(),
+                )
+            )
+        return self.estimate_frame(timestamp, camera_to_robot, results.getTargets())
 
-            best_pose, alt_pose, self.last_pose_z = poses
-            pose = choose_pose(
+    def estimate_frame(
+        self,
+        timestamp: float,
+        camera_to_robot: Transform3d,
+        seen: list[PhotonTrackedTarget],
+    ) -> Frame:
+        """Estimate poses from the targets seen in a frame."""
+        multi_tag = None
+        multi_tag_targets = []
+        if self.use_multi_tag:
+            # Tags near the edge of the frame are the most distorted
+            multi_tag_targets = [t for t in seen if abs(t.getYaw()) <= 20]
+            multi_tag = estimate_multi_tag_pose(camera_to_robot, multi_tag_targets)
+
+        targets = []
+        # Single tag poses are only needed without a multi-tag pose, or to log
+        if multi_tag is None or self.should_log:
+            for target in seen:
+                poses = estimate_poses_from_apriltag(camera_to_robot, target)
+                if poses is None:
+                    # tag doesn't exist
+                    continue
+                targets.append(FrameTarget(target, *poses))
+        return Frame(timestamp, targets, multi_tag, multi_tag_targets)
+
+    def process_frame(self, frame: Frame) -> None:
+        """Add the poses estimated from a frame to the estimator."""
+        robot_pose = self.chassis_component.get_pose_at(frame.timestamp)
+
+        if frame.multi_tag is not None:
+            self.multi_tag_residual = frame.multi_tag.residual
+            # As uncertain as the closest tag, less for each tag seen, but
+            # not ambiguous as the tags' orientations aren't used
+            closest = min(
+                (
+                    t
+                    for t in frame.multi_tag_targets
+                    if t.getFiducialId() in frame.multi_tag.tag_ids
+                ),
+                key=lambda t: t.getBestCameraToTarget().translation().norm(),
+            )
+            features = self.get_target_features(closest)
+            features[FEATURES.index("ambiguity")] = 0.0
+            self.add_measurement(
+                frame.multi_tag.pose,
+                robot_pose,
+                frame.timestamp,
+                self.uncertainty.std_devs(features, len(frame.multi_tag.tag_ids)),
+            )
+            if self.should_log:
+                for t in frame.targets:
+                    if t.target.getFiducialId() in frame.multi_tag.tag_ids:
+                        self.log_target(t.target, t.best_pose, t.alt_pose)
+            return
+
+        vision_prediction = self.predict_from_vision(frame.timestamp, robot_pose)
+        for target, best_pose, alt_pose, self.last_pose_z in frame.targets:
+            choice = choose_pose(
                 best_pose,
                 alt_pose,
-                self.chassis_component.get_pose(),
+                robot_pose,
                 target.getPoseAmbiguity(),
+                vision_prediction,
             )
+            self.pose_choice_margin = choice.margin
 
-            # filter out likely bad targets
-            if target.getPoseAmbiguity() > 0.25 or abs(target.getYaw()) > 20:
+            # filter out likely bad targets, keeping ambiguous tags only
+            # when one of their poses is clearly right
+            if abs(target.getYaw()) > 20 or (
+                target.getPoseAmbiguity() > MAX_AMBIGUITY
+                and choice.margin < CLEAR_CHOICE_MARGIN
+            ):
                 continue
 
-            self.field_pos_obj.setPose(pose)
-            change = (
-                self.chassis_component.get_pose()
-                .translation()
-                .distance(pose.translation())
+            std_devs = self.uncertainty.std_devs(self.get_target_features(target))
+            if not self.add_measurement(
+                choice.pose, robot_pose, frame.timestamp, std_devs
+            ):
+                continue
+
+            if self.should_log:
+                self.log_target(target, best_pose, alt_pose)
+
+    def get_target_features(self, target: PhotonTrackedTarget) -> np.ndarray:
+        """Features of a target, for the uncertainty model."""
+        self.range = target.getBestCameraToTarget().translation().norm()
+        return get_features(
+            self.range,
+            target.getPoseAmbiguity(),
+            get_target_skew(target),
+            target.getArea(),
+            self.turret_component.get_velocity(),
+        )
+
+    def add_measurement(
+        self,
+        pose: Pose2d,
+        robot_pose: Pose2d,
+        timestamp: float,
+        std_devs: tuple[float, float, float],
+    ) -> bool:
+        """
+        Add a pose measured from a frame to the estimator, if it agrees with
+        where the estimator thought the robot was given how uncertain both
+        are, or relocalise if enough rejected measurements agree with each
+        other. Returns whether either happened.
+        """
+        self.field_publisher.set_pose(self.field_object_name, pose)
+        self.innovation = get_innovation(
+            pose, robot_pose, std_devs, self.get_estimator_std(timestamp, robot_pose)
+        )
+        if self.innovation > INNOVATION_GATE:
+            return self.relocalise(pose, robot_pose, timestamp, std_devs[0])
+
+        self.rejected.clear()
+        if self.add_to_estimator:
+            self.chassis_component.add_vision_measurement(pose, timestamp, std_devs)
+        self.last_measurement = (timestamp, pose)
+        return True
+
+    def get_estimator_std(self, timestamp: float, robot_pose: Pose2d) -> float:
+        """
+        How far (m) the estimator's position at a timestamp is expected to be
+        from the truth, from how far the robot had driven since this camera's
+        last measurement.
+        """
+        if self.last_measurement is None:
+            return ESTIMATOR_TRANSLATION_STD
+        last_timestamp, _ = self.last_measurement
+        if not 0 <= timestamp - last_timestamp <= VISION_HISTORY_AGE:
+            return ESTIMATOR_TRANSLATION_STD
+        driven = (
+            self.chassis_component.get_pose_at(last_timestamp)
+            .translation()
+            .distance(robot_pose.translation())
+        )
+        return min(ODOMETRY_STD + ODOMETRY_DRIFT * driven, ESTIMATOR_TRANSLATION_STD)
+
+    def relocalise(
+        self, pose: Pose2d, robot_pose: Pose2d, timestamp: float, std_dev: float
+    ) -> bool:
+        """
+        Remember a measurement the gate rejected, and move the robot to where
+        the recent rejected measurements put it if enough of them agree.
+        Returns whether the robot was moved.
+        """
+        rejected = self.rejected
+        while rejected and timestamp - rejected[0][0] > RELOCALISE_WINDOW:
+            rejected.popleft()
+        rejected.append((timestamp, pose, std_dev))
+        if len(rejected) < RELOCALISE_COUNT or not self.add_to_estimator:
+            return False
+
+        # Where each measurement puts the robot at the newest one's timestamp
+        moved = [
+            p.transformBy(
+                Transform2d(self.chassis_component.get_pose_at(t), robot_pose)
             )
-            if change > 1.0:
-                self.rejected_in_row += 1
-                if self.rejected_in_row < 20:
-                    continue
-            else:
-                self.rejected_in_row //= 2
+            for t, p, _ in rejected
+        ]
+        positions = np.array([(p.x, p.y) for p in moved])
+        weights = np.array([1 / std**2 for _, _, std in rejected])
+        mean = np.average(positions, axis=0, weights=weights)
+        scores = np.sum(np.square(positions - mean), axis=1) * weights
+        if (scores > RELOCALISE_GATE).any():
+            return False
 
-            if self.add_to_estimator:
-                self.chassis_component.estimator.addVisionMeasurement(
-                    pose,
-                    timestamp,
-                    (3.0, 3.0, 1.0),
-                )
+        # Keep the heading, which follows the gyro, and move by how far the
+        # robot has driven since the frame was captured
+        measured = Pose2d(mean[0], mean[1], robot_pose.rotation())
+        current = self.chassis_component.get_pose()
+        self.chassis_component.set_pose(
+            measured.transformBy(Transform2d(robot_pose, current))
+        )
+        self.relocalisations += 1
+        rejected.clear()
+        # The robot's history is gone, so nothing can be predicted from it
+        self.last_measurement = None
+        return True
 
-            if self.should_log:
-                ground_truth_pose = self.chassis_component.get_pose()
-                trans_error1: float = ground_truth_pose.translation().distance(
-                    best_pose.translation()
-                )
-                trans_error2: float = ground_truth_pose.translation().distance(
-                    alt_pose.translation()
-                )
-                rot_error1: float = (
-                    ground_truth_pose.rotation() - best_pose.rotation()
-                ).radians()
-                rot_error2: float = (
-                    ground_truth_pose.rotation() - alt_pose.rotation()
-                ).radians()
-                skew = get_target_skew(target)
-
-                self.pose_log_entry.append(
-                    [
-                        best_pose.x,
-                        best_pose.y,
-                        typing.cast(float, best_pose.rotation().radians()),
-                        trans_error1,  # error of main pose
-                        rot_error1,
-                        alt_pose.x,
-                        alt_pose.y,
-                        typing.cast(float, alt_pose.rotation().radians()),
-                        trans_error2,
-                        rot_error2,
-                        ground_truth_pose.x,
-                        ground_truth_pose.y,
-                        target.getYaw(),
-                        skew,
-                        target.getPoseAmbiguity(),
-                        target.getArea(),
-                        target.getFiducialId(),
-                    ]
-                )
+    def predict_from_vision(
+        self, timestamp: float, robot_pose: Pose2d
+    ) -> Optional[Pose2d]:
+        """
+        Where the last measurement from this camera puts the robot at a
+        timestamp, moved by how far odometry says the robot has moved since.
+        None if there's no measurement recent enough to trust.
+        """
+        if self.last_measurement is None:
+            return None
+        last_timestamp, last_pose = self.last_measurement
+        if not 0 <= timestamp - last_timestamp <= VISION_HISTORY_AGE:
+            return None
+        moved = Transform2d(
+            self.chassis_component.get_pose_at(last_timestamp), robot_pose
+        )
+        return last_pose.transformBy(moved)
+
+    def log_target(
+        self, target: PhotonTrackedTarget, best_pose: Pose2d, alt_pose: Pose2d
+    ) -> None:
+        if self.pose_log_entry is None:
+            return
+        ground_truth_pose = self.chassis_component.get_pose()
+        trans_error1: float = ground_truth_pose.translation().distance(
+            best_pose.translation()
+        )
+        trans_error2: float = ground_truth_pose.translation().distance(
+            alt_pose.translation()
+        )
+        rot_error1: float = (
+            ground_truth_pose.rotation() - best_pose.rotation()
+        ).radians()
+        rot_error2: float = (
+            ground_truth_pose.rotation() - alt_pose.rotation()
+        ).radians()
+        skew = get_target_skew(target)
+
+        self.pose_log_entry.append(
+            [
+                best_pose.x,
+                best_pose.y,
+                typing.cast(float, best_pose.rotation().radians()),
+                trans_error1,  # error of main pose
+                rot_error1,
+                alt_pose.x,
+                alt_pose.y,
+                typing.cast(float, alt_pose.rotation().radians()),
+                trans_error2,
+                rot_error2,
+                ground_truth_pose.x,
+                ground_truth_pose.y,
+                target.getYaw(),
+                skew,
+                target.getPoseAmbiguity(),
+                target.getArea(),
+                target.getFiducialId(),
+                target.getBestCameraToTarget().translation().norm(),
+                self.turret_component.get_velocity(),
+            ]
+        )
 
 
 def estimate_poses_from_apriltag(
     cam_to_robot: Transform3d, target: PhotonTrackedTarget
 ) -> Optional[tuple[Pose2d, Pose2d, float]]:
-    tag_id = target.getFiducialId()
-    tag_pose = apriltag_layout.getTagPose(tag_id)
+    tag_pose = get_tag_pose(target.getFiducialId())
     if tag_pose is None:
         return None
 
@@ -178,8 +496,82 @@ def get_target_skew(target: PhotonTrackedTarget):
     return math.atan2(tag_to_cam.y, tag_to_cam.x)
 
 
+class PoseChoice(NamedTuple):
+    pose: Pose2d
+    # Whether the alternate pose was chosen over the best one
+    is_alternate: bool
+    # How much less the chosen pose cost than the other
+    margin: float
+
+
+def get_pose_cost(
+    pose: Pose2d, robot_pose: Pose2d, vision_prediction: Optional[Pose2d]
+) -> float:
+    """
+    The sum of squared standard scores of a candidate pose against where
+    the estimator and recent vision measurements put the robot.
+    """
+    heading_error = constrain_angle(
+        pose.rotation().radians() - robot_pose.rotation().radians()
+    )
+    cost = (heading_error / ESTIMATOR_HEADING_STD) ** 2 + (
+        pose.translation().distance(robot_pose.translation())
+        / ESTIMATOR_TRANSLATION_STD
+    ) ** 2
+    if vision_prediction is not None:
+        cost += (
+            pose.translation().distance(vision_prediction.translation())
+            / VISION_PREDICTION_STD
+        ) ** 2
+    return cost
+
+
+def get_innovation(
+    pose: Pose2d,
+    robot_pose: Pose2d,
+    std_devs: tuple[float, float, float],
+    estimator_std: float,
+) -> float:
+    """
+    The squared standard score of a measured pose's difference from the
+    estimator's pose, with the variances of both the measurement and the
+    estimator's position.
+    """
+    translation_variance = estimator_std**2
+    heading_error = constrain_angle(
+        pose.rotation().radians() - robot_pose.rotation().radians()
+    )
+    return (
+        (pose.x - robot_pose.x) ** 2 / (std_devs[0] ** 2 + translation_variance)
+        + (pose.y - robot_pose.y) ** 2 / (std_devs[1] ** 2 + translation_variance)
+        + heading_error**2 / (std_devs[2] ** 2 + ESTIMATOR_HEADING_STD**2)
+    )
+
+
 def choose_pose(
-    best_pose: Pose2d, alternate_pose: Pose2d, cur_robot: Pose2d, ambiguity: float
-):
-    """Picks either the best or alternate pose estimate"""
-    return best_pose
+    best_pose: Pose2d,
+    alternate_pose: Pose2d,
+    cur_robot: Pose2d,
+    ambiguity: float,
+    vision_prediction: Optional[Pose2d] = None,
+) -> PoseChoice:
+    """
+    Picks either the best or alternate pose estimate, whichever agrees
+    better with the robot's heading and position at the time of the frame
+    and where recent vision measurements put it.
+
+    Args:
+        cur_robot: the estimator's pose at the frame's timestamp.
+        ambiguity: the ratio of the best pose's reprojection error to the
+            alternate's, or negative if it's unknown.
+        vision_prediction: where recent measurements put the robot, if any.
+    """
+    best_cost = get_pose_cost(best_pose, cur_robot, vision_prediction)
+    alternate_cost = get_pose_cost(alternate_pose, cur_robot, vision_prediction)
+    # The alternate fits the image worse: as its error is 1 / ambiguity
+    # times the best's, count that as a likelihood ratio between them
+    if ambiguity >= 0:
+        alternate_cost -= 2 * math.log(max(min(ambiguity, 1.0), 1e-6))
+    if alternate_cost < best_cost:
+        return PoseChoice(alternate_pose, True, best_cost - alternate_cost)
+    return PoseChoice(best_pose, False, alternate_cost - best_cost)
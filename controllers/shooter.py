@@ -1,5 +1,8 @@
 import math
+from typing import Optional
 
+import wpilib
+import wpiutil.log
 from magicbot import (
     StateMachine,
     default_state,
@@ -9,15 +12,34 @@ from magicbot import (
     tunable,
     will_reset_to,
 )
-from wpimath.geometry import Rotation3d, Transform3d, Translation3d
+from wpimath.geometry import Pose2d, Translation3d
+from wpimath.trajectory import TrapezoidProfileRadians
 
 from components.chassis import Chassis
 from components.intake import Intake
 from components.shooter import Shooter
 from components.tilt import Tilt
-from components.turret import ITurret, Turret
-from utilities import game
-from utilities.ballistics import GoalHeight, GridColumn, calculate_ballistics
+from components.turret import ITurret
+from utilities import game, loop_cache
+from utilities.ballistics import BallisticsSolution, calculate_ballistics
+from utilities.flip_planner import FlipPlanner
+from utilities.game import GoalHeight, GridColumn
+from utilities.instrumentation import StateTimer
+
+# Resolution of the robot pose used to decide whether a cached solution
+# still applies within a loop
+POSE_CACHE_QUANTUM = 0.005  # m
+HEADING_CACHE_QUANTUM = math.radians(0.25)
+
+STATES = ("preparing_intake", "intaking", "recovery", "tracking", "shooting")
+# What we wait on before moving between states
+READINESS_CONDITIONS = (
+    "solution_converged",
+    "shooter_ready",
+    "turret_at_angle",
+    "tilt_at_angle",
+)
+PERCENTILES = (50, 90)
 
 
 class ShooterController(StateMachine):
@@ -27,20 +49,61 @@ class ShooterController(StateMachine):
     tilt_component: Tilt
     turret_component: ITurret
 
+    control_loop_wait_time: float
+    data_log: wpiutil.log.DataLog
+
     try_shoot = will_reset_to(False)
     range = tunable(0.0)
+    shoot_while_moving = tunable(True)
+    solution_converged = tunable(True)
+
+    # Spin the flywheels up for the next shot while we don't have a cube ready
+    prespin = tunable(True)
+    prespin_fraction = tunable(0.6)
+    # How far ahead (s) to predict where we'll be shooting from
+    prespin_lookahead = tunable(0.5)
+    # Time from the cube loading until the shooter is ready to fire
+    time_to_ready = tunable(0.0)
 
     def __init__(self) -> None:
         self.goal_height_preference = GoalHeight.HIGH  # default preference
         self.column_preference = GridColumn.CENTRE  # selected hybrid node
         self.goal_id = -1  # No valid selection until controller is run
+        self.invalidate_solution()
+        self.flip_planner = FlipPlanner()
+        self.loaded_time: Optional[float] = None
+
+    def setup(self) -> None:
+        self.time_to_ready_log_entry = wpiutil.log.DoubleLogEntry(
+            self.data_log, "shooter_controller/time_to_ready"
+        )
+        self.state_timer = StateTimer(
+            self.data_log,
+            "shooter_controller",
+            states=STATES,
+            conditions=READINESS_CONDITIONS,
+            cycle_start_state="preparing_intake",
+            cycle_end_state="shooting",
+        )
+
+    def execute(self) -> None:
+        super().execute()
+        # The default state runs without being made the current state
+        self.state_timer.update(
+            self.current_state or "tracking", wpilib.Timer.getFPGATimestamp()
+        )
 
     @state(first=True, must_finish=True)
     def preparing_intake(self) -> None:
         self.tilt_component.goto_pre_intake()
         self.turret_component.set_angle(0.0)
 
-        if self.turret_component.at_angle() and self.tilt_component.at_angle():
+        ready = {
+            "turret_at_angle": self.turret_component.at_angle(),
+            "tilt_at_angle": self.tilt_component.at_angle(),
+        }
+        self.state_timer.record_blocked(ready, self.control_loop_wait_time)
+        if all(ready.values()):
             self.next_state("intaking")
 
     @state(must_finish=True)
@@ -52,6 +115,7 @@ class ShooterController(StateMachine):
         if self.shooter_component.is_loaded():
             self.intake_component.retract()
             self.shooter_component.set_has_cube()
+            self.loaded_time = wpilib.Timer.getFPGATimestamp()
             self.next_state("recovery")
 
     @state(must_finish=True)
@@ -59,20 +123,31 @@ class ShooterController(StateMachine):
         self.intake_component.retract()
         # raises tilt to move turret
         self.tilt_component.goto_pre_intake()
-        if self.tilt_component.at_angle():
+        if self.prespin:
+            self.prespin_flywheels()
+        tilt_at_angle = self.tilt_component.at_angle()
+        self.state_timer.record_blocked(
+            {"tilt_at_angle": tilt_at_angle}, self.control_loop_wait_time
+        )
+        if tilt_at_angle:
             self.next_state("tracking")
 
     @default_state
     def tracking(self) -> None:
         self.intake_component.retract()
         self.update_component_setpoints(run_shooter=self.shooter_component.is_loaded())
-
-        if (
-            self.try_shoot
-            and self.shooter_component.is_ready()
-            and self.turret_component.at_angle()
-            and self.tilt_component.at_angle()
-        ):
+        self.record_time_to_ready()
+
+        if not self.try_shoot:
+            return
+        ready = {
+            "solution_converged": self.solution_converged,
+            "shooter_ready": self.shooter_component.is_ready(),
+            "turret_at_angle": self.turret_component.at_angle(),
+            "tilt_at_angle": self.tilt_component.at_angle(),
+        }
+        self.state_timer.record_blocked(ready, self.control_loop_wait_time)
+        if all(ready.values()):
             self.next_state("shooting")
 
     @timed_state(must_finish=True, duration=1.0)
@@ -82,63 +157,117 @@ class ShooterController(StateMachine):
         self.shooter_component.clear_has_cube()
 
     def update_component_setpoints(self, run_shooter: bool) -> None:
-        position = self.get_target_position()
-        bs = calculate_ballistics(self.chassis_component.get_pose(), position)
+        bs = self.get_ballistics_solution()
         self.range = bs.range
-        # Check to see if we need to flip the shooter around
-        # If we are beyond the turret endpoints we have to flip
-        if bs.turret_angle < Turret.NEGATIVE_SOFT_LIMIT_ANGLE:
-            bs.turret_angle += math.pi
-            bs.tilt_angle = -bs.tilt_angle
-        if bs.turret_angle > Turret.POSITIVE_SOFT_LIMIT_ANGLE:
-            bs.turret_angle -= math.pi
-            bs.tilt_angle = -bs.tilt_angle
-
-        # We also have an overlap zone so that we don't keep flipping back and forth
-        if bs.turret_angle > math.pi / 2.0 and self.turret_component.get_angle() < 0.0:
-            # We are already flipped, so keep it flipped
-            bs.turret_angle -= math.pi
-            bs.tilt_angle = -bs.tilt_angle
-        if bs.turret_angle < -math.pi / 2.0 and self.turret_component.get_angle() > 0.0:
-            # We are already flipped, so keep it flipped
-            bs.turret_angle += math.pi
-            bs.tilt_angle = -bs.tilt_angle
-
-        self.turret_component.set_angle(bs.turret_angle)
-        self.tilt_component.set_angle(bs.tilt_angle)
+        self.solution_converged = bs.converged
+
+        # Aim with the shooter flipped over if that gets us there faster
+        turret_angle, tilt_angle = self.flip_planner.plan(
+            bs.turret_angle,
+            bs.tilt_angle,
+            TrapezoidProfileRadians.State(
+                self.turret_component.get_angle(),
+                self.turret_component.get_velocity(),
+            ),
+            TrapezoidProfileRadians.State(
+                self.tilt_component.get_angle(), self.tilt_component.get_velocity()
+            ),
+        )
+        self.turret_component.set_angle(turret_angle)
+        self.tilt_component.set_angle(tilt_angle)
         # We can be tracking the targets even if we don't have a cube
         # No need to run the flywheels if we can't shoot
         if run_shooter:
             self.shooter_component.set_flywheel_speed(
                 bs.top_flywheel_speed, bs.bottom_flywheel_speed
             )
+        elif self.prespin:
+            self.prespin_flywheels()
         else:
             self.shooter_component.stop()
 
-    def get_target_position(self) -> Translation3d:
-        robot_pose = self.chassis_component.get_pose()
-        best_tag_position, self.goal_id = game.find_closest_tag(robot_pose)
-        # Offset the tag position to be at the centre of the relevant goal
-        # Each goal is 42cm deep
-        if self.goal_height_preference == GoalHeight.HIGH:
-            depth = -(0.42 + 0.42 / 2.0)
-            height = 0.45
-            breadth = 0.0
-        elif self.goal_height_preference == GoalHeight.MID:
-            depth = -0.42 / 2.0
-            height = 0.05
-            breadth = 0.0
-        else:
-            depth = 0.42 / 2.0
-            height = -0.45
-            # distance between centre of cone nodes in a grid row is 44"
-            breadth = 44.0 / 2.0 * 0.0254 * self.column_preference.value
+    def prespin_flywheels(self) -> None:
+        """
+        Spin the flywheels up part way for where we expect to shoot from next,
+        so they have less to do once we have a cube.
+        """
+        pose = self.chassis_component.get_pose()
+        velocity = self.chassis_component.get_velocity()
+        predicted_pose = Pose2d(
+            pose.x + velocity.vx * self.prespin_lookahead,
+            pose.y + velocity.vy * self.prespin_lookahead,
+            pose.rotation(),
+        )
+        target_position = game.get_goal_position(
+            game.find_closest_grid_tag_id(predicted_pose),
+            self.goal_height_preference,
+            self.column_preference,
+        )
+        bs = calculate_ballistics(predicted_pose, target_position)
+        self.shooter_component.stop_back_motor()
+        self.shooter_component.set_flywheel_speed(
+            bs.top_flywheel_speed * self.prespin_fraction,
+            bs.bottom_flywheel_speed * self.prespin_fraction,
+        )
 
-        translation = Translation3d(depth, breadth, height)
-        transform = Transform3d(translation, Rotation3d())
+    def record_time_to_ready(self) -> None:
+        """Log how long the shooter took to be ready after loading a cube."""
+        if self.loaded_time is None or not self.shooter_component.is_ready():
+            return
+        self.time_to_ready = wpilib.Timer.getFPGATimestamp() - self.loaded_time
+        self.time_to_ready_log_entry.append(self.time_to_ready)
+        self.loaded_time = None
+
+    def invalidate_solution(self) -> None:
+        """Force the target and ballistics solution to be recalculated."""
+        self._solution_key: Optional[tuple] = None
+        self._target_position = Translation3d()
+        self._solution = BallisticsSolution(0.0, 0.0, 0.0, 0.0, 0.0)
+
+    def _solution_cache_key(self, robot_pose: Pose2d) -> tuple:
+        return (
+            loop_cache.iteration_timestamp(),
+            round(robot_pose.x / POSE_CACHE_QUANTUM),
+            round(robot_pose.y / POSE_CACHE_QUANTUM),
+            round(robot_pose.rotation().radians() / HEADING_CACHE_QUANTUM),
+            self.goal_height_preference,
+            self.column_preference,
+            self.shoot_while_moving,
+        )
+
+    def get_ballistics_solution(self) -> BallisticsSolution:
+        """
+        Get the ballistics solution to the selected goal from where we are now.
 
-        target = best_tag_position.transformBy(transform)
-        return target.translation()
+        This is cached for the rest of the loop unless the robot moves or the
+        selected goal changes. Don't modify the returned solution.
+        """
+        robot_pose = self.chassis_component.get_pose()
+        key = self._solution_cache_key(robot_pose)
+        if key != self._solution_key:
+            self._target_position = self._calculate_target_position(robot_pose)
+            velocity = (
+                self.chassis_component.get_velocity()
+                if self.shoot_while_moving
+                else None
+            )
+            self._solution = calculate_ballistics(
+                robot_pose, self._target_position, velocity
+            )
+            self._solution_key = key
+        return self._solution
+
+    def get_target_position(self) -> Translation3d:
+        """Get the position of the selected goal, cached like the solution."""
+        self.get_ballistics_solution()
+        return self._target_position
+
+    def _calculate_target_position(self, robot_pose: Pose2d) -> Translation3d:
+        tag_id = game.find_closest_grid_tag_id(robot_pose)
+        self.goal_id = tag_id
+        return game.get_goal_position(
+            tag_id, self.goal_height_preference, self.column_preference
+        )
 
     def shoot(self) -> None:
         self.try_shoot = True
@@ -170,6 +299,34 @@ class ShooterController(StateMachine):
     def prefer_low(self) -> None:
         self.goal_height_preference = GoalHeight.LOW
 
+    @feedback
+    def get_cycle_time_percentiles(self) -> list[float]:
+        """Median and 90th percentile of recent cycle times."""
+        return self.state_timer.cycle_times.percentiles(PERCENTILES)
+
+    @feedback
+    def get_state_dwell_percentiles(self) -> list[float]:
+        """Median and 90th percentile time in each state, in the order of STATES."""
+        return [
+            value
+            for state in STATES
+            for value in self.state_timer.dwell_times[state].percentiles(PERCENTILES)
+        ]
+
+    @feedback
+    def get_blocked_time_percentiles(self) -> list[float]:
+        """
+        Median and 90th percentile time per cycle blocked on each condition,
+        in the order of READINESS_CONDITIONS.
+        """
+        return [
+            value
+            for condition in READINESS_CONDITIONS
+            for value in self.state_timer.blocked_times[condition].percentiles(
+                PERCENTILES
+            )
+        ]
+
     @feedback
     def get_column_preference(self) -> str:
         return self.column_preference.name
@@ -182,6 +339,10 @@ class ShooterController(StateMachine):
     def get_goal_id(self) -> int:
         return self.goal_id
 
+    @feedback
+    def get_time_of_flight(self) -> float:
+        return self.get_ballistics_solution().time_of_flight
+
     @feedback
     def is_high_node_selected(self) -> bool:
         return self.goal_height_preference is GoalHeight.HIGH
@@ -0,0 +1,111 @@
+import math
+
+import wpilib
+import wpiutil.log
+from magicbot import feedback
+
+from components.chassis import Chassis
+from components.shooter import Shooter
+from components.tilt import (
+    NEGATIVE_SOFT_LIMIT_ANGLE,
+    POSITIVE_SOFT_LIMIT_ANGLE,
+    Tilt,
+)
+from components.turret import ITurret, Turret
+from utilities.sysid import Mechanism, SysIdRoutine, SysIdTest
+
+
+class SysId:
+    """
+    Characterises the robot's mechanisms in test mode.
+
+    The mechanism to characterise is selected on the dashboard. Its samples
+    are logged to the DataLog; fit them with `python -m tools.fit_sysid`.
+    """
+
+    chassis_component: Chassis
+    shooter_component: Shooter
+    tilt_component: Tilt
+    turret_component: ITurret
+
+    data_log: wpiutil.log.DataLog
+
+    def setup(self) -> None:
+        chassis = self.chassis_component
+        shooter = self.shooter_component
+        tilt = self.tilt_component
+        mechanisms = {
+            "drive": Mechanism(
+                chassis.set_drive_voltage,
+                chassis.read_drive_distance,
+                chassis.read_drive_speed,
+            ),
+            "steer": Mechanism(
+                chassis.set_steer_voltage,
+                chassis.read_steer_angle,
+                chassis.read_steer_velocity,
+            ),
+            "top_flywheel": Mechanism(
+                shooter.set_top_flywheel_voltage,
+                shooter.read_top_flywheel_position,
+                shooter.read_top_flywheel_velocity,
+            ),
+            "bottom_flywheel": Mechanism(
+                shooter.set_bottom_flywheel_voltage,
+                shooter.read_bottom_flywheel_position,
+                shooter.read_bottom_flywheel_velocity,
+            ),
+            # The tilt angle is from vertical, so gravity pulls hardest at
+            # pi/2. Shift it so the cosine of the position fits gravity.
+            "tilt": Mechanism(
+                tilt.set_voltage,
+                lambda: tilt.read_angle() - math.pi / 2,
+                min_position=NEGATIVE_SOFT_LIMIT_ANGLE - math.pi / 2,
+                max_position=POSITIVE_SOFT_LIMIT_ANGLE - math.pi / 2,
+                is_arm=True,
+            ),
+        }
+        turret = self.turret_component
+        if isinstance(turret, Turret):
+            mechanisms["turret"] = Mechanism(
+                turret.set_voltage,
+                turret.read_angle,
+                turret.read_velocity,
+                min_position=Turret.NEGATIVE_SOFT_LIMIT_ANGLE,
+                max_position=Turret.POSITIVE_SOFT_LIMIT_ANGLE,
+            )
+
+        self.routines = {
+            name: SysIdRoutine(self.data_log, name, mechanism)
+            for name, mechanism in mechanisms.items()
+        }
+        self.chooser = wpilib.SendableChooser()
+        for name in self.routines:
+            self.chooser.addOption(name, name)
+        self.chooser.setDefaultOption("drive", "drive")
+        wpilib.SmartDashboard.putData("SysId mechanism", self.chooser)
+
+    def run(self, test: SysIdTest) -> None:
+        """Run a test on the selected mechanism, if it isn't already."""
+        routine = self.routines[str(self.chooser.getSelected())]
+        if routine.test is not test:
+            self.stop()
+            routine.start(test)
+
+    def stop(self) -> None:
+        for routine in self.routines.values():
+            if routine.test is not None:
+                routine.stop()
+
+    @feedback
+    def running_test(self) -> str:
+        for name, routine in self.routines.items():
+            if routine.is_running() and routine.test is not None:
+                return f"{name} {routine.test.value}"
+        return ""
+
+    def on_disable(self) -> None:
+        self.stop()
+
+    def execute(self) -> None:
+        pass
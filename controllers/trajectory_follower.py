@@ -0,0 +1,118 @@
+import math
+from typing import Optional
+
+from magicbot import feedback, tunable
+from wpimath.controller import PIDController
+
+from components.chassis import Chassis
+from utilities import loop_cache
+from utilities.trajectory import Trajectory
+
+
+class TrajectoryFollower:
+    """
+    Drives the chassis along a trajectory, feeding forward the trajectory's
+    velocity and correcting the error in the pose with PID controllers.
+    """
+
+    chassis_component: Chassis
+
+    control_loop_wait_time: float
+
+    translation_kp = tunable(2.0)
+    translation_kd = tunable(0.0)
+    heading_kp = tunable(3.0)
+    heading_kd = tunable(0.0)
+
+    # How close (m, rad) the robot must get to the end of the trajectory
+    position_tolerance = tunable(0.05)
+    heading_tolerance = tunable(math.radians(3))
+    # Time (s) past the end of the trajectory we'll wait to get within tolerance
+    settle_timeout = tunable(1.0)
+
+    def setup(self) -> None:
+        period = self.control_loop_wait_time
+        self.x_controller = PIDController(self.translation_kp, 0, 0, period)
+        self.y_controller = PIDController(self.translation_kp, 0, 0, period)
+        self.heading_controller = PIDController(self.heading_kp, 0, 0, period)
+        self.heading_controller.enableContinuousInput(-math.pi, math.pi)
+
+        self.trajectory: Optional[Trajectory] = None
+        self.start_time = 0.0
+        self.position_error = 0.0
+        self.heading_error = 0.0
+        # Largest position error (m) seen following the current trajectory
+        self.max_position_error = 0.0
+
+    def follow(self, trajectory: Trajectory) -> None:
+        """Start following a trajectory from its beginning."""
+        self.trajectory = trajectory
+        self.start_time = loop_cache.iteration_timestamp()
+        self.position_error = 0.0
+        self.heading_error = 0.0
+        self.max_position_error = 0.0
+        for controller in (
+            self.x_controller,
+            self.y_controller,
+            self.heading_controller,
+        ):
+            controller.reset()
+
+    def stop(self) -> None:
+        self.trajectory = None
+
+    def on_disable(self) -> None:
+        self.stop()
+
+    def elapsed(self) -> float:
+        return loop_cache.iteration_timestamp() - self.start_time
+
+    def is_following(self) -> bool:
+        return self.trajectory is not None
+
+    def is_finished(self) -> bool:
+        """Whether we've reached the end of the trajectory, or given up trying."""
+        if self.trajectory is None:
+            return True
+        remaining = self.trajectory.duration - self.elapsed()
+        if remaining > 0:
+            return False
+        return (
+            self.position_error < self.position_tolerance
+            and abs(self.heading_error) < self.heading_tolerance
+        ) or -remaining > self.settle_timeout
+
+    @feedback
+    def get_position_error(self) -> float:
+        return self.position_error
+
+    @feedback
+    def get_max_position_error(self) -> float:
+        return self.max_position_error
+
+    @feedback
+    def get_heading_error(self) -> float:
+        return self.heading_error
+
+    def execute(self) -> None:
+        if self.trajectory is None:
+            return
+        x, y, heading, vx, vy, omega = self.trajectory.sample(self.elapsed())
+        pose = self.chassis_component.get_pose()
+        current_heading = pose.rotation().radians()
+
+        for controller, kp, kd in (
+            (self.x_controller, self.translation_kp, self.translation_kd),
+            (self.y_controller, self.translation_kp, self.translation_kd),
+            (self.heading_controller, self.heading_kp, self.heading_kd),
+        ):
+            controller.setPID(kp, 0, kd)
+        vx += self.x_controller.calculate(pose.x, x)
+        vy += self.y_controller.calculate(pose.y, y)
+        omega += self.heading_controller.calculate(current_heading, heading)
+
+        self.position_error = math.hypot(x - pose.x, y - pose.y)
+        self.heading_error = self.heading_controller.getPositionError()
+        self.max_position_error = max(self.max_position_error, self.position_error)
+
+        self.chassis_component.drive_field(vx, vy, omega)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import cmath
 import math
 import typing
 
@@ -8,14 +9,18 @@ from pyfrc.physics.core import PhysicsInterface
 from wpilib.simulation import (
     SimDeviceSim,
 )
-from wpimath.kinematics import SwerveDrive4Kinematics
+from wpimath.kinematics import ChassisSpeeds, SwerveDrive4Kinematics
 
 from components.chassis import SwerveModule
 from utilities.ctre import FALCON_CPR, VERSA_ENCODER_CPR
+from utilities.traction import GRAVITY
 
 if typing.TYPE_CHECKING:
     from robot import Robot
 
+# The most the carpet can accelerate the robot at before its wheels slip
+MAX_TRACTION_ACCELERATION = 1.1 * GRAVITY
+
 
 class SimpleTalonFXMotorSim:
     def __init__(self, motor: ctre.TalonFX, kV: float, rev_per_unit: float) -> None:
@@ -70,6 +75,12 @@ class PhysicsEngine:
 
         self.imu = SimDeviceSim("navX-Sensor", 4)
         self.imu_yaw = self.imu.getDouble("Yaw")
+        self.imu_accel_x = self.imu.getDouble("LinearWorldAccelX")
+        self.imu_accel_y = self.imu.getDouble("LinearWorldAccelY")
+
+        # Robot relative velocity of the robot itself, which lags the
+        # wheels when they slip
+        self.velocity = 0j
 
     def update_sim(self, now: float, tm_diff: float) -> None:
         for wheel in self.wheels:
@@ -83,4 +94,23 @@ class PhysicsEngine:
 
         self.imu_yaw.set(self.imu_yaw.get() - math.degrees(speeds.omega * tm_diff))
 
-        self.physics_controller.drive(speeds, tm_diff)
+        # The robot accelerates towards the wheels' velocity as fast as
+        # traction lets it, while its velocity turns in its own frame
+        velocity = self.velocity * cmath.exp(-1j * speeds.omega * tm_diff)
+        change = complex(speeds.vx, speeds.vy) - velocity
+        max_change = MAX_TRACTION_ACCELERATION * tm_diff
+        if abs(change) > max_change:
+            change *= max_change / abs(change)
+        self.velocity = velocity + change
+        # The navX measures acceleration in the world frame, and its yaw is
+        # clockwise where the robot's heading is anticlockwise
+        heading = -math.radians(self.imu_yaw.get())
+        world_change = change * cmath.exp(1j * heading)
+        if tm_diff > 0:
+            self.imu_accel_x.set(world_change.real / tm_diff / GRAVITY)
+            self.imu_accel_y.set(world_change.imag / tm_diff / GRAVITY)
+
+        self.physics_controller.drive(
+            ChassisSpeeds(self.velocity.real, self.velocity.imag, speeds.omega),
+            tm_diff,
+        )
@@ -7,11 +7,8 @@ import magicbot
 import wpilib
 import wpilib.event
 from wpimath.geometry import (
-    Pose2d,
-    Rotation2d,
     Rotation3d,
     Transform2d,
-    Translation2d,
     Translation3d,
 )
 
@@ -22,13 +19,20 @@ from components.tilt import Tilt
 from components.turret import ITurret
 from components.vision import VisualLocaliser
 from controllers.shooter import ShooterController
+from controllers.sysid import SysId
+from controllers.trajectory_follower import TrajectoryFollower
+from utilities import loop_cache
 from utilities.game import TagId, get_fiducial_pose, get_grid_tag_ids, is_red
 from utilities.scalers import rescale_js, scale_value
+from utilities.sysid import SysIdTest
+from utilities.telemetry import FieldPublisher
 
 
 class Robot(magicbot.MagicRobot):
     # Controllers
     shooter_controller: ShooterController
+    trajectory_follower: TrajectoryFollower
+    sysid: SysId
 
     # Components
     chassis_component: Chassis
@@ -40,7 +44,16 @@ class Robot(magicbot.MagicRobot):
     rear_localiser: VisualLocaliser
 
     SPIN_RATE = 4.0
+    # Publish the field from a background thread rather than the main loop
+    PUBLISH_FIELD_IN_THREAD = False
+    # Estimate poses from camera frames in background threads
+    VISION_IN_THREAD = False
+    # Rate (Hz) to update odometry at from a background thread,
+    # or 0 to update it once per loop from the chassis' execute
+    ODOMETRY_RATE = 0.0
     MAX_SPEED = magicbot.tunable(Chassis.max_wheel_speed * 0.95)
+    # Turn off to read hardware every time a getter is called, for debugging
+    cache_hardware_reads = magicbot.tunable(True)
 
     def createObjects(self) -> None:
         self.data_log = wpilib.DataLogManager.getLog()
@@ -54,6 +67,7 @@ class Robot(magicbot.MagicRobot):
 
         self.field = wpilib.Field2d()
         wpilib.SmartDashboard.putData(self.field)
+        self.field_publisher = FieldPublisher(self.field)
 
         self.front_localiser_name = "cam_front"
         # Relative to turret centre
@@ -67,6 +81,13 @@ class Robot(magicbot.MagicRobot):
 
     def robotInit(self) -> None:
         super().robotInit()
+        if self.PUBLISH_FIELD_IN_THREAD:
+            self.field_publisher.start_thread()
+        if self.VISION_IN_THREAD:
+            self.front_localiser.start_thread()
+            self.rear_localiser.start_thread()
+        if self.ODOMETRY_RATE > 0:
+            self.chassis_component.start_odometry_thread(self.ODOMETRY_RATE)
         # Bind events to component methods after components are created.
         self.pov_up.rising().ifHigh(self.shooter_controller.select_up)
         self.pov_down.rising().ifHigh(self.shooter_controller.select_down)
@@ -76,20 +97,29 @@ class Robot(magicbot.MagicRobot):
     def robotPeriodic(self) -> None:
         super().robotPeriodic()
         position = self.shooter_controller.get_target_position()
-        self.field.getObject("target").setPose(
-            Pose2d(Translation2d(position.x, position.y), Rotation2d())
+        self.field_publisher.set_pose_xy("target", position.x, position.y, 0.0)
+        robot_pose = self.chassis_component.get_pose()
+        self.field_publisher.set_pose_xy(
+            "turret",
+            robot_pose.x,
+            robot_pose.y,
+            robot_pose.rotation().radians() + self.turret_component.get_angle(),
         )
-        abs_turret_rotation = Rotation2d(
-            self.chassis_component.get_pose().rotation().radians()
-            + self.turret_component.get_angle()
-        )
-        turret_pose = Pose2d(
-            self.chassis_component.get_pose().translation(), abs_turret_rotation
-        )
-        self.field.getObject("turret").setPose(turret_pose)
+        if self.field_publisher.thread is None:
+            self.field_publisher.publish(wpilib.Timer.getFPGATimestamp())
+
+        # This is the last thing to run in every mode, so anything cached
+        # from here on belongs to the next iteration of the loop.
+        loop_cache.enabled = self.cache_hardware_reads
+        loop_cache.start_iteration(wpilib.Timer.getFPGATimestamp())
+
+    @magicbot.feedback
+    def get_hardware_reads_per_loop(self) -> int:
+        """Number of hardware reads made by getters in the last loop."""
+        return loop_cache.reads_last_iteration()
 
     def disabledInit(self) -> None:
-        pass
+        self.sysid.stop()
 
     def disabledPeriodic(self) -> None:
         tag_id: Optional[TagId] = None
@@ -104,6 +134,7 @@ class Robot(magicbot.MagicRobot):
             bumper_up_trans = Transform2d(0.42 + Chassis.LENGTH / 2, 0, 0)
             pose = get_fiducial_pose(tag_id).toPose2d() + bumper_up_trans
             self.chassis_component.set_pose(pose)
+            self.shooter_controller.invalidate_solution()
 
         self.turret_component.maybe_rezero_off_limits_switches()
         self.turret_component.disabled_periodic()
@@ -118,7 +149,7 @@ class Robot(magicbot.MagicRobot):
         pass
 
     def teleopInit(self) -> None:
-        pass
+        self.trajectory_follower.stop()
 
     def teleopPeriodic(self) -> None:
         # Scale speeds so fully depressing a trigger is half speed.
@@ -156,6 +187,22 @@ class Robot(magicbot.MagicRobot):
         self.tilt_component.set_angle(self.tilt_component.get_angle())
 
     def testPeriodic(self) -> None:
+        # System identification of the mechanism selected on the dashboard
+        if self.gamepad.getBackButton():
+            if self.gamepad.getAButton():
+                self.sysid.run(SysIdTest.QUASISTATIC_FORWARD)
+            elif self.gamepad.getBButton():
+                self.sysid.run(SysIdTest.QUASISTATIC_REVERSE)
+            elif self.gamepad.getXButton():
+                self.sysid.run(SysIdTest.DYNAMIC_FORWARD)
+            elif self.gamepad.getYButton():
+                self.sysid.run(SysIdTest.DYNAMIC_REVERSE)
+            else:
+                self.sysid.stop()
+            # Don't let the components fight the test for their motors
+            return
+        self.sysid.stop()
+
         # Turret
         if self.gamepad.getYButton():
             dpad_angle = self.gamepad.getPOV()
@@ -0,0 +1,136 @@
+import math
+
+import numpy as np
+from hypothesis import given
+from hypothesis import strategies as st
+from wpimath.geometry import Pose2d, Translation3d
+from wpimath.kinematics import ChassisSpeeds
+
+from components.turret import Turret
+from utilities.ballistics import (
+    BALLISTICS_TABLES,
+    BallisticsSolution,
+    calculate_ballistics,
+    calculate_ballistics_batch,
+)
+
+ranges = st.floats(-1.0, 8.0)
+angles = st.floats(-math.pi, math.pi)
+coordinates = st.floats(0.0, 16.0)
+heights = st.sampled_from([0.0, 0.5, 0.9])
+
+
+@given(target_range=ranges)
+def test_table_matches_interp(target_range: float) -> None:
+    for table in BALLISTICS_TABLES.values():
+        expected = [
+            np.interp(target_range, table.ranges, column) for column in table.values.T
+        ]
+        np.testing.assert_allclose(table.lookup(target_range), expected, atol=1e-9)
+        np.testing.assert_allclose(
+            table.lookup_many([target_range])[0], expected, atol=1e-9
+        )
+
+
+def test_table_beyond_max_range() -> None:
+    for table in BALLISTICS_TABLES.values():
+        _, top_speed, bottom_speed, _ = table.lookup(6.0)
+        assert top_speed == 0.0
+        assert bottom_speed == 0.0
+
+
+@given(x=coordinates, y=coordinates, heading=angles, z=heights)
+def test_batch_matches_single(x: float, y: float, heading: float, z: float) -> None:
+    target = Translation3d(1.0, 2.0, z)
+    single = calculate_ballistics(Pose2d(x, y, heading), target)
+    batch = calculate_ballistics_batch(
+        np.array([[x, y, heading]]), (target.x, target.y, target.z)
+    )
+    assert math.isclose(batch.range[0], single.range, abs_tol=1e-9)
+    assert math.isclose(batch.tilt_angle[0], single.tilt_angle, abs_tol=1e-9)
+    assert math.isclose(
+        batch.top_flywheel_speed[0], single.top_flywheel_speed, abs_tol=1e-9
+    )
+    assert math.isclose(
+        batch.bottom_flywheel_speed[0], single.bottom_flywheel_speed, abs_tol=1e-9
+    )
+    # Compare on the circle so angles either side of +-pi agree
+    assert math.isclose(
+        math.cos(batch.turret_angle[0] - single.turret_angle), 1.0, abs_tol=1e-9
+    )
+
+
+def lead_miss_distance(
+    robot_pose: Pose2d,
+    target: Translation3d,
+    velocity: ChassisSpeeds,
+    bs: BallisticsSolution,
+) -> float:
+    """How far from the target a cube fired with this solution would land."""
+    heading = robot_pose.rotation().radians()
+    turret = robot_pose.translation() + Turret.TRANSLATION3D.toTranslation2d().rotateBy(
+        robot_pose.rotation()
+    )
+    aim = heading + bs.turret_angle
+    landing_x = (
+        turret.x
+        + (math.cos(aim) * bs.range / bs.time_of_flight + velocity.vx)
+        * bs.time_of_flight
+    )
+    landing_y = (
+        turret.y
+        + (math.sin(aim) * bs.range / bs.time_of_flight + velocity.vy)
+        * bs.time_of_flight
+    )
+    return math.hypot(landing_x - target.x, landing_y - target.y)
+
+
+def test_stationary_lead_matches_stationary_solve() -> None:
+    pose = Pose2d(3.0, 1.0, 0.5)
+    target = Translation3d(1.0, 2.0, 0.9)
+    still = calculate_ballistics(pose, target)
+    moving = calculate_ballistics(pose, target, ChassisSpeeds(0, 0, 0))
+    assert moving == still
+
+
+@given(
+    vx=st.floats(-2.0, 2.0),
+    vy=st.floats(-2.0, 2.0),
+    x=st.floats(2.0, 4.0),
+    y=st.floats(1.0, 3.0),
+)
+def test_lead_converges_at_driving_speeds(
+    vx: float, vy: float, x: float, y: float
+) -> None:
+    # Well within range at moderate driving speeds,
+    # the virtual target should settle and the cube should land on the goal
+    pose = Pose2d(x, y, 0.0)
+    target = Translation3d(1.0, 2.0, 0.9)
+    velocity = ChassisSpeeds(vx, vy, 0.0)
+    bs = calculate_ballistics(pose, target, velocity)
+    assert bs.converged
+    assert lead_miss_distance(pose, target, velocity, bs) < 0.05
+
+
+def test_lead_out_of_range_when_driving_away() -> None:
+    # In range when stationary, but the cube has to fly too far on the move
+    pose = Pose2d(5.5, 2.0, 0.0)
+    target = Translation3d(1.0, 2.0, 0.9)
+    still = calculate_ballistics(pose, target)
+    assert still.converged
+    assert still.top_flywheel_speed > 0
+
+    bs = calculate_ballistics(pose, target, ChassisSpeeds(3.0, 0.0, 0.0))
+    assert not bs.converged
+    assert bs.range > still.range
+    assert bs.top_flywheel_speed == 0.0
+
+
+@given(speed=st.floats(8.0, 15.0))
+def test_lead_breaks_down_beyond_cube_speed(speed: float) -> None:
+    # Once the robot moves about as fast as the cube does downrange,
+    # the virtual target is pushed out beyond anything we can shoot at
+    pose = Pose2d(3.0, 2.0, 0.0)
+    target = Translation3d(1.0, 2.0, 0.9)
+    bs = calculate_ballistics(pose, target, ChassisSpeeds(-speed, 0.0, 0.0))
+    assert not bs.converged
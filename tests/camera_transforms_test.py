@@ -0,0 +1,45 @@
+import math
+
+from hypothesis import given
+from hypothesis import strategies as st
+from wpimath.geometry import Pose3d, Rotation3d, Translation3d
+
+from components.turret import Turret
+from utilities.camera_transforms import (
+    CameraTransformCache,
+    get_camera_to_robot,
+    get_tag_pose,
+)
+
+CAMERA_POSITION = Translation3d(0.05, 0.02, 0.53)
+CAMERA_ROTATION = Rotation3d(0, math.radians(-15), math.radians(3))
+CACHE = CameraTransformCache(CAMERA_POSITION, CAMERA_ROTATION, Turret.TRANSLATION3D)
+
+
+@given(st.floats(-10, 10))
+def test_cache_matches_exact_transform(turret_angle: float) -> None:
+    exact = get_camera_to_robot(
+        CAMERA_POSITION, CAMERA_ROTATION, Turret.TRANSLATION3D, turret_angle
+    )
+    cached = CACHE.camera_to_robot(turret_angle)
+    # Where a tag 5 m in front of the camera puts the robot
+    tag = Pose3d(5, 0, 0, Rotation3d())
+    assert (
+        tag.transformBy(cached)
+        .translation()
+        .distance(tag.transformBy(exact).translation())
+        < 5 * CACHE.step
+    )
+    assert CACHE.camera_to_robot(turret_angle) is cached
+
+
+def test_cache_wraps() -> None:
+    assert CACHE.get_index(math.pi) == CACHE.get_index(-math.pi) == 0
+    assert CACHE.camera_to_robot(math.tau + 0.5) is CACHE.camera_to_robot(0.5)
+
+
+def test_tag_pose() -> None:
+    assert get_tag_pose(42) is None
+    tag = get_tag_pose(7)
+    assert tag is not None
+    assert tag.x > 0
@@ -0,0 +1,76 @@
+import logging
+import time
+
+import pytest
+import wpilib
+from conftest import SharedLog
+from magicbot.magic_tunable import setup_tunables
+from wpilib.simulation import SimDeviceSim, stepTiming
+
+from components.chassis import Chassis, SwerveModule
+from components.turret import ITurret
+from utilities import loop_cache
+from utilities.telemetry import FieldPublisher
+from utilities.traction import GRAVITY
+
+
+def test_module_sensors_read_once_per_loop() -> None:
+    module = SwerveModule(0.3, 0.3, 51, 52, 53)
+
+    loop_cache.start_iteration(1.0)
+    module.get()
+    module.get_position()
+    module.get_speed()
+    module.get_angle_integrated()
+    module.get_rotation()
+    loop_cache.start_iteration(1.02)
+    assert loop_cache.reads_last_iteration() == 3
+
+    module.get_position()
+    # Resetting the steer encoder needs a fresh read
+    module.sync_steer_encoders()
+    module.get()
+    loop_cache.start_iteration(1.04)
+    assert loop_cache.reads_last_iteration() == 6
+
+
+def test_module_sensors_uncached() -> None:
+    module = SwerveModule(0.3, 0.3, 54, 55, 56)
+
+    loop_cache.enabled = False
+    try:
+        loop_cache.start_iteration(1.0)
+        module.get()
+        module.get_position()
+        loop_cache.start_iteration(1.02)
+    finally:
+        loop_cache.enabled = True
+    assert loop_cache.reads_last_iteration() == 6
+
+
+def test_imu_acceleration_robot_relative(shared_log: SharedLog) -> None:
+    chassis = Chassis()
+    chassis.control_loop_wait_time = 0.02
+    chassis.field_publisher = FieldPublisher(wpilib.Field2d())
+    chassis.logger = logging.getLogger("chassis")
+    chassis.data_log = shared_log.data_log
+    chassis.turret_component = ITurret()
+    setup_tunables(chassis, "chassis")
+    chassis.setup()
+
+    imu = SimDeviceSim("navX-Sensor", 4)
+    # Facing the field's +y, accelerating towards the field's -x
+    imu.getDouble("Yaw").set(-90)
+    imu.getDouble("LinearWorldAccelX").set(-0.5)
+    imu.getDouble("LinearWorldAccelY").set(0)
+    # The navX picks up its simulated values on its own thread
+    deadline = time.monotonic() + 2.0
+    while chassis.imu.getYaw() != -90:
+        assert time.monotonic() < deadline
+        stepTiming(0.01)
+        time.sleep(0.001)
+    loop_cache.start_iteration(1.0)
+    acceleration = chassis.get_imu_acceleration()
+    # which is to the robot's left
+    assert acceleration.real == pytest.approx(0, abs=1e-9)
+    assert acceleration.imag == pytest.approx(0.5 * GRAVITY)
@@ -0,0 +1,102 @@
+import pathlib
+import struct
+import time
+import uuid
+
+import pytest
+import wpilib
+import wpiutil.log
+
+from utilities.wpilog import CONTROL_START, HEADER, Record, read_records
+
+
+class SharedLog:
+    """
+    Writes to the DataLog the robot uses, under names unique to a test, and
+    reads back what was written.
+
+    DataLogs created in tests crash the interpreter when they're destroyed,
+    so the one DataLogManager keeps for the whole session is used instead.
+    """
+
+    def __init__(self) -> None:
+        self.data_log: wpiutil.log.DataLog = wpilib.DataLogManager.getLog()
+        self.prefix = f"test_{uuid.uuid4().hex[:8]}_"
+
+    def name(self, name: str) -> str:
+        """A name for an entry that no other test uses."""
+        return self.prefix + name
+
+    def wait_for(self, count: int, timeout: float = 5.0) -> pathlib.Path:
+        """
+        Wait until at least count records with this test's names have been
+        written, and return the file they were written to.
+        """
+        self.data_log.flush()
+        log_dir = pathlib.Path(wpilib.DataLogManager.getLogDir())
+        deadline = time.monotonic() + timeout
+        while True:
+            for path in log_dir.glob("*.wpilog"):
+                if len(self.read(path)) >= count:
+                    return path
+            assert time.monotonic() < deadline, "records weren't written"
+            time.sleep(0.05)
+
+    def read(self, path: pathlib.Path) -> list[Record]:
+        try:
+            return [
+                record for record in read_records(path) if self.prefix in record.name
+            ]
+        except (FileNotFoundError, ValueError):
+            # Still being created, or renamed
+            return []
+
+
+def encode_record(entry: int, timestamp: int, payload: bytes) -> bytes:
+    """Encode a record with the widest fields, unlike DataLog."""
+    return (
+        bytes([0b0111_1111])
+        + struct.pack("<IIQ", entry, len(payload), timestamp)
+        + payload
+    )
+
+
+def encode_string(string: str) -> bytes:
+    return struct.pack("<I", len(string)) + string.encode()
+
+
+def encode_start(entry: int, name: str, entry_type: str) -> bytes:
+    payload = (
+        bytes([CONTROL_START])
+        + struct.pack("<I", entry)
+        + encode_string(name)
+        + encode_string(entry_type)
+        + encode_string("")
+    )
+    return encode_record(0, 0, payload)
+
+
+def encode_log(*records: bytes) -> bytes:
+    extra_header = b"extra"
+    return (
+        HEADER
+        + struct.pack("<HI", 0x0100, len(extra_header))
+        + extra_header
+        + b"".join(records)
+    )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def data_log_dir(tmp_path_factory: pytest.TempPathFactory) -> pathlib.Path:
+    """
+    Start DataLogManager in a temporary directory before anything else
+    starts it, so the tests' logs aren't written into the working directory.
+    """
+    log_dir = tmp_path_factory.mktemp("logs")
+    wpilib.DataLogManager.start(str(log_dir))
+    return log_dir
+
+
+@pytest.fixture
+def shared_log() -> SharedLog:
+    return SharedLog()
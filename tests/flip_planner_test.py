@@ -0,0 +1,46 @@
+import math
+
+from wpimath.trajectory import TrapezoidProfileRadians
+
+from utilities.flip_planner import FlipPlanner
+
+State = TrapezoidProfileRadians.State
+
+
+def test_flips_beyond_turret_limits() -> None:
+    planner = FlipPlanner()
+    turret_angle, tilt_angle = planner.plan(
+        math.radians(150), 0.5, State(0.0, 0.0), State(0.5, 0.0)
+    )
+    assert turret_angle == math.radians(150) - math.pi
+    assert tilt_angle == -0.5
+    assert planner.flipped
+
+
+def test_picks_faster_option_in_overlap() -> None:
+    planner = FlipPlanner()
+    # The target is just within the turret's positive limit,
+    # but the turret is already most of the way there flipped
+    target = math.radians(100)
+    turret_angle, tilt_angle = planner.plan(
+        target, 0.0, State(target - math.pi, 0.0), State(0.0, 0.0)
+    )
+    assert turret_angle == target - math.pi
+    assert planner.flipped
+
+    turret_angle, tilt_angle = planner.plan(
+        target, 0.0, State(math.radians(90), 0.0), State(0.0, 0.0)
+    )
+    assert turret_angle == target
+    assert not planner.flipped
+
+
+def test_hysteresis() -> None:
+    planner = FlipPlanner(hysteresis=10.0)
+    planner.flipped = True
+    # Not flipping would be quicker, but not by enough to change our mind
+    target = math.radians(100)
+    turret_angle, _ = planner.plan(
+        target, 0.0, State(math.radians(90), 0.0), State(0.0, 0.0)
+    )
+    assert turret_angle == target - math.pi
@@ -0,0 +1,45 @@
+import math
+
+from hypothesis import given
+from hypothesis import strategies as st
+from wpimath.geometry import Pose2d, Rotation2d, Translation2d, Twist2d
+from wpimath.kinematics import ChassisSpeeds
+
+from utilities.functions import discretise_speeds
+
+velocities = st.floats(-4.0, 4.0)
+rotation_rates = st.floats(-10.0, 10.0)
+
+
+@given(vx=velocities, vy=velocities, omega=rotation_rates)
+def test_discretised_speeds_reach_straight_line_pose(
+    vx: float, vy: float, omega: float
+) -> None:
+    dt = 0.02
+    speeds = discretise_speeds(ChassisSpeeds(vx, vy, omega), dt)
+    assert math.isclose(speeds.omega, omega, abs_tol=1e-9)
+
+    # Holding the discretised speeds for dt ends up where translating at the
+    # commanded speeds in the starting frame would
+    pose = Pose2d().exp(Twist2d(speeds.vx * dt, speeds.vy * dt, speeds.omega * dt))
+    assert math.isclose(pose.x, vx * dt, abs_tol=1e-9)
+    assert math.isclose(pose.y, vy * dt, abs_tol=1e-9)
+
+
+@given(vx=velocities, vy=velocities, omega=rotation_rates)
+def test_latency_rotates_translation(vx: float, vy: float, omega: float) -> None:
+    latency = 0.1
+    translation = Translation2d(vx, vy).rotateBy(Rotation2d(-omega * latency))
+    expected = discretise_speeds(
+        ChassisSpeeds(translation.x, translation.y, omega), 0.02
+    )
+    speeds = discretise_speeds(ChassisSpeeds(vx, vy, omega), 0.02, latency)
+    assert math.isclose(speeds.vx, expected.vx, abs_tol=1e-9)
+    assert math.isclose(speeds.vy, expected.vy, abs_tol=1e-9)
+
+
+def test_no_rotation_unchanged() -> None:
+    speeds = discretise_speeds(ChassisSpeeds(1.5, -2.0, 0.0), 0.02, 0.1)
+    assert math.isclose(speeds.vx, 1.5)
+    assert math.isclose(speeds.vy, -2.0)
+    assert speeds.omega == 0.0
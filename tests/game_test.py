@@ -0,0 +1,45 @@
+import itertools
+from unittest import mock
+
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+from wpimath.geometry import Pose2d, Rotation3d, Transform3d
+
+from utilities import game
+from utilities.game import GoalHeight, GridColumn
+
+
+@pytest.mark.parametrize(
+    "tag_id, goal_height, column",
+    list(itertools.product(range(1, 9), GoalHeight, GridColumn)),
+)
+def test_goal_positions(
+    tag_id: game.TagId, goal_height: GoalHeight, column: GridColumn
+) -> None:
+    expected = (
+        game.get_fiducial_pose(tag_id)
+        .transformBy(
+            Transform3d(game.get_goal_offset(goal_height, column), Rotation3d())
+        )
+        .translation()
+    )
+    assert game.get_goal_position(tag_id, goal_height, column) == expected
+
+
+@given(
+    x=st.floats(0, game.FIELD_LENGTH),
+    y=st.floats(0, game.FIELD_WIDTH),
+    red=st.booleans(),
+)
+def test_find_closest_grid_tag(x: float, y: float, red: bool) -> None:
+    pose = Pose2d(x, y, 0)
+    with mock.patch("utilities.game.is_red", return_value=red):
+        tag_ids = game.get_grid_tag_ids()
+        expected = min(
+            tag_ids,
+            key=lambda tag_id: pose.translation().distance(
+                game.get_fiducial_pose(tag_id).toPose2d().translation()
+            ),
+        )
+        assert game.find_closest_grid_tag_id(pose) == expected
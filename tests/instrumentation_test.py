@@ -0,0 +1,43 @@
+import pytest
+from conftest import SharedLog
+
+from utilities.instrumentation import StateTimer
+
+
+def test_state_timer(shared_log: SharedLog) -> None:
+    timer = StateTimer(
+        shared_log.data_log,
+        shared_log.name("timer"),
+        states=("loading", "aiming", "shooting"),
+        conditions=("at_angle", "at_speed"),
+        cycle_start_state="loading",
+        cycle_end_state="shooting",
+    )
+    timer.update("loading", 1.0)
+    timer.update("aiming", 2.0)
+    timer.record_blocked({"at_angle": False, "at_speed": False}, 0.5)
+    timer.record_blocked({"at_angle": True, "at_speed": False}, 0.5)
+    timer.update("aiming", 3.0)
+    timer.update("shooting", 3.5)
+    timer.update("loading", 4.5)
+
+    assert timer.dwell_times["loading"].percentiles([50]) == [1.0]
+    assert timer.dwell_times["aiming"].percentiles([50]) == [1.5]
+    assert timer.dwell_times["shooting"].percentiles([50]) == [1.0]
+    assert timer.cycle_times.percentiles([50]) == [3.5]
+    assert timer.blocked_times["at_angle"].percentiles([50]) == [0.5]
+    assert timer.blocked_times["at_speed"].percentiles([50]) == [1.0]
+    # The next cycle starts with nothing blocked
+    assert timer.cycle_blocked == {"at_angle": 0.0, "at_speed": 0.0}
+
+
+def test_percentiles_before_samples(shared_log: SharedLog) -> None:
+    timer = StateTimer(
+        shared_log.data_log,
+        shared_log.name("timer"),
+        states=("a",),
+        conditions=(),
+        cycle_start_state="a",
+        cycle_end_state="a",
+    )
+    assert timer.cycle_times.percentiles([50, 90]) == pytest.approx([0.0, 0.0])
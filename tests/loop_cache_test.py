@@ -0,0 +1,53 @@
+from magicbot import feedback
+
+from utilities import loop_cache
+
+
+class Sensor:
+    def __init__(self) -> None:
+        self.reads = 0
+
+    @feedback
+    @loop_cache.cached_per_loop
+    def get_value(self) -> int:
+        loop_cache.count_reads()
+        self.reads += 1
+        return self.reads
+
+
+def test_cached_per_loop() -> None:
+    sensor = Sensor()
+    other = Sensor()
+
+    loop_cache.start_iteration(1.0)
+    assert sensor.get_value() == 1
+    assert sensor.get_value() == 1
+    # Each instance has its own cache
+    assert other.get_value() == 1
+
+    loop_cache.start_iteration(1.02)
+    assert sensor.get_value() == 2
+    assert loop_cache.reads_last_iteration() == 2
+
+    loop_cache.invalidate(sensor)
+    assert sensor.get_value() == 3
+    assert sensor.get_value() == 3
+    loop_cache.invalidate(sensor, "get_value")
+    assert sensor.get_value() == 4
+
+
+def test_cache_disabled() -> None:
+    sensor = Sensor()
+    loop_cache.start_iteration(1.0)
+    loop_cache.enabled = False
+    try:
+        assert sensor.get_value() == 1
+        assert sensor.get_value() == 2
+    finally:
+        loop_cache.enabled = True
+    loop_cache.start_iteration(1.02)
+    assert loop_cache.reads_last_iteration() == 2
+
+
+def test_feedback_still_collected() -> None:
+    assert getattr(Sensor.get_value, "_magic_feedback", False)
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pytest
+from photonvision import PhotonTrackedTarget
+from wpimath.geometry import Pose2d, Transform3d
+
+from benchmarks.multi_tag_bench import (
+    ROBOT_TO_CAMERA,
+    TAG_IDS,
+    compare_accuracy,
+    simulate_target,
+)
+from utilities.game import apriltag_layout
+from utilities.multi_tag import (
+    estimate_multi_tag_pose,
+    get_field_corners,
+    solve_rigid_2d,
+)
+
+
+def test_solve_rigid_2d_exact() -> None:
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-2, 2, (8, 2))
+    theta = 2.5
+    c, s = math.cos(theta), math.sin(theta)
+    targets = points @ np.array([[c, s], [-s, c]]) + (3.0, -1.0)
+    x, y, solved = solve_rigid_2d(points, targets, rng.uniform(0.5, 1, 8))
+    assert (x, y, solved) == pytest.approx((3.0, -1.0, theta))
+
+
+def test_field_corners() -> None:
+    assert get_field_corners(99) is None
+    corners = get_field_corners(7)
+    assert corners is not None
+    tag = apriltag_layout.getTagPose(7)
+    assert tag is not None
+    assert corners.mean(axis=0) == pytest.approx((tag.x, tag.y))
+
+
+def test_single_tag_falls_back() -> None:
+    rng = np.random.default_rng(1)
+    robot_pose = Pose2d(3.5, 1.9, math.pi)
+    target = simulate_target(robot_pose, 6, rng)
+    assert estimate_multi_tag_pose(ROBOT_TO_CAMERA.inverse(), [target]) is None
+    unknown = simulate_target(robot_pose, 7, rng)
+    unknown = PhotonTrackedTarget(
+        0, 0, 1, 0, 42, unknown.getBestCameraToTarget(), Transform3d(), 0, [], []
+    )
+    assert estimate_multi_tag_pose(ROBOT_TO_CAMERA.inverse(), [target, unknown]) is None
+
+
+def test_multi_tag_more_accurate_than_single_tags() -> None:
+    """Replay simulated frames through both the single and multi-tag paths."""
+    single, multi = compare_accuracy()
+    assert single.measurements == multi.measurements * len(TAG_IDS)
+    assert multi.translation_error < single.translation_error / 2
+    assert multi.heading_error < single.heading_error / 2
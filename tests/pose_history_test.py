@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+from hypothesis import given
+from hypothesis import strategies as st
+from wpimath.geometry import Pose2d
+from wpimath.kinematics import ChassisSpeeds
+
+from utilities.pose_history import PoseHistory
+
+
+def add_sample(history: PoseHistory, t: float, heading: float = 0.0) -> None:
+    history.add(t, Pose2d(t, -t, heading), t * 2, ChassisSpeeds(t, 0.0, -t))
+
+
+def test_empty() -> None:
+    history = PoseHistory(4)
+    assert history.pose_at(1.0) is None
+    assert history.turret_angle_at(1.0) is None
+    assert history.turret_velocity_at(1.0) is None
+    assert history.speeds_at(1.0) is None
+    assert math.isnan(history.latest_timestamp())
+
+
+def test_interpolates_and_clamps() -> None:
+    history = PoseHistory(4)
+    for t in (1.0, 2.0, 3.0):
+        add_sample(history, t)
+
+    pose = history.pose_at(1.25)
+    assert pose is not None
+    assert math.isclose(pose.x, 1.25)
+    assert math.isclose(pose.y, -1.25)
+    assert history.turret_angle_at(2.5) == 5.0
+    speeds = history.speeds_at(2.5)
+    assert speeds is not None
+    assert math.isclose(speeds.vx, 2.5)
+    assert math.isclose(speeds.omega, -2.5)
+
+    assert history.turret_angle_at(0.0) == 2.0
+    assert history.turret_angle_at(10.0) == 6.0
+    # From the change in angle, including past the ends of the history
+    assert history.turret_velocity_at(2.5) == 2.0
+    assert history.turret_velocity_at(0.0) == 2.0
+    assert history.turret_velocity_at(10.0) == 2.0
+
+
+def test_heading_interpolates_the_short_way() -> None:
+    history = PoseHistory(4)
+    add_sample(history, 1.0, math.pi - 0.1)
+    add_sample(history, 2.0, -math.pi + 0.1)
+    pose = history.pose_at(1.5)
+    assert pose is not None
+    assert math.isclose(abs(pose.rotation().radians()), math.pi)
+
+
+def test_old_samples_are_dropped() -> None:
+    history = PoseHistory(3)
+    for t in range(1, 8):
+        add_sample(history, float(t))
+    assert len(history) == 3
+    assert history.oldest_timestamp() == 5.0
+    assert history.latest_timestamp() == 7.0
+    assert history.turret_angle_at(1.0) == 10.0
+
+    # Out of order samples are ignored
+    add_sample(history, 6.5)
+    assert history.latest_timestamp() == 7.0
+
+    history.clear()
+    assert history.pose_at(7.0) is None
+
+
+@given(
+    capacity=st.integers(2, 10),
+    count=st.integers(1, 30),
+    query=st.floats(-1.0, 35.0),
+)
+def test_matches_interp(capacity: int, count: int, query: float) -> None:
+    history = PoseHistory(capacity)
+    timestamps = np.arange(count) * 0.7 + 0.3
+    for t in timestamps:
+        add_sample(history, float(t))
+
+    kept = timestamps[-capacity:]
+    turret_angle = history.turret_angle_at(query)
+    assert turret_angle is not None
+    assert math.isclose(
+        turret_angle, np.interp(query, kept, kept * 2), rel_tol=1e-9, abs_tol=1e-9
+    )
@@ -0,0 +1,79 @@
+import math
+import pathlib
+
+import numpy as np
+import pytest
+
+from tools.generate_ballistics_tables import GOAL_HEIGHTS, generate_table
+from utilities import projectile
+from utilities.ballistics import BALLISTICS_TABLES_VERSION, load_ballistics_tables
+from utilities.game import GoalHeight
+
+
+def test_drag_free_flight_is_a_parabola() -> None:
+    speed = 8.0
+    elevation = math.radians(40)
+    target_range = 3.0
+    heights, flight_times = projectile.crossing_at_range(
+        *projectile.simulate([speed], elevation, dt=0.0005, drag_constant=0.0),
+        target_range,
+    )
+    flight_time = target_range / (speed * math.cos(elevation))
+    height = (
+        projectile.LAUNCH_HEIGHT
+        + speed * math.sin(elevation) * flight_time
+        - projectile.GRAVITY * flight_time**2 / 2
+    )
+    assert flight_times[0] == pytest.approx(flight_time, abs=1e-3)
+    assert heights[0] == pytest.approx(height, abs=1e-2)
+
+
+def test_drag_shortens_flight() -> None:
+    elevation = math.radians(40)
+    drag_free = projectile.solve_exit_speed(3.0, 0.9, elevation, 30, drag_constant=0)
+    with_drag = projectile.solve_exit_speed(3.0, 0.9, elevation, 30)
+    assert drag_free is not None and with_drag is not None
+    assert with_drag[0] > drag_free[0]
+
+
+def test_unreachable_target() -> None:
+    assert projectile.solve_exit_speed(20.0, 0.9, math.radians(40), 5.0) is None
+
+
+def test_generated_tables_round_trip(tmp_path: pathlib.Path) -> None:
+    ranges = np.arange(1.0, 8.0, 0.5)
+    arrays = {"version": np.array(BALLISTICS_TABLES_VERSION)}
+    for goal in GoalHeight:
+        (
+            arrays[f"{goal.name.lower()}_ranges"],
+            arrays[f"{goal.name.lower()}_values"],
+        ) = generate_table(goal, ranges)
+    path = tmp_path / "tables.npz"
+    np.savez(path, **arrays)
+
+    tables = load_ballistics_tables(path)
+    assert tables is not None
+    for goal, table in tables.items():
+        values = arrays[f"{goal.name.lower()}_values"]
+        np.testing.assert_array_equal(table.values, values)
+        # Never shoot beyond the end of the table
+        assert table.lookup(table.max_range + 1)[1:3] == (0.0, 0.0)
+
+        # The tabulated launch really does reach the goal
+        tilt_angle, top_speed, bottom_speed, flight_time = table.lookup(2.0)
+        heights, flight_times = projectile.crossing_at_range(
+            *projectile.simulate(
+                [projectile.exit_speed(top_speed, bottom_speed)],
+                projectile.launch_elevation(tilt_angle),
+            ),
+            2.0,
+        )
+        assert heights[0] == pytest.approx(GOAL_HEIGHTS[goal], abs=0.05)
+        assert flight_times[0] == pytest.approx(flight_time, abs=0.02)
+
+
+def test_mismatched_table_version_is_ignored(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "tables.npz"
+    np.savez(path, version=np.array(BALLISTICS_TABLES_VERSION + 1))
+    assert load_ballistics_tables(path) is None
+    assert load_ballistics_tables(tmp_path / "missing.npz") is None
@@ -0,0 +1,144 @@
+import math
+import pathlib
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+import pytest
+from conftest import encode_log, encode_record, encode_start
+from photonvision import PhotonTrackedTarget
+from wpimath.geometry import (
+    Pose2d,
+    Pose3d,
+    Rotation2d,
+    Rotation3d,
+    Transform3d,
+    Translation3d,
+)
+from wpimath.kinematics import SwerveModulePosition
+
+from utilities.game import apriltag_layout
+from utilities.input_log import (
+    ESTIMATED_POSE,
+    ODOMETRY_INPUTS,
+    RESET_POSE,
+    VISION_FRAME_PREFIX,
+    decode_frame,
+    decode_odometry,
+    decode_reset,
+    encode_frame,
+    encode_odometry,
+    encode_reset,
+)
+from utilities.replay import replay
+
+ROBOT_TO_CAMERA = Transform3d(Translation3d(0, 0, 0.5), Rotation3d())
+DURATION = 3.0
+# Odometry reads this much of the distance the wheels really travel
+ODOMETRY_SCALE = 0.8
+
+
+def get_true_pose(t: float) -> Pose2d:
+    """The robot drives towards the blue grid at 1 m/s."""
+    return Pose2d(5.0 - t, 2.7, math.pi)
+
+
+def get_positions(t: float) -> list[SwerveModulePosition]:
+    return [SwerveModulePosition(t * ODOMETRY_SCALE, Rotation2d())] * 4
+
+
+def get_targets(pose: Pose2d) -> list[PhotonTrackedTarget]:
+    camera = Pose3d(pose).transformBy(ROBOT_TO_CAMERA)
+    targets = []
+    for tag_id in (6, 7, 8):
+        tag = apriltag_layout.getTagPose(tag_id)
+        assert tag is not None
+        camera_to_target = Transform3d(camera, tag)
+        yaw = -math.degrees(math.atan2(camera_to_target.y, camera_to_target.x))
+        targets.append(
+            PhotonTrackedTarget(
+                yaw, 0, 1, 0, tag_id, camera_to_target, camera_to_target, 0, [], []
+            )
+        )
+    return targets
+
+
+def encode_doubles(entry: int, timestamp: float, values: Sequence[float]) -> bytes:
+    payload = struct.pack(f"<{len(values)}d", *values)
+    return encode_record(entry, round(timestamp * 1e6), payload)
+
+
+def write_match_log(path: pathlib.Path) -> None:
+    """A log of the robot driving, with the wheels slipping, seeing tags."""
+    start = 1.0
+    records = [
+        encode_start(1, RESET_POSE, "double[]"),
+        encode_start(2, ODOMETRY_INPUTS, "double[]"),
+        encode_start(3, ESTIMATED_POSE, "double[]"),
+        encode_start(4, VISION_FRAME_PREFIX + "cam", "double[]"),
+        encode_doubles(
+            1, start, encode_reset(get_true_pose(0), Rotation2d(), get_positions(0))
+        ),
+    ]
+    for t in np.arange(0.02, DURATION, 0.02).tolist():
+        records.append(
+            encode_doubles(
+                2, start + t, encode_odometry(Rotation2d(), get_positions(t))
+            )
+        )
+        pose = get_true_pose(t)
+        records.append(
+            encode_doubles(3, start + t, (pose.x, pose.y, pose.rotation().radians()))
+        )
+        if round(t / 0.02) % 5 == 0:
+            frame = encode_frame(
+                start + t, 0.0, ROBOT_TO_CAMERA.inverse(), get_targets(pose)
+            )
+            # Polled a little after it was captured
+            records.append(encode_doubles(4, start + t + 0.03, frame))
+    path.write_bytes(encode_log(*records))
+
+
+def test_encoding_roundtrip() -> None:
+    pose = Pose2d(1, 2, 3)
+    positions = [SwerveModulePosition(i, Rotation2d(i / 10)) for i in range(4)]
+    decoded_pose, gyro, decoded_positions = decode_reset(
+        encode_reset(pose, Rotation2d(0.5), positions)
+    )
+    assert decoded_pose == pose
+    assert gyro.radians() == pytest.approx(0.5)
+    assert decoded_positions == tuple(positions)
+    assert decode_odometry(encode_odometry(gyro, positions))[1] == tuple(positions)
+
+    targets = get_targets(get_true_pose(0))
+    frame = decode_frame(encode_frame(1.5, 0.2, ROBOT_TO_CAMERA, targets))
+    assert frame.timestamp == 1.5
+    assert frame.turret_velocity == 0.2
+    assert frame.camera_to_robot.z == pytest.approx(0.5)
+    for original, decoded in zip(targets, frame.targets):
+        assert decoded.getFiducialId() == original.getFiducialId()
+        assert decoded.getYaw() == original.getYaw()
+        best = decoded.getBestCameraToTarget()
+        assert best.translation() == original.getBestCameraToTarget().translation()
+        assert best.rotation().Z() == pytest.approx(
+            original.getBestCameraToTarget().rotation().Z()
+        )
+
+
+def test_replay_corrects_odometry_with_vision(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "match.wpilog"
+    write_match_log(path)
+
+    odometry_only = replay(path, use_vision=False)
+    assert odometry_only.vision_measurements == 0
+    # The wheels slipped by a fifth of the distance driven
+    final_error = (1 - ODOMETRY_SCALE) * (DURATION - 0.02)
+    assert odometry_only.translation_errors.max() == pytest.approx(final_error)
+
+    result = replay(path)
+    assert "29 frames" in result.report()
+    assert len(result.frame_times) == 29
+    assert result.vision_measurements == 29
+    assert len(result.poses) == len(odometry_only.poses)
+    assert result.translation_errors[-1] < final_error / 2
+    assert result.log_duration / result.wall_time > 1
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from magicbot.magic_tunable import setup_tunables
+from wpimath.geometry import Pose2d
+from wpimath.kinematics import ChassisSpeeds
+
+from components.shooter import Shooter
+from controllers.shooter import ShooterController
+from utilities import loop_cache
+from utilities.game import GoalHeight
+
+
+def test_solution_cached_within_loop() -> None:
+    controller = ShooterController()
+    setup_tunables(controller, "shooter_controller")
+    chassis = mock.Mock()
+    chassis.get_pose.return_value = Pose2d(3, 2, 0)
+    chassis.get_velocity.return_value = ChassisSpeeds()
+    controller.chassis_component = chassis
+
+    with mock.patch("controllers.shooter.calculate_ballistics") as calculate:
+        calculate.return_value = mock.Mock(range=1.0)
+        loop_cache.start_iteration(1.0)
+        controller.get_target_position()
+        controller.get_ballistics_solution()
+        controller.get_time_of_flight()
+        assert calculate.call_count == 1
+
+        # A new goal, a new loop, a moved robot or an explicit invalidation
+        # each need a new solution
+        controller.prefer_mid()
+        assert controller.goal_height_preference is GoalHeight.MID
+        controller.get_ballistics_solution()
+        assert calculate.call_count == 2
+
+        loop_cache.start_iteration(1.02)
+        controller.get_ballistics_solution()
+        assert calculate.call_count == 3
+
+        chassis.get_pose.return_value = Pose2d(3.1, 2, 0)
+        controller.get_ballistics_solution()
+        assert calculate.call_count == 4
+
+        controller.invalidate_solution()
+        controller.get_ballistics_solution()
+        assert calculate.call_count == 5
+
+
+def test_prespin_stops_feeding_after_shot() -> None:
+    controller = ShooterController()
+    setup_tunables(controller, "shooter_controller")
+    shooter = Shooter()
+    setup_tunables(shooter, "shooter")
+    chassis = mock.Mock()
+    chassis.get_pose.return_value = Pose2d(3, 2, 0)
+    chassis.get_velocity.return_value = ChassisSpeeds()
+    controller.chassis_component = chassis
+    controller.shooter_component = shooter
+    for name in ("turret_component", "tilt_component"):
+        component = mock.Mock()
+        component.get_angle.return_value = 0.0
+        component.get_velocity.return_value = 0.0
+        setattr(controller, name, component)
+
+    with mock.patch("utilities.game.is_red", return_value=False):
+        loop_cache.start_iteration(1.0)
+        controller.update_component_setpoints(run_shooter=True)
+        shooter.shoot()
+        assert shooter.is_shooting()
+
+        # The shot is over and there's no cube to shoot next
+        assert controller.prespin
+        controller.update_component_setpoints(run_shooter=False)
+    assert shooter.back_motor_speed == 0
+    assert shooter.top_flywheel_speed > 0
+    assert shooter.bottom_flywheel_speed > 0
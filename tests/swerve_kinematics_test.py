@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+from hypothesis import given
+from hypothesis import strategies as st
+from wpimath.geometry import Rotation2d, Translation2d
+from wpimath.kinematics import ChassisSpeeds, SwerveDrive4Kinematics, SwerveModuleState
+
+from components.chassis import Chassis, SwerveModule
+from utilities import swerve_kinematics
+from utilities.functions import rate_limit_module
+
+TRANSLATIONS = [
+    (Chassis.WHEEL_BASE / 2, Chassis.TRACK_WIDTH / 2),
+    (-Chassis.WHEEL_BASE / 2, Chassis.TRACK_WIDTH / 2),
+    (-Chassis.WHEEL_BASE / 2, -Chassis.TRACK_WIDTH / 2),
+    (Chassis.WHEEL_BASE / 2, -Chassis.TRACK_WIDTH / 2),
+]
+
+# wpimath gets module angles wrong for speeds within a few orders of
+# magnitude of the smallest double, which we don't care to match
+velocities = st.floats(-6.0, 6.0).filter(lambda v: v == 0 or abs(v) > 1e-9)
+angles = st.floats(-math.pi, math.pi)
+module_speeds = st.floats(-5.0, 5.0)
+module_angles = st.lists(angles, min_size=4, max_size=4)
+
+
+def make_kinematics() -> (
+    tuple[SwerveDrive4Kinematics, swerve_kinematics.SwerveKinematics]
+):
+    return (
+        SwerveDrive4Kinematics(*(Translation2d(x, y) for x, y in TRANSLATIONS)),
+        swerve_kinematics.SwerveKinematics(TRANSLATIONS),
+    )
+
+
+def assert_states_match(
+    expected: list[SwerveModuleState],
+    speeds: np.ndarray,
+    angles: np.ndarray,
+) -> None:
+    np.testing.assert_allclose(speeds, [s.speed for s in expected], atol=1e-9)
+    np.testing.assert_allclose(
+        np.cos(angles), [s.angle.cos() for s in expected], atol=1e-9
+    )
+    np.testing.assert_allclose(
+        np.sin(angles), [s.angle.sin() for s in expected], atol=1e-9
+    )
+
+
+@given(vx=velocities, vy=velocities, omega=velocities)
+def test_module_states_match_wpimath(vx: float, vy: float, omega: float) -> None:
+    wpi, kinematics = make_kinematics()
+    max_speed = Chassis.max_wheel_speed
+
+    expected = wpi.desaturateWheelSpeeds(
+        wpi.toSwerveModuleStates(ChassisSpeeds(vx, vy, omega)), max_speed
+    )
+    speeds, angles = kinematics.to_module_states((vx, vy, omega))
+    speeds = swerve_kinematics.desaturate(speeds, max_speed)
+    assert_states_match(list(expected), speeds, angles)
+
+    chassis_speeds = wpi.toChassisSpeeds(*expected)
+    np.testing.assert_allclose(
+        kinematics.to_chassis_speeds(speeds, angles),
+        (chassis_speeds.vx, chassis_speeds.vy, chassis_speeds.omega),
+        atol=1e-9,
+    )
+
+
+def test_stopped_modules_keep_heading() -> None:
+    wpi, kinematics = make_kinematics()
+    for speeds in [(1.0, 2.0, 0.5), (0.0, 0.0, 0.0)]:
+        expected = wpi.toSwerveModuleStates(ChassisSpeeds(*speeds))
+        assert_states_match(list(expected), *kinematics.to_module_states(speeds))
+
+
+@given(
+    current_speed=module_speeds,
+    current_angle=angles,
+    target_speed=module_speeds,
+    target_angle=angles,
+)
+def test_rate_limit_matches_module(
+    current_speed: float, current_angle: float, target_speed: float, target_angle: float
+) -> None:
+    expected = rate_limit_module(
+        SwerveModuleState(current_speed, Rotation2d(current_angle)),
+        SwerveModuleState(target_speed, Rotation2d(target_angle)),
+        SwerveModule.accel_limit,
+    )
+    speeds, angles = swerve_kinematics.rate_limit(
+        [current_speed],
+        [current_angle],
+        [target_speed],
+        [target_angle],
+        SwerveModule.accel_limit,
+    )
+    assert_states_match([expected], speeds, angles)
+
+
+@given(speed=module_speeds, angle=angles, current_angle=angles)
+def test_optimize_matches_wpimath(
+    speed: float, angle: float, current_angle: float
+) -> None:
+    delta = abs(swerve_kinematics.wrap_angles(angle - current_angle))
+    # Which way to go is ambiguous right at 90 degrees
+    if math.isclose(delta, math.pi / 2, abs_tol=1e-6):
+        return
+    expected = SwerveModuleState.optimize(
+        SwerveModuleState(speed, Rotation2d(angle)), Rotation2d(current_angle)
+    )
+    assert_states_match(
+        [expected], *swerve_kinematics.optimize([speed], [angle], [current_angle])
+    )
+
+
+@given(
+    commands=st.lists(
+        st.tuples(velocities, velocities, velocities), min_size=1, max_size=20
+    ),
+    current_angles=module_angles,
+)
+def test_batch_matches_single(
+    commands: list[tuple[float, float, float]], current_angles: list[float]
+) -> None:
+    _, kinematics = make_kinematics()
+
+    batch_speeds, batch_angles = kinematics.to_module_states(commands)
+    batch_speeds = swerve_kinematics.desaturate(batch_speeds, Chassis.max_wheel_speed)
+    batch_speeds, batch_angles = swerve_kinematics.rate_limit(
+        np.zeros(4), current_angles, batch_speeds, batch_angles, 15.0
+    )
+    batch_speeds, batch_angles = swerve_kinematics.optimize(
+        batch_speeds, batch_angles, current_angles
+    )
+    assert batch_speeds.shape == batch_angles.shape == (len(commands), 4)
+
+    for command, speeds, angles in zip(commands, batch_speeds, batch_angles):
+        _, kinematics = make_kinematics()
+        single_speeds, single_angles = kinematics.to_module_states(command)
+        single_speeds = swerve_kinematics.desaturate(
+            single_speeds, Chassis.max_wheel_speed
+        )
+        single_speeds, single_angles = swerve_kinematics.rate_limit(
+            np.zeros(4), current_angles, single_speeds, single_angles, 15.0
+        )
+        single_speeds, single_angles = swerve_kinematics.optimize(
+            single_speeds, single_angles, current_angles
+        )
+        np.testing.assert_allclose(speeds, single_speeds)
+        np.testing.assert_allclose(angles, single_angles)
@@ -0,0 +1,162 @@
+import math
+import time
+
+import numpy as np
+import pytest
+from conftest import SharedLog
+
+from utilities.sysid import (
+    DYNAMIC_STEP_VOLTAGE,
+    QUASISTATIC_RAMP_RATE,
+    Mechanism,
+    SysIdRoutine,
+    SysIdTest,
+    fit_feedforward,
+    read_sysid_log,
+)
+
+KS = 0.2
+KV = 2.0
+KA = 0.3
+KG = 0.5
+
+
+class Motor:
+    """A mechanism obeying V = kS sgn(v) + kV v + kA a + kG cos(x)."""
+
+    def __init__(self, kG: float = 0.0, position: float = 0.0) -> None:
+        self.kG = kG
+        self.voltage = 0.0
+        self.position = position
+        self.velocity = 0.0
+
+    def set_voltage(self, volts: float) -> None:
+        self.voltage = volts
+
+    def update(self, dt: float, substeps: int = 20) -> None:
+        dt /= substeps
+        for _ in range(substeps):
+            driving = self.voltage - self.kG * math.cos(self.position)
+            if self.velocity == 0 and abs(driving) <= KS:
+                continue
+            friction = KS * np.sign(self.velocity or driving)
+            acceleration = (driving - friction - KV * self.velocity) / KA
+            self.velocity += acceleration * dt
+            self.position += self.velocity * dt
+
+
+def run_test(
+    motor: Motor, test: SysIdTest, duration: float, dt: float = 0.005
+) -> np.ndarray:
+    samples = []
+    for step in range(round(duration / dt)):
+        t = step * dt
+        samples.append([t, test.voltage(t), motor.position, motor.velocity])
+        motor.set_voltage(test.voltage(t))
+        motor.update(dt)
+    return np.array(samples)
+
+
+def test_test_voltages() -> None:
+    assert SysIdTest.QUASISTATIC_FORWARD.voltage(2.0) == 2 * QUASISTATIC_RAMP_RATE
+    assert SysIdTest.QUASISTATIC_REVERSE.voltage(2.0) == -2 * QUASISTATIC_RAMP_RATE
+    assert SysIdTest.DYNAMIC_FORWARD.voltage(0.0) == DYNAMIC_STEP_VOLTAGE
+    assert SysIdTest.DYNAMIC_REVERSE.voltage(1.0) == -DYNAMIC_STEP_VOLTAGE
+
+
+def test_fit_recovers_gains() -> None:
+    runs = [
+        run_test(Motor(), SysIdTest.QUASISTATIC_FORWARD, 10.0),
+        run_test(Motor(), SysIdTest.QUASISTATIC_REVERSE, 10.0),
+        run_test(Motor(), SysIdTest.DYNAMIC_FORWARD, 1.0),
+        run_test(Motor(), SysIdTest.DYNAMIC_REVERSE, 1.0),
+    ]
+    gains = fit_feedforward(runs)
+    assert gains.kS == pytest.approx(KS, abs=0.02)
+    assert gains.kV == pytest.approx(KV, rel=0.02)
+    assert gains.kA == pytest.approx(KA, rel=0.1)
+    assert gains.kG == 0
+    assert gains.r_squared > 0.99
+
+
+def test_fit_arm_from_positions() -> None:
+    runs = []
+    for test in SysIdTest:
+        run = run_test(Motor(KG), test, 1.0 if "dynamic" in test.value else 8.0)
+        # Only positions are measured, like the tilt's absolute encoder
+        run[:, 3] = math.nan
+        runs.append(run)
+    gains = fit_feedforward(runs, is_arm=True)
+    assert gains.kG == pytest.approx(KG, abs=0.05)
+    assert gains.kS == pytest.approx(KS, abs=0.05)
+    assert gains.kV == pytest.approx(KV, rel=0.05)
+
+
+def test_fit_needs_motion() -> None:
+    still = np.zeros((10, 4))
+    still[:, 0] = np.arange(10) * 0.01
+    with pytest.raises(ValueError):
+        fit_feedforward([still])
+
+
+def test_routine_stops_out_of_bounds(shared_log: SharedLog) -> None:
+    motor = Motor()
+    routine = SysIdRoutine(
+        shared_log.data_log,
+        shared_log.name("motor"),
+        Mechanism(motor.set_voltage, lambda: motor.position, max_position=1.0),
+    )
+    t = 0.0
+    while routine.sample(SysIdTest.DYNAMIC_FORWARD, t):
+        motor.update(0.005)
+        t += 0.005
+        assert t < 1.0
+    assert motor.voltage == 0
+    assert motor.position > 1.0
+
+
+def test_routine_logs_samples(shared_log: SharedLog) -> None:
+    motor = Motor()
+    mechanism = Mechanism(
+        motor.set_voltage, lambda: motor.position, lambda: motor.velocity
+    )
+    name = shared_log.name("motor")
+    routine = SysIdRoutine(shared_log.data_log, name, mechanism)
+    records = 1
+    for test, duration in (
+        (SysIdTest.QUASISTATIC_FORWARD, 6.0),
+        (SysIdTest.DYNAMIC_FORWARD, 1.0),
+        (SysIdTest.DYNAMIC_REVERSE, 1.0),
+    ):
+        routine.test_entry.append(test.value)
+        motor.velocity = 0.0
+        for step in range(round(duration / routine.period)):
+            assert routine.sample(test, step * routine.period)
+            motor.update(routine.period)
+        routine.test_entry.append("")
+        records += round(duration / routine.period) + 2
+
+    logs = read_sysid_log(str(shared_log.wait_for(records)))
+    assert not logs[name].is_arm
+    assert len(logs[name].runs) == 3
+    gains = fit_feedforward(logs[name].runs)
+    assert gains.kS == pytest.approx(KS, abs=0.02)
+    assert gains.kV == pytest.approx(KV, rel=0.02)
+    assert gains.kA == pytest.approx(KA, rel=0.1)
+
+
+def test_routine_runs_in_thread(shared_log: SharedLog) -> None:
+    voltages: list[float] = []
+    routine = SysIdRoutine(
+        shared_log.data_log,
+        shared_log.name("motor"),
+        Mechanism(voltages.append, lambda: 0.0),
+    )
+    routine.start(SysIdTest.DYNAMIC_FORWARD)
+    time.sleep(0.1)
+    assert routine.is_running()
+    routine.stop()
+    assert not routine.is_running()
+    assert routine.test is None
+    assert DYNAMIC_STEP_VOLTAGE in voltages
+    assert voltages[-1] == 0
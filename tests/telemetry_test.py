@@ -0,0 +1,32 @@
+import math
+
+import wpilib
+from wpimath.geometry import Pose2d
+
+from utilities.telemetry import FieldPublisher
+
+
+def test_publishes_changed_poses_at_rate() -> None:
+    field = wpilib.Field2d()
+    publisher = FieldPublisher(field, period=0.1, translation_tolerance=0.01)
+
+    publisher.set_pose("Robot", Pose2d(1, 2, 0.5))
+    publisher.set_pose_xy("target", 3, 4, 0)
+    assert publisher.publish(0.0) == 2
+    robot = field.getRobotPose()
+    assert math.isclose(robot.x, 1) and math.isclose(robot.y, 2)
+    assert math.isclose(field.getObject("target").getPose().x, 3)
+
+    # Too soon after the last publish
+    publisher.set_pose("Robot", Pose2d(5, 5, 0))
+    assert publisher.publish(0.05) == 0
+    assert math.isclose(field.getRobotPose().x, 1)
+
+    # Within tolerance of what was last published
+    publisher.set_pose("Robot", Pose2d(1.005, 2, 0.5))
+    publisher.set_pose_xy("target", 3, 4, 0)
+    assert publisher.publish(0.25) == 0
+
+    publisher.set_pose("Robot", Pose2d(1, 2, 0.6))
+    assert publisher.publish(0.5) == 1
+    assert math.isclose(field.getRobotPose().rotation().radians(), 0.6)
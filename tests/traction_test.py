@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.traction_bench import SURFACES, drive_straight
+from utilities.traction import TractionController
+
+TRANSLATIONS = [(0.3, 0.3), (-0.3, 0.3), (-0.3, -0.3), (0.3, -0.3)]
+POSITIONS = np.array([x + y * 1j for x, y in TRANSLATIONS])
+
+
+def test_slipping_module_limited() -> None:
+    traction = TractionController(TRANSLATIONS, initial_limit=15.0)
+    # The robot is still, but one wheel spins up
+    velocities = np.zeros(4, dtype=complex)
+    for _ in range(10):
+        velocities[0] += 0.3
+        limits = traction.update(velocities, 0j, 0.0, 0.02)
+    assert traction.slipping.tolist() == [True, False, False, False]
+    assert limits[0] == traction.min_limit
+    assert limits[1:] == pytest.approx(15.0)
+
+
+def test_gripping_limit_grows() -> None:
+    traction = TractionController(TRANSLATIONS, initial_limit=15.0, max_limit=25.0)
+    # Accelerating hard, with the IMU agreeing with the wheels
+    acceleration = 20.0
+    velocity = 0j
+    for _ in range(50):
+        velocity += acceleration * 0.02
+        limits = traction.update(np.full(4, velocity), acceleration, 0.0, 0.02)
+    assert not traction.slipping.any()
+    assert limits == pytest.approx(25.0)
+
+
+def test_turning_without_slip() -> None:
+    traction = TractionController(TRANSLATIONS, initial_limit=15.0)
+    traction.reset(velocity=2.0)
+    # Driving at a constant field relative velocity while spinning
+    omega = 4.0
+    heading = 0.0
+    for _ in range(100):
+        heading += omega * 0.02
+        velocity = 2.0 * complex(math.cos(-heading), math.sin(-heading))
+        limits = traction.update(velocity + 1j * omega * POSITIONS, 0j, omega, 0.02)
+        assert not traction.slipping.any()
+    assert limits == pytest.approx(15.0)
+
+
+def test_limits_recover_after_bump() -> None:
+    traction = TractionController(TRANSLATIONS, initial_limit=15.0)
+    traction.reset(velocity=1.0)
+    velocities = np.full(4, 1.0 + 0j)
+    # A collision jolts the IMU for one loop, without changing the velocity
+    traction.update(velocities, 4 * 9.81, 0.0, 0.02)
+    assert traction.slipping.all()
+    for _ in range(100):
+        limits = traction.update(velocities, 0j, 0.0, 0.02)
+    assert not traction.slipping.any()
+    assert abs(traction.velocity - 1.0) < 0.01
+    assert limits == pytest.approx(15.0)
+
+
+@pytest.mark.parametrize("surface", SURFACES)
+def test_adaptive_limits_in_model(surface: str) -> None:
+    friction = SURFACES[surface]
+    fixed = drive_straight(friction, adaptive=False)
+    adaptive = drive_straight(friction, adaptive=True)
+
+    assert adaptive.time_to_speed <= fixed.time_to_speed + 0.02
+    assert adaptive.odometry_error <= fixed.odometry_error + 0.01
+    if fixed.odometry_error > 0.1:
+        assert adaptive.odometry_error < fixed.odometry_error * 0.6
@@ -0,0 +1,154 @@
+import math
+
+import pytest
+from magicbot.magic_tunable import setup_tunables
+from ntcore.util import ChooserControl
+from pyfrc.test_support.controller import TestController as PyfrcTestController
+from wpimath.geometry import Pose2d
+
+from controllers.trajectory_follower import TrajectoryFollower
+from utilities import loop_cache
+from utilities.game import FIELD_LENGTH
+from utilities.trajectory import (
+    TRAJECTORIES_PATH,
+    generate_trajectory,
+    get_trajectory,
+    load_trajectories,
+)
+
+
+def test_generated_trajectory_follows_limits() -> None:
+    trajectory = generate_trajectory(
+        [Pose2d(1, 1, 0), Pose2d(3, 2, math.pi / 2)],
+        start_heading=0.0,
+        end_heading=math.pi,
+        max_speed=2.0,
+        max_acceleration=3.0,
+        max_angular_speed=3.0,
+        max_angular_acceleration=6.0,
+    )
+    assert trajectory.initial_pose().translation().distance(
+        Pose2d(1, 1, 0).translation()
+    ) == pytest.approx(0)
+    final = trajectory.final_pose()
+    assert (final.x, final.y) == pytest.approx((3, 2))
+    assert abs(final.rotation().radians()) == pytest.approx(math.pi)
+
+    samples = trajectory.samples
+    assert (samples[:, 3] ** 2 + samples[:, 4] ** 2).max() <= 2.0**2 + 1e-6
+    assert abs(samples[:, 5]).max() <= 3.0 + 1e-6
+    # Velocities are consistent with the change in position
+    x, _, _, vx, _, _ = trajectory.sample(0.5)
+    x_later = trajectory.sample(0.52)[0]
+    assert (x_later - x) / 0.02 == pytest.approx(vx, rel=0.1)
+
+
+def test_mirrored_and_shifted() -> None:
+    trajectory = generate_trajectory(
+        [Pose2d(0, 0, 0), Pose2d(2, 0, 0)], 0.0, 0.0, 2.0, 3.0, 3.0, 6.0
+    )
+    red = trajectory.mirrored()
+    x, y, heading, vx, vy, omega = red.sample(0.5)
+    assert x == pytest.approx(FIELD_LENGTH - trajectory.sample(0.5)[0])
+    assert vx < 0
+    assert abs(heading) == pytest.approx(math.pi)
+
+    shifted = trajectory.shifted_to(Pose2d(5, 3, 1.0))
+    start = shifted.initial_pose()
+    assert (start.x, start.y, start.rotation().radians()) == pytest.approx((5, 3, 1.0))
+    # The path isn't rotated with the heading
+    assert shifted.final_pose().x == pytest.approx(7)
+    assert shifted.sample(100)[3:] == (0, 0, 0)
+
+
+def test_generated_trajectories_load() -> None:
+    assert TRAJECTORIES_PATH.exists()
+    assert "drive_forward" in load_trajectories()
+    assert get_trajectory("nonexistent") is None
+
+
+class FakeChassis:
+    """A holonomic robot that only reaches a fraction of the commanded speed."""
+
+    def __init__(self, pose: Pose2d, efficiency: float) -> None:
+        self.x = pose.x
+        self.y = pose.y
+        self.heading = pose.rotation().radians()
+        self.efficiency = efficiency
+        self.command = (0.0, 0.0, 0.0)
+
+    def get_pose(self) -> Pose2d:
+        return Pose2d(self.x, self.y, self.heading)
+
+    def drive_field(self, vx: float, vy: float, omega: float) -> None:
+        self.command = (vx, vy, omega)
+
+    def update(self, dt: float) -> None:
+        vx, vy, omega = self.command
+        self.x += vx * self.efficiency * dt
+        self.y += vy * self.efficiency * dt
+        self.heading = math.remainder(
+            self.heading + omega * self.efficiency * dt, math.tau
+        )
+
+
+def make_follower(chassis: FakeChassis) -> TrajectoryFollower:
+    follower = TrajectoryFollower()
+    follower.chassis_component = chassis  # type: ignore[assignment]
+    follower.control_loop_wait_time = 0.02
+    setup_tunables(follower, "trajectory_follower")
+    follower.setup()
+    return follower
+
+
+def test_follower_tracking_error() -> None:
+    trajectory = generate_trajectory(
+        [Pose2d(2, 1, 0), Pose2d(4, 2, math.pi / 2), Pose2d(4, 4, math.pi / 2)],
+        start_heading=0.0,
+        end_heading=math.pi / 2,
+        max_speed=2.0,
+        max_acceleration=3.0,
+        max_angular_speed=3.0,
+        max_angular_acceleration=6.0,
+    )
+    # Start a little off the trajectory, with wheels that slip
+    chassis = FakeChassis(Pose2d(2.05, 0.95, 0.05), efficiency=0.9)
+    follower = make_follower(chassis)
+
+    t = 0.0
+    loop_cache.start_iteration(t)
+    follower.follow(trajectory)
+    while not follower.is_finished():
+        follower.execute()
+        chassis.update(0.02)
+        t += 0.02
+        loop_cache.start_iteration(t)
+        assert t < trajectory.duration + 1.0
+
+    assert follower.max_position_error < 0.15
+    final = chassis.get_pose()
+    assert (
+        final.translation().distance(trajectory.final_pose().translation())
+        < follower.position_tolerance
+    )
+    assert final.rotation().radians() == pytest.approx(math.pi / 2, abs=0.05)
+
+
+def test_drive_forward_in_sim(control: PyfrcTestController, robot) -> None:
+    # Only the first simulated robot in a test session can drive its motor
+    # controllers, so how well this tracks is tested with a model above
+    with control.run_robot():
+        control.step_timing(seconds=0.5, autonomous=True, enabled=False)
+        ChooserControl("Autonomous Mode").setSelected("Drive Forward")
+        control.step_timing(seconds=0.5, autonomous=True, enabled=False)
+
+        control.step_timing(seconds=1.0, autonomous=True, enabled=True)
+        follower = robot.trajectory_follower
+        assert follower.is_following()
+        # Finished following, or given up trying, by the end of the settle time
+        control.step_timing(
+            seconds=follower.trajectory.duration + follower.settle_timeout,
+            autonomous=True,
+            enabled=True,
+        )
+        assert not follower.is_following()
@@ -0,0 +1,240 @@
+import math
+import time
+from collections.abc import Iterator
+
+import pytest
+import wpilib
+from conftest import SharedLog
+from magicbot.magic_tunable import setup_tunables
+from photonvision import PhotonPipelineResult, PhotonTrackedTarget
+from wpimath.geometry import Pose2d, Pose3d, Rotation3d, Transform3d, Translation3d
+from wpimath.kinematics import ChassisSpeeds
+
+from components.turret import ITurret, Turret
+from components.vision import (
+    CLEAR_CHOICE_MARGIN,
+    INNOVATION_GATE,
+    RELOCALISE_COUNT,
+    Frame,
+    FrameTarget,
+    VisualLocaliser,
+    choose_pose,
+    get_innovation,
+)
+from utilities.game import apriltag_layout
+from utilities.pose_history import PoseHistory
+from utilities.telemetry import FieldPublisher
+
+CAMERA_POSITION = Translation3d(0.05, 0.0, 0.83)
+ROBOT_POSE = Pose2d(3.5, 2.7, math.pi)
+
+
+class FakeCamera:
+    def __init__(self) -> None:
+        self.timestamps: list[float] = []
+
+    def getLatestResult(self) -> PhotonPipelineResult:
+        """A new frame of tags 6, 7 and 8 every time it's asked for."""
+        robot_to_camera = Transform3d(
+            CAMERA_POSITION + Turret.TRANSLATION3D, Rotation3d()
+        )
+        camera = Pose3d(ROBOT_POSE).transformBy(robot_to_camera)
+        targets = []
+        for tag_id in (6, 7, 8):
+            tag = apriltag_layout.getTagPose(tag_id)
+            assert tag is not None
+            camera_to_target = Transform3d(camera, tag)
+            targets.append(
+                PhotonTrackedTarget(
+                    0, 0, 1, 0, tag_id, camera_to_target, camera_to_target, 0, [], []
+                )
+            )
+        result = PhotonPipelineResult(0.0, targets)
+        # Every frame has a new timestamp, close to now
+        timestamp = wpilib.Timer.getFPGATimestamp() + len(self.timestamps) * 1e-6
+        self.timestamps.append(timestamp)
+        result.setTimestamp(timestamp)
+        return result
+
+
+class FakeChassis:
+    def __init__(self) -> None:
+        self.pose_history = PoseHistory(10)
+        self.pose_history.add(0.0, ROBOT_POSE, 0.0, ChassisSpeeds())
+        self.pose = ROBOT_POSE
+        self.measurements: list[tuple[Pose2d, float]] = []
+        self.std_devs: list[tuple[float, float, float]] = []
+
+    def get_pose(self) -> Pose2d:
+        return self.pose
+
+    def get_pose_at(self, timestamp: float) -> Pose2d:
+        return self.pose
+
+    def set_pose(self, pose: Pose2d) -> None:
+        self.pose = pose
+
+    def add_vision_measurement(
+        self, pose: Pose2d, timestamp: float, std_devs: tuple[float, float, float]
+    ) -> None:
+        self.measurements.append((pose, timestamp))
+        self.std_devs.append(std_devs)
+
+
+@pytest.fixture
+def localiser(shared_log: SharedLog) -> Iterator[VisualLocaliser]:
+    localiser = VisualLocaliser(
+        "test_cam",
+        CAMERA_POSITION,
+        Rotation3d(),
+        FieldPublisher(wpilib.Field2d()),
+        FakeChassis(),  # type: ignore[arg-type]
+        ITurret(),
+    )
+    localiser.data_log = shared_log.data_log
+    localiser.setup()
+    localiser.camera = FakeCamera()  # type: ignore[assignment]
+    setup_tunables(localiser, "test_localiser")
+    yield localiser
+    localiser.stop_thread()
+
+
+def get_measurements(localiser: VisualLocaliser) -> list[tuple[Pose2d, float]]:
+    return localiser.chassis_component.measurements  # type: ignore[attr-defined]
+
+
+def test_one_measurement_per_frame(localiser: VisualLocaliser) -> None:
+    localiser.execute()
+    [(pose, _)] = get_measurements(localiser)
+    assert pose.translation().distance(ROBOT_POSE.translation()) < 0.01
+    assert localiser.frames.maxlen == VisualLocaliser.FRAME_QUEUE_LENGTH
+
+    localiser.use_multi_tag = False
+    localiser.execute()
+    assert len(get_measurements(localiser)) == 4
+    # Several tags together are more certain than any one of them
+    multi_tag, *single_tags = localiser.chassis_component.std_devs  # type: ignore[attr-defined]
+    assert all(multi_tag[0] < single[0] for single in single_tags)
+    # The nearest tag, 7, is the most certain
+    assert single_tags[1][0] < single_tags[0][0]
+
+
+def test_frames_estimated_on_thread(localiser: VisualLocaliser) -> None:
+    localiser.start_thread(period=0.001)
+    deadline = time.monotonic() + 2.0
+    while len(localiser.frames) < VisualLocaliser.FRAME_QUEUE_LENGTH:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    # The queue is bounded while the main loop isn't draining it
+    time.sleep(0.02)
+    assert len(localiser.frames) == VisualLocaliser.FRAME_QUEUE_LENGTH
+
+    localiser.stop_thread()
+    camera: FakeCamera = localiser.camera  # type: ignore[assignment]
+    assert len(camera.timestamps) > VisualLocaliser.FRAME_QUEUE_LENGTH
+    localiser.execute()
+    assert not localiser.frames
+    # Only the newest frames were kept, then execute polls the camera itself
+    measurements = get_measurements(localiser)
+    assert [timestamp for _, timestamp in measurements] == camera.timestamps[
+        -VisualLocaliser.FRAME_QUEUE_LENGTH - 1 :
+    ]
+    for pose, _ in measurements:
+        assert pose.translation().distance(ROBOT_POSE.translation()) < 0.01
+
+
+def test_no_frames_before_odometry(localiser: VisualLocaliser) -> None:
+    localiser.chassis_component.pose_history.clear()
+    assert localiser.poll() is None
+
+
+def test_choose_pose_agrees_with_heading() -> None:
+    # The best pose has the tag's orientation flipped
+    best = Pose2d(2.9, 3.4, math.pi - 0.6)
+    alternate = Pose2d(3.5, 2.6, math.pi + 0.02)
+    choice = choose_pose(best, alternate, ROBOT_POSE, 0.6)
+    assert choice.is_alternate
+    assert choice.pose.translation().distance(alternate.translation()) == 0
+    assert choice.margin > CLEAR_CHOICE_MARGIN
+
+    # Equally plausible poses are left to which fits the image better
+    choice = choose_pose(ROBOT_POSE, ROBOT_POSE, ROBOT_POSE, 0.5)
+    assert not choice.is_alternate
+    assert choice.margin == pytest.approx(2 * math.log(2))
+
+
+def test_choose_pose_from_vision_history() -> None:
+    # Odometry has slipped well away from both poses after a collision
+    estimator_pose = Pose2d(5.5, 2.7, math.pi)
+    best = Pose2d(4.3, 2.0, math.pi)
+    alternate = Pose2d(3.5, 2.7, math.pi)
+    assert not choose_pose(best, alternate, estimator_pose, 1.0).is_alternate
+    # The last measurement, moved by odometry, agrees with the alternate
+    assert choose_pose(best, alternate, estimator_pose, 1.0, ROBOT_POSE).is_alternate
+
+
+def make_target(ambiguity: float) -> PhotonTrackedTarget:
+    camera_to_target = Transform3d(Translation3d(2, 0, 0), Rotation3d())
+    return PhotonTrackedTarget(
+        0, 0, 1, 0, 7, camera_to_target, camera_to_target, ambiguity, [], []
+    )
+
+
+def test_ambiguous_tags_used_when_clear(localiser: VisualLocaliser) -> None:
+    localiser.use_multi_tag = False
+    flipped = Pose2d(2.9, 3.4, 0.5)
+    clear = FrameTarget(make_target(0.6), flipped, ROBOT_POSE, 0.0)
+    unclear = FrameTarget(make_target(0.6), ROBOT_POSE, ROBOT_POSE, 0.0)
+    localiser.process_frame(Frame(1.0, [clear, unclear], None, []))
+    [(pose, timestamp)] = get_measurements(localiser)
+    assert pose.translation().distance(ROBOT_POSE.translation()) == 0
+    assert timestamp == 1.0
+    assert localiser.last_measurement == (1.0, pose)
+
+
+STD_DEVS = (0.1, 0.1, 0.05)
+
+
+def test_innovation() -> None:
+    assert get_innovation(ROBOT_POSE, ROBOT_POSE, STD_DEVS, 0.1) == 0
+    moved = Pose2d(ROBOT_POSE.x + 0.2, ROBOT_POSE.y, -math.pi)
+    assert get_innovation(moved, ROBOT_POSE, STD_DEVS, 0.1) == pytest.approx(2)
+    # The less certain the estimator, the less a difference matters
+    assert get_innovation(moved, ROBOT_POSE, STD_DEVS, 1.0) < 0.1
+
+
+def test_innovation_gate(localiser: VisualLocaliser) -> None:
+    far = Pose2d(ROBOT_POSE.x + 0.5, ROBOT_POSE.y, ROBOT_POSE.rotation())
+    near = Pose2d(ROBOT_POSE.x + 0.1, ROBOT_POSE.y, ROBOT_POSE.rotation())
+    # Without a measurement, the estimator could be anywhere nearby
+    assert localiser.add_measurement(far, ROBOT_POSE, 1.0, STD_DEVS)
+    # Just after one, it's known to within centimetres
+    assert not localiser.add_measurement(far, ROBOT_POSE, 1.1, STD_DEVS)
+    assert localiser.innovation > INNOVATION_GATE
+    assert localiser.add_measurement(near, ROBOT_POSE, 1.2, STD_DEVS)
+    assert [pose for pose, _ in get_measurements(localiser)] == [far, near]
+    assert not localiser.rejected
+
+
+def test_relocalises_when_rejections_agree(localiser: VisualLocaliser) -> None:
+    localiser.add_measurement(ROBOT_POSE, ROBOT_POSE, 1.0, STD_DEVS)
+    slipped = Pose2d(ROBOT_POSE.x - 2, ROBOT_POSE.y, ROBOT_POSE.rotation())
+    for i in range(RELOCALISE_COUNT - 1):
+        assert not localiser.add_measurement(
+            slipped, ROBOT_POSE, 1.1 + i / 10, STD_DEVS
+        )
+    assert localiser.add_measurement(slipped, ROBOT_POSE, 1.5, STD_DEVS)
+    assert localiser.chassis_component.get_pose() == slipped
+    assert localiser.relocalisations == 1
+    assert len(get_measurements(localiser)) == 1
+
+
+def test_no_relocalising_when_rejections_disagree(
+    localiser: VisualLocaliser,
+) -> None:
+    localiser.add_measurement(ROBOT_POSE, ROBOT_POSE, 1.0, STD_DEVS)
+    for i in range(RELOCALISE_COUNT * 2):
+        bad = Pose2d(ROBOT_POSE.x - 2, ROBOT_POSE.y + i % 2, ROBOT_POSE.rotation())
+        assert not localiser.add_measurement(bad, ROBOT_POSE, 1.1 + i / 20, STD_DEVS)
+    assert localiser.chassis_component.get_pose() == ROBOT_POSE
+    assert localiser.relocalisations == 0
@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pytest
+import wpiutil.log
+from conftest import SharedLog
+
+from utilities.vision_uncertainty import (
+    AMBIGUITY,
+    FEATURES,
+    RANGE,
+    TURRET_RATE,
+    UncertaintyModel,
+    fit_uncertainty_model,
+    get_features,
+    get_log_features,
+    read_vision_log,
+)
+
+
+def test_further_is_more_uncertain() -> None:
+    model = UncertaintyModel()
+    close = model.std_devs(get_features(1.0, 0.05, 0.1, 2.0, 0.0))
+    far = model.std_devs(get_features(6.0, 0.05, 0.1, 0.1, 0.0))
+    assert close[0] == close[1]
+    assert close[0] < 0.5 < 1.5 < far[0]
+    assert close[2] < far[2]
+
+    turning = model.std_devs(get_features(1.0, 0.05, 0.1, 2.0, 3.0))
+    assert turning[0] > close[0]
+    several_tags = model.std_devs(get_features(1.0, 0.05, 0.1, 2.0, 0.0), tags=4)
+    assert several_tags[0] == pytest.approx(close[0] / 2)
+
+
+def test_std_devs_bounded() -> None:
+    model = UncertaintyModel(min_translation=0.2)
+    assert model.std_devs(get_features(0, 0, 0, 100, 0))[0] == model.min_translation
+    assert model.std_devs(get_features(20, 1, 1, 0, 0))[0] == model.max_translation
+
+
+def simulate_errors(
+    model: UncertaintyModel, n: int, rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    features = np.array(
+        [
+            get_features(
+                rng.uniform(0.5, 6),
+                rng.uniform(0, 0.25),
+                rng.uniform(-1, 1),
+                rng.uniform(0.1, 3),
+                rng.uniform(-2, 2),
+            )
+            for _ in range(n)
+        ]
+    )
+    std_devs = np.array([model.std_devs(f) for f in features])
+    translation_errors = np.hypot(
+        rng.normal(0, std_devs[:, 0]), rng.normal(0, std_devs[:, 1])
+    )
+    heading_errors = rng.normal(0, std_devs[:, 2])
+    return features, translation_errors, heading_errors
+
+
+def test_fit_recovers_model() -> None:
+    rng = np.random.default_rng(0)
+    true_model = UncertaintyModel(
+        translation=(0.05, 0.03, 1.0, 0.1, 0.02, 0.1),
+        heading=(0.2, 0.01, 2.0, 0.0, 0.0, 0.3),
+        max_translation=math.inf,
+        max_heading=math.inf,
+        min_translation=0.0,
+        min_heading=0.0,
+    )
+    features, translation_errors, heading_errors = simulate_errors(
+        true_model, 20000, rng
+    )
+    model = fit_uncertainty_model(features, translation_errors, heading_errors)
+    assert all(w >= 0 for w in model.translation + model.heading)
+    assert model.translation == pytest.approx(true_model.translation, rel=0.1, abs=0.03)
+    assert model.heading == pytest.approx(true_model.heading, rel=0.1, abs=0.05)
+
+
+def test_read_vision_log(shared_log: SharedLog) -> None:
+    data_log = shared_log.data_log
+    entry = wpiutil.log.DoubleArrayLogEntry(
+        data_log, "vision_pose_" + shared_log.name("cam")
+    )
+    other = wpiutil.log.DoubleArrayLogEntry(data_log, shared_log.name("other"))
+    # Logged before range and turret rate were, 2 m in front of tag 7
+    old_row = [0.0] * 17
+    old_row[10:12] = [1.03 + 2.0, 2.75]
+    old_row[AMBIGUITY] = 0.1
+    old_row[16] = 7
+    new_row = [*old_row, 3.5, 1.5]
+    entry.append(old_row)
+    entry.append(new_row)
+    other.append([1.0] * 19)
+    path = shared_log.wait_for(3)
+
+    rows = read_vision_log(str(path))
+    assert rows.shape == (2, 19)
+    assert rows[0, RANGE] == pytest.approx(2.0, abs=0.05)
+    assert rows[0, TURRET_RATE] == 0
+    assert rows[1, RANGE] == 3.5
+    assert rows[1, TURRET_RATE] == 1.5
+    features = get_log_features(rows)
+    assert features.shape == (2, len(FEATURES))
+    assert features[1, FEATURES.index("range_squared")] == 3.5**2
@@ -0,0 +1,61 @@
+import struct
+
+import pytest
+import wpiutil.log
+from conftest import SharedLog, encode_log, encode_record, encode_start
+
+from utilities.wpilog import CONTROL_FINISH, read_records
+
+
+def test_read_records(tmp_path) -> None:
+    path = tmp_path / "test.wpilog"
+    path.write_bytes(
+        encode_log(
+            encode_start(1, "doubles", "double[]"),
+            encode_start(300, "string", "string"),
+            encode_record(1, 1000, struct.pack("<3d", 1.5, -2.0, 3.25)),
+            encode_record(300, 2000, b"hello"),
+            # An entry that was never started
+            encode_record(2, 3000, b"\x01"),
+            encode_record(0, 4000, bytes([CONTROL_FINISH]) + struct.pack("<I", 300)),
+            encode_record(300, 5000, b"finished"),
+        )
+    )
+    doubles, string = read_records(path)
+    assert doubles.name == "doubles"
+    assert doubles.type == "double[]"
+    assert doubles.timestamp == 1000
+    assert doubles.get_double_array().tolist() == [1.5, -2.0, 3.25]
+    assert string.get_string() == "hello"
+
+
+def test_truncated_log(tmp_path) -> None:
+    path = tmp_path / "test.wpilog"
+    records = [encode_record(1, i, struct.pack("<d", i)) for i in range(3)]
+    data = encode_log(encode_start(1, "double", "double"), *records)
+    # Lose the end of the last record, as if the robot lost power
+    path.write_bytes(data[:-5])
+    assert [record.get_double() for record in read_records(path)] == [0.0, 1.0]
+
+    path.write_bytes(b"not a log")
+    with pytest.raises(ValueError):
+        list(read_records(path))
+
+
+def test_read_data_log(shared_log: SharedLog) -> None:
+    data_log = shared_log.data_log
+    doubles = wpiutil.log.DoubleArrayLogEntry(data_log, shared_log.name("doubles"))
+    booleans = wpiutil.log.BooleanLogEntry(data_log, shared_log.name("booleans"))
+    integers = wpiutil.log.IntegerLogEntry(data_log, shared_log.name("integers"))
+    doubles.append([1.5, -2.0, 3.25], 1000)
+    booleans.append(True, 2000)
+    integers.append(-42, 3000)
+
+    records = shared_log.read(shared_log.wait_for(3))
+    by_name = {
+        record.name.removeprefix(shared_log.prefix): record for record in records
+    }
+    assert by_name["doubles"].get_double_array().tolist() == [1.5, -2.0, 3.25]
+    assert by_name["doubles"].timestamp == 1000
+    assert by_name["booleans"].get_boolean()
+    assert by_name["integers"].get_integer() == -42
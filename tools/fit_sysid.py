@@ -0,0 +1,48 @@
+"""
+Fit feedforward gains to the system identification tests in a robot log.
+
+Run the tests in test mode, pull the .wpilog off the robot, then run
+`python -m tools.fit_sysid <log>`. Units are those of the mechanism's
+position: metres for the drive, radians for the steer, turret and tilt,
+and rotations for the flywheels.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+
+from utilities.sysid import fit_feedforward, read_sysid_log
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("log", type=pathlib.Path)
+    parser.add_argument(
+        "mechanism", nargs="?", help="only fit this mechanism (default: all)"
+    )
+    args = parser.parse_args()
+
+    mechanisms = read_sysid_log(str(args.log))
+    if args.mechanism is not None:
+        if args.mechanism not in mechanisms:
+            parser.error(f"no tests of {args.mechanism} in {args.log}")
+        mechanisms = {args.mechanism: mechanisms[args.mechanism]}
+
+    for name, log in mechanisms.items():
+        if not log.runs:
+            continue
+        try:
+            gains = fit_feedforward(log.runs, is_arm=log.is_arm)
+        except ValueError as e:
+            print(f"{name}: {e}")
+            continue
+        kG = f" kG={gains.kG:.4f}" if log.is_arm else ""
+        print(
+            f"{name}: kS={gains.kS:.4f} kV={gains.kV:.4f} kA={gains.kA:.4f}{kG}"
+            f" (R^2 {gains.r_squared:.3f}, {gains.samples} samples"
+            f" from {len(log.runs)} runs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
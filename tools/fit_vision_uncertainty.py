@@ -0,0 +1,64 @@
+"""
+Fit the vision uncertainty model to targets logged by the robot.
+
+Turn on should_log for the localisers, drive the robot around somewhere
+its odometry can be trusted, then run
+`python -m tools.fit_vision_uncertainty <log>...` and copy the printed
+weights into UncertaintyModel.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+
+import numpy as np
+
+from utilities.vision_uncertainty import (
+    BEST_HEADING_ERROR,
+    BEST_TRANSLATION_ERROR,
+    FEATURES,
+    UncertaintyModel,
+    fit_uncertainty_model,
+    get_log_features,
+    read_vision_log,
+)
+
+
+def describe(model: UncertaintyModel, features: np.ndarray, rows: np.ndarray) -> str:
+    """How well a model's standard deviations match the logged errors."""
+    std_devs = np.array([model.std_devs(f) for f in features])
+    # Near 1 if the model is neither over nor under confident
+    translation = np.sqrt(
+        np.mean((rows[:, BEST_TRANSLATION_ERROR] / std_devs[:, 0]) ** 2) / 2
+    )
+    heading = np.sqrt(np.mean((rows[:, BEST_HEADING_ERROR] / std_devs[:, 2]) ** 2))
+    return f"normalised RMS error translation {translation:.2f}, heading {heading:.2f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("logs", type=pathlib.Path, nargs="+")
+    args = parser.parse_args()
+
+    rows = np.concatenate([read_vision_log(str(log)) for log in args.logs])
+    if len(rows) < len(FEATURES):
+        parser.error(f"only {len(rows)} targets logged")
+    features = get_log_features(rows)
+    model = fit_uncertainty_model(
+        features, rows[:, BEST_TRANSLATION_ERROR], rows[:, BEST_HEADING_ERROR]
+    )
+
+    print(f"{len(rows)} targets")
+    print(f"current: {describe(UncertaintyModel(), features, rows)}")
+    print(f"fitted: {describe(model, features, rows)}")
+    for name, weights in (
+        ("translation", model.translation),
+        ("heading", model.heading),
+    ):
+        print(f"{name} = (" + ", ".join(f"{w:.4g}" for w in weights) + ")")
+        for feature, weight in zip(FEATURES, weights):
+            print(f"    {feature}: {weight:.4g}")
+
+
+if __name__ == "__main__":
+    main()
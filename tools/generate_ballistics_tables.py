@@ -0,0 +1,135 @@
+"""
+Generate dense ballistics tables from the projectile model.
+
+Run with `python -m tools.generate_ballistics_tables`, then commit the
+generated file to have the robot load it instead of the hand tuned tables.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import pathlib
+
+import numpy as np
+import numpy.typing as npt
+
+from utilities import projectile
+from utilities.ballistics import (
+    BALLISTICS_TABLES_PATH,
+    BALLISTICS_TABLES_VERSION,
+    FALLBACK_BALLISTICS_TABLES,
+)
+from utilities.game import GoalHeight, GridColumn, get_goal_position
+
+# Heights of the centre of each goal above the floor
+GOAL_HEIGHTS = {
+    goal: get_goal_position(1, goal, GridColumn.CENTRE).z for goal in GoalHeight
+}
+
+
+def generate_table(
+    goal: GoalHeight,
+    ranges: npt.NDArray[np.float64],
+    drag_constant: float = projectile.CUBE_DRAG_CONSTANT,
+    efficiency: float = projectile.EXIT_SPEED_EFFICIENCY,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Solve for the flywheel speeds to hit a goal at each range.
+
+    The tilt angles and the split of speed between the top and bottom
+    flywheels follow the hand tuned table for the goal.
+    The table ends with the flywheels stopped just beyond the furthest
+    reachable range, so we never try to shoot further than that.
+    """
+    fallback = FALLBACK_BALLISTICS_TABLES[goal]
+    spinning = fallback.values[:, 1] + fallback.values[:, 2] > 0
+    top_fractions = fallback.values[spinning, 1] / (
+        fallback.values[spinning, 1] + fallback.values[spinning, 2]
+    )
+    max_exit_speed = projectile.exit_speed(
+        projectile.MAX_FLYWHEEL_SPEED, projectile.MAX_FLYWHEEL_SPEED, efficiency
+    )
+
+    table_ranges: list[float] = []
+    rows: list[tuple[float, float, float, float]] = []
+    for target_range in ranges:
+        tilt_angle = fallback.lookup(target_range)[0]
+        solution = projectile.solve_exit_speed(
+            target_range,
+            GOAL_HEIGHTS[goal],
+            projectile.launch_elevation(tilt_angle),
+            max_exit_speed,
+            drag_constant=drag_constant,
+        )
+        if solution is None:
+            break
+        speed, flight_time = solution
+        mean_flywheel_speed = projectile.flywheel_speed_for_exit_speed(
+            speed, efficiency
+        )
+        top_fraction = float(
+            np.interp(target_range, fallback.ranges[spinning], top_fractions)
+        )
+        top_speed = 2 * mean_flywheel_speed * top_fraction
+        bottom_speed = 2 * mean_flywheel_speed * (1 - top_fraction)
+        if max(top_speed, bottom_speed) > projectile.MAX_FLYWHEEL_SPEED:
+            break
+        table_ranges.append(target_range)
+        rows.append((tilt_angle, top_speed, bottom_speed, flight_time))
+
+    if len(rows) < 2:
+        raise ValueError(f"the {goal.name} goal is out of range of the model")
+    last_tilt, _, _, last_flight_time = rows[-1]
+    table_ranges.append(table_ranges[-1] + 0.01)
+    rows.append((last_tilt, 0.0, 0.0, last_flight_time))
+    return np.array(table_ranges), np.array(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-o", "--output", type=pathlib.Path, default=BALLISTICS_TABLES_PATH
+    )
+    parser.add_argument("--min-range", type=float, default=0.5, help="metres")
+    parser.add_argument("--max-range", type=float, default=8.0, help="metres")
+    parser.add_argument("--range-step", type=float, default=0.05, help="metres")
+    parser.add_argument(
+        "--drag-coefficient",
+        type=float,
+        default=projectile.CUBE_DRAG_COEFFICIENT,
+    )
+    parser.add_argument(
+        "--efficiency",
+        type=float,
+        default=projectile.EXIT_SPEED_EFFICIENCY,
+        help="fraction of flywheel surface speed the cube leaves with",
+    )
+    args = parser.parse_args()
+
+    drag_constant = (
+        projectile.CUBE_DRAG_CONSTANT
+        * args.drag_coefficient
+        / projectile.CUBE_DRAG_COEFFICIENT
+    )
+    ranges = np.arange(args.min_range, args.max_range, args.range_step)
+    arrays: dict[str, npt.NDArray] = {
+        "version": np.array(BALLISTICS_TABLES_VERSION),
+    }
+    for goal in GoalHeight:
+        table_ranges, values = generate_table(
+            goal, ranges, drag_constant, args.efficiency
+        )
+        arrays[f"{goal.name.lower()}_ranges"] = table_ranges
+        arrays[f"{goal.name.lower()}_values"] = values
+        print(
+            f"{goal.name:>4}: {len(table_ranges)} points up to {table_ranges[-1]:.2f} m,"
+            f" tilt {math.degrees(values[:, 0].min()):.0f}-{math.degrees(values[:, 0].max()):.0f} deg"
+        )
+
+    # Uncompressed so the robot can memory map the arrays
+    np.savez(args.output, **arrays)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Generate the autonomous trajectories from the paths defined here.
+
+Run with `python -m tools.generate_trajectories`, then commit the generated
+file for the robot to load.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import pathlib
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+from wpimath.geometry import Pose2d
+
+from utilities.trajectory import (
+    SAMPLE_PERIOD,
+    TRAJECTORIES_PATH,
+    TRAJECTORIES_VERSION,
+    generate_trajectory,
+)
+
+
+@dataclass
+class Path:
+    # Rotations are the direction of travel, for the blue alliance
+    waypoints: list[Pose2d]
+    start_heading: float = 0.0
+    end_heading: float = 0.0
+    max_speed: float = 2.0  # m/s
+    max_acceleration: float = 3.0  # m/s^2
+    max_angular_speed: float = 3.0  # rad/s
+    max_angular_acceleration: float = 6.0  # rad/s^2
+
+
+PATHS = {
+    # Out of the community, straight away from our grid
+    "drive_forward": Path([Pose2d(0, 0, 0), Pose2d(2, 0, 0)]),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-o", "--output", type=pathlib.Path, default=TRAJECTORIES_PATH)
+    parser.add_argument("--period", type=float, default=SAMPLE_PERIOD, help="seconds")
+    args = parser.parse_args()
+
+    arrays: dict[str, npt.NDArray] = {
+        "version": np.array(TRAJECTORIES_VERSION),
+        "period": np.array(args.period),
+    }
+    for name, path in PATHS.items():
+        trajectory = generate_trajectory(
+            path.waypoints,
+            path.start_heading,
+            path.end_heading,
+            path.max_speed,
+            path.max_acceleration,
+            path.max_angular_speed,
+            path.max_angular_acceleration,
+            args.period,
+        )
+        # Single precision is plenty for positions on the field
+        arrays[name] = trajectory.samples.astype(np.float32)
+        final_pose = trajectory.final_pose()
+        print(
+            f"{name}: {trajectory.duration:.2f} s, {len(trajectory.samples)} samples,"
+            f" ending at ({final_pose.x:.2f}, {final_pose.y:.2f},"
+            f" {math.degrees(final_pose.rotation().radians()):.0f} deg)"
+        )
+
+    # Uncompressed so the robot can memory map the arrays
+    np.savez(args.output, **arrays)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Replay logged odometry and camera frames through the pose estimator and the
+vision filtering, and report how far the replayed poses are from those the
+robot estimated and how long each frame took to process.
+
+Run `python -m tools.replay <log>...` before and after changing the
+filtering to compare them on real match data.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+
+from utilities.input_log import ESTIMATED_POSE
+from utilities.replay import replay
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("logs", type=pathlib.Path, nargs="+")
+    parser.add_argument(
+        "--reference",
+        default=ESTIMATED_POSE,
+        help="entry of (x, y, heading) poses to measure the error from",
+    )
+    parser.add_argument(
+        "--no-vision",
+        action="store_true",
+        help="don't add vision measurements, to see what odometry alone does",
+    )
+    parser.add_argument(
+        "--no-multi-tag",
+        action="store_true",
+        help="use each tag on its own rather than combining them",
+    )
+    args = parser.parse_args()
+
+    for log in args.logs:
+        result = replay(
+            log,
+            reference=args.reference,
+            use_vision=not args.no_vision,
+            use_multi_tag=not args.no_multi_tag,
+        )
+        print(f"{log}:")
+        print(result.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,23 @@
 from __future__ import annotations
 
+import bisect
+import logging
 import math
+import pathlib
+import struct
+import zipfile
 from dataclasses import dataclass
-from enum import Enum
 
+import numpy as np
+import numpy.typing as npt
 from wpimath.geometry import Pose2d, Translation3d
+from wpimath.kinematics import ChassisSpeeds
 
 from components.turret import Turret
-from utilities.functions import constrain_angle, interpolate
+from utilities.functions import constrain_angle
+from utilities.game import GoalHeight
 
-
-class GoalHeight(Enum):
-    HIGH = 2
-    MID = 1
-    LOW = 0
-
-    def up(self) -> GoalHeight:
-        if self is GoalHeight.LOW:
-            return GoalHeight.MID
-        return GoalHeight.HIGH
-
-    def down(self) -> GoalHeight:
-        if self is GoalHeight.HIGH:
-            return GoalHeight.MID
-        return GoalHeight.LOW
-
-
-class GridColumn(Enum):
-    LEFT = -1
-    CENTRE = 0
-    RIGHT = 1
-
-    def left(self) -> GridColumn:
-        if self is GridColumn.RIGHT:
-            return GridColumn.CENTRE
-        return GridColumn.LEFT
-
-    def right(self) -> GridColumn:
-        if self is GridColumn.LEFT:
-            return GridColumn.CENTRE
-        return GridColumn.RIGHT
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -49,94 +27,346 @@ class BallisticsSolution:
     top_flywheel_speed: float
     bottom_flywheel_speed: float
     range: float
+    time_of_flight: float = 0.0
+    # False if the moving shot lead compensation failed to settle on a target in range
+    converged: bool = True
+
+
+@dataclass
+class BallisticsSolutions:
+    """Ballistics solutions for many robot poses, one array element per pose."""
+
+    turret_angle: npt.NDArray[np.float64]
+    tilt_angle: npt.NDArray[np.float64]
+    top_flywheel_speed: npt.NDArray[np.float64]
+    bottom_flywheel_speed: npt.NDArray[np.float64]
+    range: npt.NDArray[np.float64]
+    time_of_flight: npt.NDArray[np.float64]
+
+
+class BallisticsTable:
+    """
+    A piecewise linear lookup table from range to shooter setpoints
+    and the expected time of flight of the cube.
+
+    The knots are stored as contiguous arrays with the slope of every segment
+    precomputed, so a lookup is a binary search and a multiply-add.
+    Lookups outside the table are clamped to the end values, like np.interp.
+    """
+
+    def __init__(self, ranges: npt.ArrayLike, values: npt.ArrayLike) -> None:
+        """
+        Args:
+            ranges: the N ranges of the table knots, in increasing order.
+            values: an (N, 4) array of tilt angle, top flywheel speed,
+                bottom flywheel speed and time of flight at each knot.
+                Contiguous float64 arrays (including memory maps) are used
+                without copying.
+        """
+        self.ranges = np.ascontiguousarray(ranges, dtype=np.float64)
+        if self.ranges.ndim != 1 or len(self.ranges) < 2:
+            raise ValueError("a ballistics table needs at least two ranges")
+        if np.any(np.diff(self.ranges) <= 0):
+            raise ValueError("ballistics table ranges must be strictly increasing")
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        if self.values.shape != (len(self.ranges), 4):
+            raise ValueError("ballistics table columns must match the ranges")
+        self.max_range = float(self.ranges[-1])
+        self.slopes = np.ascontiguousarray(
+            np.diff(self.values, axis=0) / np.diff(self.ranges)[:, np.newaxis]
+        )
+
+        # Indexing Python lists is much cheaper than indexing numpy arrays
+        # one element at a time, so keep copies for single lookups.
+        self._range_list: list[float] = self.ranges.tolist()
+        self._value_rows: list[list[float]] = self.values.tolist()
+        self._slope_rows: list[list[float]] = self.slopes.tolist()
+
+    @classmethod
+    def from_columns(
+        cls,
+        ranges: npt.ArrayLike,
+        tilt_angles: npt.ArrayLike,
+        top_speeds: npt.ArrayLike,
+        bottom_speeds: npt.ArrayLike,
+        flight_times: npt.ArrayLike,
+    ) -> BallisticsTable:
+        return cls(
+            ranges,
+            np.column_stack((tilt_angles, top_speeds, bottom_speeds, flight_times)),
+        )
+
+    def lookup(self, target_range: float) -> tuple[float, float, float, float]:
+        """Get the (tilt angle, top speed, bottom speed, time of flight) for a range."""
+        ranges = self._range_list
+        idx = bisect.bisect_right(ranges, target_range) - 1
+        if idx < 0:
+            row = self._value_rows[0]
+            return row[0], row[1], row[2], row[3]
+        if idx >= len(ranges) - 1:
+            row = self._value_rows[-1]
+            return row[0], row[1], row[2], row[3]
+        row = self._value_rows[idx]
+        slope = self._slope_rows[idx]
+        offset = target_range - ranges[idx]
+        return (
+            row[0] + slope[0] * offset,
+            row[1] + slope[1] * offset,
+            row[2] + slope[2] * offset,
+            row[3] + slope[3] * offset,
+        )
+
+    def lookup_many(self, target_ranges: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """Get an (N, 4) array of table values for N ranges."""
+        target_ranges = np.asarray(target_ranges, dtype=np.float64)
+        idx = np.searchsorted(self.ranges, target_ranges, side="right") - 1
+        np.clip(idx, 0, len(self.ranges) - 2, out=idx)
+        offset = (
+            np.clip(target_ranges, self.ranges[0], self.ranges[-1]) - self.ranges[idx]
+        )
+        return self.values[idx] + self.slopes[idx] * offset[..., np.newaxis]
+
+
+# Hand tuned tables, used when there are no generated tables to load
+FALLBACK_BALLISTICS_TABLES = {
+    GoalHeight.HIGH: BallisticsTable.from_columns(
+        ranges=[0.0, 1.5, 2.0, 3.0, 5.0, 5.01],
+        tilt_angles=np.radians([45, 30, 30, 30, 30, 30]),
+        top_speeds=[27.5, 27.5, 30.0, 35.0, 50.0, 0.0],
+        bottom_speeds=[22.5, 22.5, 25.0, 30.0, 50.0, 0.0],
+        flight_times=[0.35, 0.45, 0.5, 0.6, 0.8, 0.8],
+    ),
+    GoalHeight.MID: BallisticsTable.from_columns(
+        ranges=[0.0, 1.0, 1.5, 2.0, 5.0, 5.01],
+        tilt_angles=np.radians([50, 50, 45, 30, 30, 30]),
+        top_speeds=[22.5, 22.5, 24.0, 35.0, 50.0, 0.0],
+        bottom_speeds=[20.0, 20.0, 21.0, 30.0, 50.0, 0.0],
+        flight_times=[0.3, 0.3, 0.35, 0.4, 0.7, 0.7],
+    ),
+    GoalHeight.LOW: BallisticsTable.from_columns(
+        ranges=[0.0, 1.0, 1.5, 2.0, 5.0, 5.01],
+        tilt_angles=np.radians([60, 60, 60, 45, 30, 30]),
+        top_speeds=[15.0, 15.0, 20.0, 25.0, 35.0, 0.0],
+        bottom_speeds=[15.0, 15.0, 20.0, 22.5, 35.0, 0.0],
+        flight_times=[0.3, 0.3, 0.35, 0.4, 0.65, 0.65],
+    ),
+}
+
+# Generated by `python -m tools.generate_ballistics_tables`.
+# Bump the version whenever the layout of the file changes.
+BALLISTICS_TABLES_PATH = pathlib.Path(__file__).with_name("ballistics_tables.npz")
+BALLISTICS_TABLES_VERSION = 1
+
+
+def memmap_npz(path: pathlib.Path) -> dict[str, np.ndarray]:
+    """
+    Memory map every array in an uncompressed .npz file, as written by np.savez.
+
+    np.load can only memory map .npy files, but the members of an uncompressed
+    zip archive are stored contiguously, so we can map them in place.
+    """
+    arrays: dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} in {path} is compressed")
+            # The local file header has its own name and extra field lengths,
+            # which can differ from those in the central directory
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{info.filename} in {path} holds Python objects")
+
+            name = info.filename.removesuffix(".npy")
+            if shape == ():
+                arrays[name] = np.fromfile(f, dtype=dtype, count=1).reshape(())
+            else:
+                arrays[name] = np.memmap(
+                    path,
+                    dtype=dtype,
+                    mode="r",
+                    offset=f.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+    return arrays
+
+
+def load_ballistics_tables(
+    path: pathlib.Path = BALLISTICS_TABLES_PATH,
+) -> dict[GoalHeight, BallisticsTable] | None:
+    """
+    Load generated ballistics tables. They're small, and lookups use lists
+    copied from them, so they're read eagerly rather than memory mapped.
+
+    Returns None if the file doesn't exist or can't be used.
+    """
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        version = int(arrays["version"])
+        if version != BALLISTICS_TABLES_VERSION:
+            logger.warning(
+                "ignoring %s: version %d, expected %d",
+                path,
+                version,
+                BALLISTICS_TABLES_VERSION,
+            )
+            return None
+        return {
+            goal: BallisticsTable(
+                arrays[f"{goal.name.lower()}_ranges"],
+                arrays[f"{goal.name.lower()}_values"],
+            )
+            for goal in GoalHeight
+        }
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        logger.exception("could not load ballistics tables from %s", path)
+        return None
+
+
+BALLISTICS_TABLES = load_ballistics_tables() or FALLBACK_BALLISTICS_TABLES
+
+# Upper bounds of target height for the low and mid goal tables
+LOW_GOAL_MAX_HEIGHT = 0.30
+MID_GOAL_MAX_HEIGHT = 0.60
+
+# Lead compensation for moving shots stops iterating once the virtual target
+# moves less than this between iterations
+LEAD_TOLERANCE = 0.01  # m
+LEAD_MAX_ITERATIONS = 10
+
+_TURRET_OFFSET_X = Turret.TRANSLATION3D.x
+_TURRET_OFFSET_Y = Turret.TRANSLATION3D.y
+
+
+def goal_height_for_target(target_z: float) -> GoalHeight:
+    """Work out which goal a target is in from its height."""
+    # We have to have different lookup tables for high, mid and low goals
+    if target_z < LOW_GOAL_MAX_HEIGHT:
+        return GoalHeight.LOW
+    if target_z < MID_GOAL_MAX_HEIGHT:
+        return GoalHeight.MID
+    return GoalHeight.HIGH
 
 
 def calculate_ballistics(
-    robot_pose: Pose2d, target_position: Translation3d
+    robot_pose: Pose2d,
+    target_position: Translation3d,
+    robot_velocity: ChassisSpeeds | None = None,
 ) -> BallisticsSolution:
-    turret_trans = (
-        robot_pose.translation()
-        + Turret.TRANSLATION3D.toTranslation2d().rotateBy(robot_pose.rotation())
+    """
+    Solve for the turret angle, tilt and flywheel speeds to hit a target.
+
+    If the field relative robot velocity is given, aim at a virtual target
+    offset against the motion of the turret for the cube's time of flight,
+    so we can shoot on the move.
+    """
+    heading = robot_pose.rotation().radians()
+    cos_heading = math.cos(heading)
+    sin_heading = math.sin(heading)
+    turret_x = (
+        robot_pose.x + _TURRET_OFFSET_X * cos_heading - _TURRET_OFFSET_Y * sin_heading
     )
-    dy = target_position.y - turret_trans.y
-    dx = target_position.x - turret_trans.x
+    turret_y = (
+        robot_pose.y + _TURRET_OFFSET_X * sin_heading + _TURRET_OFFSET_Y * cos_heading
+    )
+    table = BALLISTICS_TABLES[goal_height_for_target(target_position.z)]
+
+    dx = target_position.x - turret_x
+    dy = target_position.y - turret_y
     distance = math.hypot(dy, dx)
+    tilt_angle, top_speed, bottom_speed, flight_time = table.lookup(distance)
+
+    converged = True
+    if robot_velocity is not None and (
+        robot_velocity.vx or robot_velocity.vy or robot_velocity.omega
+    ):
+        # The cube leaves with the velocity of the turret, including the
+        # component from the robot spinning about its centre
+        turret_vx = robot_velocity.vx - robot_velocity.omega * (turret_y - robot_pose.y)
+        turret_vy = robot_velocity.vy + robot_velocity.omega * (turret_x - robot_pose.x)
+        converged = False
+        for _ in range(LEAD_MAX_ITERATIONS):
+            # Aim where the target would be if we were still,
+            # given how long the cube will fly for
+            new_dx = target_position.x - turret_vx * flight_time - turret_x
+            new_dy = target_position.y - turret_vy * flight_time - turret_y
+            moved = math.hypot(new_dx - dx, new_dy - dy)
+            dx, dy = new_dx, new_dy
+            distance = math.hypot(dy, dx)
+            tilt_angle, top_speed, bottom_speed, flight_time = table.lookup(distance)
+            if moved < LEAD_TOLERANCE:
+                # Beyond the end of the table the time of flight is a guess
+                converged = distance <= table.max_range
+                break
+
     azimuth = math.atan2(dy, dx)
-    turret_angle = constrain_angle(azimuth - robot_pose.rotation().radians())
-    # We have to have different lookup tables for high, mid and low goals
-    if target_position.z < 0.30:
-        # Low goal
-        bs = _get_low_solution(distance)
-    elif target_position.z < 0.60:
-        # Mid goal
-        bs = _get_mid_solution(distance)
-    else:
-        # High goal
-        bs = _get_high_solution(distance)
-    bs.turret_angle = turret_angle
-    return bs
-
-
-def _get_high_solution(target_range: float) -> BallisticsSolution:
-    ranges = [0.0, 1.5, 2.0, 3.0, 5.0, 5.01]
-    angles = [
-        math.radians(45),
-        math.radians(30),
-        math.radians(30),
-        math.radians(30),
-        math.radians(30),
-        math.radians(30),
-    ]
-    top_speeds = [27.5, 27.5, 30.0, 35.0, 50.0, 0.0]
-    bottom_speeds = [22.5, 22.5, 25.0, 30.0, 50.0, 0.0]
-    return _interp(target_range, ranges, angles, top_speeds, bottom_speeds)
-
-
-def _get_mid_solution(target_range: float) -> BallisticsSolution:
-    ranges = [0.0, 1.0, 1.5, 2.0, 5.0, 5.01]
-    angles = [
-        math.radians(50),
-        math.radians(50),
-        math.radians(45),
-        math.radians(30),
-        math.radians(30),
-        math.radians(30),
-    ]
-    top_speeds = [22.5, 22.5, 24.0, 35.0, 50.0, 0.0]
-    bottom_speeds = [20.0, 20.0, 21.0, 30.0, 50.0, 0.0]
-    return _interp(target_range, ranges, angles, top_speeds, bottom_speeds)
-
-
-def _get_low_solution(target_range: float) -> BallisticsSolution:
-    ranges = [0.0, 1.0, 1.5, 2.0, 5.0, 5.01]
-    angles = [
-        math.radians(60),
-        math.radians(60),
-        math.radians(60),
-        math.radians(45),
-        math.radians(30),
-        math.radians(30),
-    ]
-    top_speeds = [15.0, 15.0, 20.0, 25.0, 35.0, 0.0]
-    bottom_speeds = [15.0, 15.0, 20.0, 22.5, 35.0, 0.0]
-    return _interp(target_range, ranges, angles, top_speeds, bottom_speeds)
-
-
-def _interp(
-    target_range: float,
-    ranges: list[float],
-    angles: list[float],
-    top_speeds: list[float],
-    bottom_speeds: list[float],
-) -> BallisticsSolution:
-    angle = interpolate(target_range, ranges, angles)
-    top_speed = interpolate(target_range, ranges, top_speeds)
-    bottom_speed = interpolate(target_range, ranges, bottom_speeds)
-    bs = BallisticsSolution(
-        turret_angle=0,
-        tilt_angle=angle,
+    turret_angle = constrain_angle(azimuth - heading)
+    return BallisticsSolution(
+        turret_angle=turret_angle,
+        tilt_angle=tilt_angle,
         top_flywheel_speed=top_speed,
         bottom_flywheel_speed=bottom_speed,
-        range=target_range,
+        range=distance,
+        time_of_flight=flight_time,
+        converged=converged,
+    )
+
+
+def calculate_ballistics_batch(
+    poses: npt.ArrayLike, targets: npt.ArrayLike
+) -> BallisticsSolutions:
+    """
+    Solve the ballistics for many robot poses at once.
+
+    Args:
+        poses: an (N, 3) array of robot x, y and heading (radians).
+        targets: the target x, y and z, either as a (3,) array shared by
+            every pose or as an (N, 3) array with a target per pose.
+    """
+    poses = np.asarray(poses, dtype=np.float64)
+    targets = np.broadcast_to(np.asarray(targets, dtype=np.float64), poses.shape)
+    x, y, heading = poses[..., 0], poses[..., 1], poses[..., 2]
+
+    cos_heading = np.cos(heading)
+    sin_heading = np.sin(heading)
+    turret_x = x + _TURRET_OFFSET_X * cos_heading - _TURRET_OFFSET_Y * sin_heading
+    turret_y = y + _TURRET_OFFSET_X * sin_heading + _TURRET_OFFSET_Y * cos_heading
+    dx = targets[..., 0] - turret_x
+    dy = targets[..., 1] - turret_y
+    distance = np.hypot(dy, dx)
+    turret_angle = np.arctan2(dy, dx) - heading
+    turret_angle = np.arctan2(np.sin(turret_angle), np.cos(turret_angle))
+
+    target_z = targets[..., 2]
+    setpoints = np.empty(poses.shape[:-1] + (4,))
+    low = target_z < LOW_GOAL_MAX_HEIGHT
+    mid = ~low & (target_z < MID_GOAL_MAX_HEIGHT)
+    high = ~(low | mid)
+    for goal, mask in (
+        (GoalHeight.LOW, low),
+        (GoalHeight.MID, mid),
+        (GoalHeight.HIGH, high),
+    ):
+        if mask.any():
+            setpoints[mask] = BALLISTICS_TABLES[goal].lookup_many(distance[mask])
+
+    return BallisticsSolutions(
+        turret_angle=turret_angle,
+        tilt_angle=setpoints[..., 0],
+        top_flywheel_speed=setpoints[..., 1],
+        bottom_flywheel_speed=setpoints[..., 2],
+        range=distance,
+        time_of_flight=setpoints[..., 3],
     )
-    return bs
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import math
+
+from wpimath.trajectory import TrapezoidProfileRadians
+
+from components.tilt import Tilt
+from components.turret import Turret
+
+
+def profile_time(
+    constraints: TrapezoidProfileRadians.Constraints,
+    current: TrapezoidProfileRadians.State,
+    goal: float,
+) -> float:
+    """Time (s) for a trapezoid profile to take a mechanism to rest at a goal."""
+    profile = TrapezoidProfileRadians(
+        constraints, TrapezoidProfileRadians.State(goal, 0.0), current
+    )
+    return profile.totalTime()
+
+
+class FlipPlanner:
+    """
+    Chooses whether to aim with the shooter flipped over the top.
+
+    Any target can be reached by either turning the turret to face it, or
+    turning the turret the other way by 180 degrees and tilting the shooter
+    over backwards. Within the turret's limits we pick whichever gets both
+    the turret and tilt there first, only changing our mind when the other
+    option is faster by a margin so we don't dither between them.
+    """
+
+    def __init__(
+        self,
+        turret_constraints: TrapezoidProfileRadians.Constraints = Turret.ROTATION_CONSTRAINTS,
+        tilt_constraints: TrapezoidProfileRadians.Constraints = Tilt.ROTATION_CONSTRAINTS,
+        hysteresis: float = 0.1,
+    ) -> None:
+        self.turret_constraints = turret_constraints
+        self.tilt_constraints = tilt_constraints
+        # Time (s) the other option has to save before we switch to it
+        self.hysteresis = hysteresis
+        self.flipped = False
+
+    def time_to_aim(
+        self,
+        turret_state: TrapezoidProfileRadians.State,
+        tilt_state: TrapezoidProfileRadians.State,
+        turret_angle: float,
+        tilt_angle: float,
+    ) -> float:
+        """Time (s) until both the turret and tilt reach their goals."""
+        return max(
+            profile_time(self.turret_constraints, turret_state, turret_angle),
+            profile_time(self.tilt_constraints, tilt_state, tilt_angle),
+        )
+
+    def plan(
+        self,
+        turret_angle: float,
+        tilt_angle: float,
+        turret_state: TrapezoidProfileRadians.State,
+        tilt_state: TrapezoidProfileRadians.State,
+    ) -> tuple[float, float]:
+        """
+        Pick the turret and tilt angles to aim with.
+
+        Args:
+            turret_angle: the robot relative azimuth to the target, in [-pi, pi].
+            tilt_angle: the (unflipped) tilt angle to hit the target.
+            turret_state: the current turret angle and angular velocity.
+            tilt_state: the current tilt angle and angular velocity.
+        """
+        flipped_turret_angle = (
+            turret_angle - math.pi if turret_angle > 0 else turret_angle + math.pi
+        )
+        can_aim = is_reachable(turret_angle)
+        can_aim_flipped = is_reachable(flipped_turret_angle)
+
+        if can_aim and can_aim_flipped:
+            time = self.time_to_aim(turret_state, tilt_state, turret_angle, tilt_angle)
+            flipped_time = self.time_to_aim(
+                turret_state, tilt_state, flipped_turret_angle, -tilt_angle
+            )
+            if self.flipped:
+                self.flipped = time + self.hysteresis >= flipped_time
+            else:
+                self.flipped = flipped_time + self.hysteresis < time
+        else:
+            self.flipped = not can_aim
+
+        if self.flipped:
+            return flipped_turret_angle, -tilt_angle
+        return turret_angle, tilt_angle
+
+
+def is_reachable(turret_angle: float) -> bool:
+    return (
+        Turret.NEGATIVE_SOFT_LIMIT_ANGLE
+        <= turret_angle
+        <= Turret.POSITIVE_SOFT_LIMIT_ANGLE
+    )
@@ -4,8 +4,8 @@ from collections.abc import Sequence
 from typing import Callable
 
 import numpy as np
-from wpimath.geometry import Rotation2d
-from wpimath.kinematics import SwerveModuleState
+from wpimath.geometry import Pose2d, Rotation2d, Translation2d
+from wpimath.kinematics import ChassisSpeeds, SwerveModuleState
 
 
 def constrain_angle(angle: float) -> float:
@@ -55,6 +55,27 @@ def rate_limit_module(
     return SwerveModuleState(new_speed, rot)
 
 
+def discretise_speeds(
+    speeds: ChassisSpeeds, dt: float, latency: float = 0.0
+) -> ChassisSpeeds:
+    """
+    Correct robot relative speeds for the robot turning while it translates.
+
+    The speeds are held for dt, starting latency seconds after the heading
+    they were calculated for. Holding them would drive the robot along an
+    arc, so instead find the constant speeds (using the pose exponential)
+    that end up where translating in a straight line would.
+    """
+    # The robot has already turned by the time the speeds take effect
+    translation = Translation2d(speeds.vx, speeds.vy).rotateBy(
+        Rotation2d(-speeds.omega * latency)
+    )
+    twist = Pose2d().log(
+        Pose2d(translation.x * dt, translation.y * dt, Rotation2d(speeds.omega * dt))
+    )
+    return ChassisSpeeds(twist.dx / dt, twist.dy / dt, twist.dtheta / dt)
+
+
 def clamp_2d(val: tuple[float, float], radius: float) -> tuple[float, float]:
     """
     Constrains a vector to be within the unit circle
@@ -1,8 +1,12 @@
+from __future__ import annotations
+
 import typing
+from enum import Enum
 
+import numpy as np
 import robotpy_apriltag
 import wpilib
-from wpimath.geometry import Pose2d, Pose3d
+from wpimath.geometry import Pose2d, Pose3d, Rotation3d, Transform3d, Translation3d
 
 apriltag_layout = robotpy_apriltag.loadAprilTagLayoutField(
     robotpy_apriltag.AprilTagField.k2023ChargedUp
@@ -19,6 +23,86 @@ tag_8 = get_fiducial_pose(8)
 tag_1 = get_fiducial_pose(1)
 FIELD_LENGTH = tag_1.x + tag_8.x
 
+RED_GRID_TAG_IDS: tuple[TagId, TagId, TagId] = (1, 2, 3)
+BLUE_GRID_TAG_IDS: tuple[TagId, TagId, TagId] = (6, 7, 8)
+
+
+class GoalHeight(Enum):
+    HIGH = 2
+    MID = 1
+    LOW = 0
+
+    def up(self) -> GoalHeight:
+        if self is GoalHeight.LOW:
+            return GoalHeight.MID
+        return GoalHeight.HIGH
+
+    def down(self) -> GoalHeight:
+        if self is GoalHeight.HIGH:
+            return GoalHeight.MID
+        return GoalHeight.LOW
+
+
+class GridColumn(Enum):
+    LEFT = -1
+    CENTRE = 0
+    RIGHT = 1
+
+    def left(self) -> GridColumn:
+        if self is GridColumn.RIGHT:
+            return GridColumn.CENTRE
+        return GridColumn.LEFT
+
+    def right(self) -> GridColumn:
+        if self is GridColumn.LEFT:
+            return GridColumn.CENTRE
+        return GridColumn.RIGHT
+
+
+def get_goal_offset(goal_height: GoalHeight, column: GridColumn) -> Translation3d:
+    """Get the offset from a grid's tag to the centre of one of its goals."""
+    # Each goal is 42cm deep
+    if goal_height is GoalHeight.HIGH:
+        return Translation3d(-(0.42 + 0.42 / 2.0), 0.0, 0.45)
+    if goal_height is GoalHeight.MID:
+        return Translation3d(-0.42 / 2.0, 0.0, 0.05)
+    # distance between centre of cone nodes in a grid row is 44"
+    breadth = 44.0 / 2.0 * 0.0254 * column.value
+    return Translation3d(0.42 / 2.0, breadth, -0.45)
+
+
+def _build_goal_positions() -> list[list[list[Translation3d]]]:
+    positions = []
+    for tag_id in range(1, 9):
+        tag_pose = get_fiducial_pose(typing.cast(TagId, tag_id))
+        positions.append(
+            [
+                [
+                    tag_pose.transformBy(
+                        Transform3d(get_goal_offset(height, column), Rotation3d())
+                    ).translation()
+                    for column in sorted(GridColumn, key=lambda c: c.value)
+                ]
+                for height in sorted(GoalHeight, key=lambda h: h.value)
+            ]
+        )
+    return positions
+
+
+# Indexed by [tag_id - 1][goal_height.value][column.value + 1]. Lookups are
+# always of a single goal, returned as a Translation3d, which nested lists
+# give without converting from numpy scalars.
+_goal_positions = _build_goal_positions()
+
+# Field x and y of each alliance's grid tags, in the order of their IDs, for
+# finding the closest with one vectorised distance calculation
+_RED_GRID_TAG_XY = np.array(
+    [(tag.x, tag.y) for tag in map(get_fiducial_pose, RED_GRID_TAG_IDS)]
+)
+_BLUE_GRID_TAG_XY = np.array(
+    [(tag.x, tag.y) for tag in map(get_fiducial_pose, BLUE_GRID_TAG_IDS)]
+)
+
 
 def is_red() -> bool:
     return get_team() == wpilib.DriverStation.Alliance.kRed
@@ -30,25 +114,21 @@ def get_team() -> wpilib.DriverStation.Alliance:
 
 def get_grid_tag_ids() -> tuple[TagId, TagId, TagId]:
     """Get our alliance's grids' tag IDs."""
-    return (1, 2, 3) if is_red() else (6, 7, 8)
-
+    return RED_GRID_TAG_IDS if is_red() else BLUE_GRID_TAG_IDS
 
-def find_closest_tag(robot_pose: Pose2d) -> tuple[Pose3d, int]:
-    tag_ids = get_grid_tag_ids()
 
-    # Use the first tag to set a baseline for distance
-    best_id = tag_ids[0]
-    best_tag = get_fiducial_pose(best_id)
+def find_closest_grid_tag_id(robot_pose: Pose2d) -> TagId:
+    """Find the tag of our alliance's grid closest to the robot."""
+    if is_red():
+        tag_ids, tag_xy = RED_GRID_TAG_IDS, _RED_GRID_TAG_XY
+    else:
+        tag_ids, tag_xy = BLUE_GRID_TAG_IDS, _BLUE_GRID_TAG_XY
+    distances = np.hypot(tag_xy[:, 0] - robot_pose.x, tag_xy[:, 1] - robot_pose.y)
+    return tag_ids[int(np.argmin(distances))]
 
-    closest_distance = robot_pose.translation().distance(
-        best_tag.toPose2d().translation()
-    )
 
-    for tag_id in tag_ids[1:]:
-        tag = get_fiducial_pose(tag_id)
-        d = robot_pose.translation().distance(tag.toPose2d().translation())
-        if d < closest_distance:
-            closest_distance = d
-            best_tag = tag
-            best_id = tag_id
-    return best_tag, best_id
+def get_goal_position(
+    tag_id: TagId, goal_height: GoalHeight, column: GridColumn
+) -> Translation3d:
+    """Get the field position of the centre of a goal in the grid with a tag."""
+    return _goal_positions[tag_id - 1][goal_height.value][column.value + 1]
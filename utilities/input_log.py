@@ -0,0 +1,159 @@
+"""
+The inputs to the pose estimator and the localisers, as logged for replay.
+
+The chassis logs the inputs to every odometry update and every reset of the
+estimator, and each VisualLocaliser logs the targets of every frame it polls,
+flattened to arrays of doubles by these functions.
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from photonvision import PhotonTrackedTarget
+from wpimath.geometry import (
+    Pose2d,
+    Quaternion,
+    Rotation2d,
+    Rotation3d,
+    Transform3d,
+    Translation3d,
+)
+from wpimath.kinematics import SwerveModulePosition
+
+ModulePositions = tuple[
+    SwerveModulePosition,
+    SwerveModulePosition,
+    SwerveModulePosition,
+    SwerveModulePosition,
+]
+
+# Names of the logged entries
+ODOMETRY_INPUTS = "chassis/odometry_inputs"
+RESET_POSE = "chassis/reset_pose"
+ESTIMATED_POSE = "chassis/pose"
+VISION_FRAME_PREFIX = "vision_frame_"
+
+# Columns of each logged frame, followed by TARGET_COLUMNS for each target
+(
+    FRAME_TIMESTAMP,
+    TURRET_VELOCITY,
+    CAMERA_TO_ROBOT,
+) = range(3)
+FRAME_COLUMNS = CAMERA_TO_ROBOT + 7
+# Columns of each target in a frame; transforms are x, y, z, then a quaternion
+(
+    FIDUCIAL_ID,
+    YAW,
+    PITCH,
+    AREA,
+    SKEW,
+    AMBIGUITY,
+    BEST_CAMERA_TO_TARGET,
+) = range(7)
+ALT_CAMERA_TO_TARGET = BEST_CAMERA_TO_TARGET + 7
+TARGET_COLUMNS = ALT_CAMERA_TO_TARGET + 7
+
+
+def encode_transform(transform: Transform3d) -> tuple[float, ...]:
+    q = transform.rotation().getQuaternion()
+    return (transform.x, transform.y, transform.z, q.W(), q.X(), q.Y(), q.Z())
+
+
+def decode_transform(values: Sequence[float]) -> Transform3d:
+    x, y, z, w, qx, qy, qz = values
+    return Transform3d(Translation3d(x, y, z), Rotation3d(Quaternion(w, qx, qy, qz)))
+
+
+def encode_frame(
+    timestamp: float,
+    turret_velocity: float,
+    camera_to_robot: Transform3d,
+    targets: Sequence[PhotonTrackedTarget],
+) -> list[float]:
+    """Flatten a camera frame to log it."""
+    data = [timestamp, turret_velocity, *encode_transform(camera_to_robot)]
+    for target in targets:
+        data.extend(
+            (
+                target.getFiducialId(),
+                target.getYaw(),
+                target.getPitch(),
+                target.getArea(),
+                target.getSkew(),
+                target.getPoseAmbiguity(),
+                *encode_transform(target.getBestCameraToTarget()),
+                *encode_transform(target.getAlternateCameraToTarget()),
+            )
+        )
+    return data
+
+
+class LoggedFrame(NamedTuple):
+    # FPGA timestamp (s) the frame was captured at
+    timestamp: float
+    turret_velocity: float
+    camera_to_robot: Transform3d
+    targets: list[PhotonTrackedTarget]
+
+
+def decode_frame(data: Sequence[float]) -> LoggedFrame:
+    """Rebuild a camera frame logged by encode_frame."""
+    targets = []
+    for start in range(FRAME_COLUMNS, len(data), TARGET_COLUMNS):
+        row = data[start : start + TARGET_COLUMNS]
+        targets.append(
+            PhotonTrackedTarget(
+                row[YAW],
+                row[PITCH],
+                row[AREA],
+                row[SKEW],
+                int(row[FIDUCIAL_ID]),
+                decode_transform(row[BEST_CAMERA_TO_TARGET:ALT_CAMERA_TO_TARGET]),
+                decode_transform(row[ALT_CAMERA_TO_TARGET:TARGET_COLUMNS]),
+                row[AMBIGUITY],
+                [],
+                [],
+            )
+        )
+    return LoggedFrame(
+        data[FRAME_TIMESTAMP],
+        data[TURRET_VELOCITY],
+        decode_transform(data[CAMERA_TO_ROBOT:FRAME_COLUMNS]),
+        targets,
+    )
+
+
+def encode_odometry(
+    gyro_angle: Rotation2d, module_positions: Sequence[SwerveModulePosition]
+) -> list[float]:
+    """Flatten the inputs to an odometry update to log them."""
+    data = [gyro_angle.radians()]
+    for position in module_positions:
+        data.extend((position.distance, position.angle.radians()))
+    return data
+
+
+def encode_reset(
+    pose: Pose2d,
+    gyro_angle: Rotation2d,
+    module_positions: Sequence[SwerveModulePosition],
+) -> list[float]:
+    """Flatten a reset of the estimator to a pose to log it."""
+    return [
+        pose.x,
+        pose.y,
+        pose.rotation().radians(),
+        *encode_odometry(gyro_angle, module_positions),
+    ]
+
+
+def decode_reset(data: Sequence[float]) -> tuple[Pose2d, Rotation2d, ModulePositions]:
+    return Pose2d(data[0], data[1], data[2]), *decode_odometry(data[3:])
+
+
+def decode_odometry(data: Sequence[float]) -> tuple[Rotation2d, ModulePositions]:
+    fl, bl, br, fr = (
+        SwerveModulePosition(data[i], Rotation2d(data[i + 1])) for i in (1, 3, 5, 7)
+    )
+    return Rotation2d(data[0]), (fl, bl, br, fr)
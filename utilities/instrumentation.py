@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import collections
+from collections.abc import Iterable, Mapping, Sequence
+
+import numpy as np
+import wpiutil.log
+
+
+class RollingPercentiles:
+    """Percentiles of the most recent samples of a value."""
+
+    def __init__(self, window: int) -> None:
+        self.samples: collections.deque[float] = collections.deque(maxlen=window)
+
+    def add(self, sample: float) -> None:
+        self.samples.append(sample)
+
+    def percentiles(self, qs: Sequence[float]) -> list[float]:
+        if not self.samples:
+            return [0.0] * len(qs)
+        samples = np.fromiter(self.samples, dtype=np.float64)
+        return np.percentile(samples, qs).tolist()
+
+
+class StateTimer:
+    """
+    Records how long a state machine spends in each state, how long each
+    scoring cycle takes, and how long it spends blocked on each condition
+    it waits for during a cycle.
+
+    Everything is logged to the DataLog under the given name as it happens,
+    and rolling percentiles are kept for publishing on the dashboard.
+    """
+
+    def __init__(
+        self,
+        data_log: wpiutil.log.DataLog,
+        name: str,
+        states: Iterable[str],
+        conditions: Iterable[str],
+        cycle_start_state: str,
+        cycle_end_state: str,
+        window: int = 20,
+    ) -> None:
+        self.states = tuple(states)
+        self.conditions = tuple(conditions)
+        self.cycle_start_state = cycle_start_state
+        self.cycle_end_state = cycle_end_state
+
+        self.state_entry = wpiutil.log.StringLogEntry(data_log, f"{name}/state")
+        self.dwell_entries = {
+            state: wpiutil.log.DoubleLogEntry(data_log, f"{name}/dwell/{state}")
+            for state in self.states
+        }
+        self.blocked_entries = {
+            condition: wpiutil.log.DoubleLogEntry(
+                data_log, f"{name}/blocked/{condition}"
+            )
+            for condition in self.conditions
+        }
+        self.cycle_entry = wpiutil.log.DoubleLogEntry(data_log, f"{name}/cycle_time")
+
+        self.dwell_times = {state: RollingPercentiles(window) for state in self.states}
+        self.blocked_times = {
+            condition: RollingPercentiles(window) for condition in self.conditions
+        }
+        self.cycle_times = RollingPercentiles(window)
+
+        self.state = ""
+        self.entered_time = 0.0
+        self.cycle_start_time: float | None = None
+        self.cycle_blocked = dict.fromkeys(self.conditions, 0.0)
+
+    def update(self, state: str, now: float) -> None:
+        """Record the state the machine is in as of now."""
+        if state == self.state:
+            return
+
+        if self.state in self.dwell_entries:
+            dwell_time = now - self.entered_time
+            self.dwell_entries[self.state].append(dwell_time)
+            self.dwell_times[self.state].add(dwell_time)
+        if self.state == self.cycle_end_state and self.cycle_start_time is not None:
+            self._end_cycle(now)
+
+        self.state_entry.append(state)
+        self.state = state
+        self.entered_time = now
+        if state == self.cycle_start_state:
+            self.cycle_start_time = now
+            self.cycle_blocked = dict.fromkeys(self.conditions, 0.0)
+
+    def record_blocked(self, conditions: Mapping[str, bool], dt: float) -> None:
+        """Add dt seconds of waiting to each of the conditions which are False."""
+        for condition, ok in conditions.items():
+            if not ok:
+                self.cycle_blocked[condition] += dt
+
+    def _end_cycle(self, now: float) -> None:
+        assert self.cycle_start_time is not None
+        cycle_time = now - self.cycle_start_time
+        self.cycle_entry.append(cycle_time)
+        self.cycle_times.add(cycle_time)
+        for condition, blocked_time in self.cycle_blocked.items():
+            self.blocked_entries[condition].append(blocked_time)
+            self.blocked_times[condition].add(blocked_time)
+        self.cycle_start_time = None
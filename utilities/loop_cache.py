@@ -0,0 +1,98 @@
+"""
+Tracks iterations of the robot's main loop, so values can be cached for
+the length of a single iteration.
+
+Getters that read hardware can be wrapped with cached_per_loop, so they're
+only read once each loop however many times they're called. This goes
+under magicbot's @feedback decorator:
+
+    @feedback
+    @loop_cache.cached_per_loop
+    def get_angle(self) -> float:
+        loop_cache.count_reads()
+        return self.encoder.getPosition()
+"""
+from __future__ import annotations
+
+import functools
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Turn this off to read hardware every time a cached getter is called
+enabled = True
+
+_iteration = 0
+_iteration_timestamp = 0.0
+
+# Hardware reads in total, and in the last complete iteration
+_reads = 0
+_reads_at_start = 0
+_reads_last_iteration = 0
+
+
+def start_iteration(timestamp: float) -> None:
+    """Mark the start of a new iteration of the main loop, invalidating caches."""
+    global _iteration, _iteration_timestamp, _reads_at_start, _reads_last_iteration
+    _iteration += 1
+    _iteration_timestamp = timestamp
+    _reads_last_iteration = _reads - _reads_at_start
+    _reads_at_start = _reads
+
+
+def iteration() -> int:
+    """Get a counter that increases every iteration of the main loop."""
+    return _iteration
+
+
+def iteration_timestamp() -> float:
+    """Get the FPGA timestamp (s) at the start of the current loop iteration."""
+    return _iteration_timestamp
+
+
+def count_reads(reads: int = 1) -> None:
+    """Record that a getter read a value from hardware."""
+    global _reads
+    _reads += reads
+
+
+def reads_last_iteration() -> int:
+    """Get the number of hardware reads made during the last loop iteration."""
+    return _reads_last_iteration
+
+
+def cached_per_loop(method: Callable[[T], R]) -> Callable[[T], R]:
+    """
+    Cache the result of a method taking no arguments for the rest of the
+    current loop iteration, separately for each instance.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self: T) -> R:
+        if not enabled:
+            return method(self)
+        cache: dict[str, tuple[int, Any]] = self.__dict__.setdefault("_loop_cache", {})
+        cached = cache.get(name)
+        if cached is not None and cached[0] == _iteration:
+            return cached[1]
+        value = method(self)
+        cache[name] = (_iteration, value)
+        return value
+
+    return wrapper
+
+
+def invalidate(obj: object, name: str | None = None) -> None:
+    """
+    Forget an object's cached values, or just the named one, e.g. after
+    resetting the sensor they were read from.
+    """
+    cache = obj.__dict__.get("_loop_cache")
+    if cache is None:
+        return
+    if name is None:
+        cache.clear()
+    else:
+        cache.pop(name, None)
@@ -0,0 +1,135 @@
+"""
+Estimate the robot's pose from every AprilTag seen in a camera frame at once.
+
+Each tag's estimated pose relative to the camera places its corners around
+the robot. Where the tag is is measured much better than which way it
+faces, so rather than trusting each tag's orientation, the robot pose is
+found that best lines up the corners of every tag with where the field
+layout says they are. Tags far apart in the frame then pin down the
+robot's heading, which a single tag's orientation does poorly.
+"""
+from __future__ import annotations
+
+import functools
+import math
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+from photonvision import PhotonTrackedTarget
+from wpimath.geometry import Pose2d, Transform3d, Translation3d
+
+from utilities.game import apriltag_layout
+
+# Side length (m) of the black square of the 2023 tags
+TAG_SIZE = 0.1524
+
+# Corners of a tag in its own frame: x out of the tag face, y left, z up
+TAG_CORNERS = tuple(
+    Translation3d(0, y * TAG_SIZE / 2, z * TAG_SIZE / 2)
+    for y, z in ((-1, -1), (1, -1), (1, 1), (-1, 1))
+)
+
+
+class MultiTagEstimate(NamedTuple):
+    pose: Pose2d
+    tag_ids: list[int]
+    # Root mean square distance (m) between the aligned and the field corners
+    residual: float
+
+
+@functools.cache
+def get_field_corners(tag_id: int) -> npt.NDArray[np.float64] | None:
+    """The (4, 2) field positions of a tag's corners, or None if it doesn't exist."""
+    tag_pose = apriltag_layout.getTagPose(tag_id)
+    if tag_pose is None:
+        return None
+    corners = [
+        corner.rotateBy(tag_pose.rotation()) + tag_pose.translation()
+        for corner in TAG_CORNERS
+    ]
+    return np.array([(c.x, c.y) for c in corners])
+
+
+def get_robot_corners(
+    robot_to_camera: Transform3d, camera_to_target: Transform3d
+) -> npt.NDArray[np.float64]:
+    """The (4, 2) robot relative positions of a seen tag's corners."""
+    robot_to_target = robot_to_camera + camera_to_target
+    rotation = robot_to_target.rotation()
+    translation = robot_to_target.translation()
+    corners = [corner.rotateBy(rotation) + translation for corner in TAG_CORNERS]
+    return np.array([(c.x, c.y) for c in corners])
+
+
+def solve_rigid_2d(
+    points: npt.ArrayLike,
+    targets: npt.ArrayLike,
+    weights: npt.ArrayLike | None = None,
+) -> tuple[float, float, float]:
+    """
+    Find the rotation and translation that best maps points onto targets.
+
+    Args:
+        points, targets: (N, 2) arrays of corresponding points.
+        weights: how much each pair counts, all equally if None.
+
+    Returns:
+        (x, y, theta) of the transform, minimising the weighted sum of
+        squared distances between the transformed points and the targets.
+    """
+    p = np.asarray(points, dtype=np.float64)
+    q = np.asarray(targets, dtype=np.float64)
+    w = np.ones(len(p)) if weights is None else np.asarray(weights, dtype=np.float64)
+    w = w / w.sum()
+    p_centre = w @ p
+    q_centre = w @ q
+    p = p - p_centre
+    q = q - q_centre
+    # The rotation angle maximising sum(w q . R p) in closed form
+    dot = np.sum(w * (p[:, 0] * q[:, 0] + p[:, 1] * q[:, 1]))
+    cross = np.sum(w * (p[:, 0] * q[:, 1] - p[:, 1] * q[:, 0]))
+    theta = math.atan2(cross, dot)
+    c, s = math.cos(theta), math.sin(theta)
+    x = q_centre[0] - (c * p_centre[0] - s * p_centre[1])
+    y = q_centre[1] - (s * p_centre[0] + c * p_centre[1])
+    return x, y, theta
+
+
+def estimate_multi_tag_pose(
+    camera_to_robot: Transform3d, targets: Sequence[PhotonTrackedTarget]
+) -> MultiTagEstimate | None:
+    """
+    Estimate the robot's pose from the tags seen in one frame.
+
+    Returns None if fewer than two tags in the field layout are seen, as
+    the corners of a single tag don't constrain the heading well.
+    """
+    robot_to_camera = camera_to_robot.inverse()
+    robot_corners = []
+    field_corners = []
+    weights = []
+    tag_ids = []
+    for target in targets:
+        corners = get_field_corners(target.getFiducialId())
+        if corners is None:
+            continue
+        camera_to_target = target.getBestCameraToTarget()
+        robot_corners.append(get_robot_corners(robot_to_camera, camera_to_target))
+        field_corners.append(corners)
+        # Distant tags are measured less precisely
+        distance = camera_to_target.translation().norm()
+        weights.append(np.full(len(corners), 1 / max(distance, 0.5)))
+        tag_ids.append(target.getFiducialId())
+
+    if len(tag_ids) < 2:
+        return None
+
+    points = np.concatenate(robot_corners)
+    field_points = np.concatenate(field_corners)
+    x, y, theta = solve_rigid_2d(points, field_points, np.concatenate(weights))
+    c, s = math.cos(theta), math.sin(theta)
+    aligned = points @ np.array([[c, s], [-s, c]]) + (x, y)
+    residual = math.sqrt(np.mean(np.sum((aligned - field_points) ** 2, axis=1)))
+    return MultiTagEstimate(Pose2d(x, y, theta), tag_ids, residual)
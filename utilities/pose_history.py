@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import math
+import threading
+
+import numpy as np
+from wpimath.geometry import Pose2d
+from wpimath.kinematics import ChassisSpeeds
+
+from utilities.functions import constrain_angle
+
+# Columns of each sample
+X, Y, HEADING, TURRET_ANGLE, VX, VY, OMEGA = range(7)
+
+
+class PoseHistory:
+    """
+    A fixed length history of the robot's pose, turret angle and field
+    relative chassis speeds, which can be looked up at any FPGA timestamp.
+
+    Samples are written twice into arrays of twice the capacity, so the
+    most recent samples are always contiguous and sorted by time, and can
+    be binary searched without copying or allocating. It can be looked up
+    from other threads while the main loop adds to it.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity * 2)
+        self.samples = np.zeros((capacity * 2, 7))
+        self.start = 0
+        self.length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def clear(self) -> None:
+        with self.lock:
+            self.start = 0
+            self.length = 0
+
+    def add(
+        self,
+        timestamp: float,
+        pose: Pose2d,
+        turret_angle: float,
+        speeds: ChassisSpeeds,
+    ) -> None:
+        """Record the state at a timestamp later than any already recorded."""
+        sample = (
+            pose.x,
+            pose.y,
+            pose.rotation().radians(),
+            turret_angle,
+            speeds.vx,
+            speeds.vy,
+            speeds.omega,
+        )
+        with self.lock:
+            if (
+                self.length
+                and timestamp <= self.timestamps[self.start + self.length - 1]
+            ):
+                return
+            if self.length == self.capacity:
+                self.start = (self.start + 1) % self.capacity
+            else:
+                self.length += 1
+            idx = (self.start + self.length - 1) % self.capacity
+            for i in (idx, idx + self.capacity):
+                self.timestamps[i] = timestamp
+                self.samples[i] = sample
+
+    def _interpolate(self, timestamp: float) -> tuple[int, float] | None:
+        """
+        Find the sample before a timestamp, and how far it is towards the
+        next sample. Timestamps outside the history are clamped to it.
+        """
+        if not self.length:
+            return None
+        end = self.start + self.length
+        timestamps = self.timestamps[self.start : end]
+        idx = int(np.searchsorted(timestamps, timestamp, side="right")) - 1
+        if idx < 0:
+            return self.start, 0.0
+        if idx >= self.length - 1:
+            return end - 1, 0.0
+        t0 = timestamps[idx]
+        t1 = timestamps[idx + 1]
+        return self.start + idx, (timestamp - t0) / (t1 - t0)
+
+    def _value_at(self, idx: int, fraction: float, column: int) -> float:
+        value = self.samples[idx, column]
+        if fraction:
+            value += (self.samples[idx + 1, column] - value) * fraction
+        return float(value)
+
+    def pose_at(self, timestamp: float) -> Pose2d | None:
+        """Get the pose at an FPGA timestamp, or None if there's no history."""
+        with self.lock:
+            if (found := self._interpolate(timestamp)) is None:
+                return None
+            idx, fraction = found
+            heading = float(self.samples[idx, HEADING])
+            if fraction:
+                next_heading = float(self.samples[idx + 1, HEADING])
+                heading += constrain_angle(next_heading - heading) * fraction
+            x = self._value_at(idx, fraction, X)
+            y = self._value_at(idx, fraction, Y)
+        return Pose2d(x, y, heading)
+
+    def turret_angle_at(self, timestamp: float) -> float | None:
+        """Get the turret angle at an FPGA timestamp."""
+        with self.lock:
+            if (found := self._interpolate(timestamp)) is None:
+                return None
+            return self._value_at(*found, TURRET_ANGLE)
+
+    def turret_velocity_at(self, timestamp: float) -> float | None:
+        """
+        Get the turret's angular velocity at an FPGA timestamp, from the
+        change in its angle between the samples either side of it.
+        """
+        with self.lock:
+            if (found := self._interpolate(timestamp)) is None:
+                return None
+            if self.length == 1:
+                return 0.0
+            idx = min(found[0], self.start + self.length - 2)
+            change = (
+                self.samples[idx + 1, TURRET_ANGLE] - self.samples[idx, TURRET_ANGLE]
+            )
+            return float(change / (self.timestamps[idx + 1] - self.timestamps[idx]))
+
+    def speeds_at(self, timestamp: float) -> ChassisSpeeds | None:
+        """Get the field relative chassis speeds at an FPGA timestamp."""
+        with self.lock:
+            if (found := self._interpolate(timestamp)) is None:
+                return None
+            idx, fraction = found
+            vx = self._value_at(idx, fraction, VX)
+            vy = self._value_at(idx, fraction, VY)
+            omega = self._value_at(idx, fraction, OMEGA)
+        return ChassisSpeeds(vx, vy, omega)
+
+    def oldest_timestamp(self) -> float:
+        return float(self.timestamps[self.start]) if self.length else math.nan
+
+    def latest_timestamp(self) -> float:
+        if not self.length:
+            return math.nan
+        return float(self.timestamps[self.start + self.length - 1])
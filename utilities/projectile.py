@@ -0,0 +1,162 @@
+"""
+A point mass model of a cube launched from the shooter, with quadratic drag.
+
+This is used offline to generate dense ballistics tables; it is far too slow
+to run in the control loop.
+"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import numpy.typing as npt
+
+from components.turret import Turret
+
+GRAVITY = 9.81  # m/s^2
+AIR_DENSITY = 1.2  # kg/m^3
+
+CUBE_MASS = 0.08  # kg
+CUBE_SIDE = 0.24  # m
+CUBE_DRAG_COEFFICIENT = 1.05
+CUBE_DRAG_CONSTANT = (
+    0.5 * AIR_DENSITY * CUBE_DRAG_COEFFICIENT * CUBE_SIDE**2 / CUBE_MASS
+)  # 1/m
+
+FLYWHEEL_DIAMETER = 4 * 0.0254  # m
+# Fraction of the flywheel surface speed the cube leaves with.
+# The cube is squashed between the flywheels, so it slips a fair bit.
+# This and the drag coefficient are estimates that need calibrating
+# against real shots before generated tables replace the hand tuned ones.
+EXIT_SPEED_EFFICIENCY = 0.75
+# Height of the flywheels above the floor when the shooter is level
+LAUNCH_HEIGHT = Turret.TRANSLATION3D.z + 0.25  # m
+# Free speed of a NEO, in rev/s
+MAX_FLYWHEEL_SPEED = 5676 / 60
+
+
+def exit_speed(
+    top_flywheel_speed: float,
+    bottom_flywheel_speed: float,
+    efficiency: float = EXIT_SPEED_EFFICIENCY,
+) -> float:
+    """Speed of the cube (m/s) leaving flywheels spinning at the given rev/s."""
+    mean_speed = (top_flywheel_speed + bottom_flywheel_speed) / 2
+    return mean_speed * math.pi * FLYWHEEL_DIAMETER * efficiency
+
+
+def flywheel_speed_for_exit_speed(
+    speed: float, efficiency: float = EXIT_SPEED_EFFICIENCY
+) -> float:
+    """Mean flywheel speed (rev/s) needed to launch the cube at a speed (m/s)."""
+    return speed / (math.pi * FLYWHEEL_DIAMETER * efficiency)
+
+
+def launch_elevation(tilt_angle: float) -> float:
+    """
+    Convert a tilt angle into the elevation of the launch above horizontal.
+
+    Tilt is 0 pointing straight up and tips over towards either side,
+    so flipped shots with a negative tilt have the same elevation.
+    """
+    return math.pi / 2 - abs(tilt_angle)
+
+
+def simulate(
+    exit_speeds: npt.ArrayLike,
+    elevation: float,
+    dt: float = 0.002,
+    max_time: float = 2.0,
+    drag_constant: float = CUBE_DRAG_CONSTANT,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Integrate the flight of cubes launched at several speeds at once.
+
+    Returns the time of each step, and the horizontal distance and height
+    of every cube at each step, as (steps,) and (steps, speeds) arrays.
+    """
+    speeds = np.atleast_1d(np.asarray(exit_speeds, dtype=np.float64))
+    steps = int(max_time / dt) + 1
+    xs = np.empty((steps, len(speeds)))
+    zs = np.empty((steps, len(speeds)))
+
+    x = np.zeros_like(speeds)
+    z = np.full_like(speeds, LAUNCH_HEIGHT)
+    vx = speeds * math.cos(elevation)
+    vz = speeds * math.sin(elevation)
+    xs[0] = x
+    zs[0] = z
+    for i in range(1, steps):
+        # Semi-implicit Euler is plenty at this step size
+        drag = drag_constant * np.hypot(vx, vz)
+        vx = vx - drag * vx * dt
+        vz = vz - (GRAVITY + drag * vz) * dt
+        x = x + vx * dt
+        z = z + vz * dt
+        xs[i] = x
+        zs[i] = z
+    return np.arange(steps) * dt, xs, zs
+
+
+def crossing_at_range(
+    times: npt.NDArray[np.float64],
+    xs: npt.NDArray[np.float64],
+    zs: npt.NDArray[np.float64],
+    target_range: float,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Find the height and time at which each simulated cube reaches a range.
+
+    Cubes that hit the floor or run out of time first get a NaN height and time.
+    """
+    cols = np.arange(xs.shape[1])
+    reached = xs >= target_range
+    # Horizontal distance only ever increases, so the first step past the
+    # range is where the cube crosses it
+    idx = np.argmax(reached, axis=0)
+    below = zs < 0
+    landed = np.where(below.any(axis=0), np.argmax(below, axis=0), len(times))
+    valid = reached[idx, cols] & (idx > 0) & (idx < landed)
+
+    idx = np.maximum(idx, 1)
+    x0, x1 = xs[idx - 1, cols], xs[idx, cols]
+    frac = (target_range - x0) / np.where(x1 > x0, x1 - x0, 1.0)
+    heights = zs[idx - 1, cols] + frac * (zs[idx, cols] - zs[idx - 1, cols])
+    flight_times = times[idx - 1] + frac * (times[idx] - times[idx - 1])
+    heights[~valid] = np.nan
+    flight_times[~valid] = np.nan
+    return heights, flight_times
+
+
+def solve_exit_speed(
+    target_range: float,
+    target_height: float,
+    elevation: float,
+    max_speed: float,
+    speed_steps: int = 200,
+    drag_constant: float = CUBE_DRAG_CONSTANT,
+) -> tuple[float, float] | None:
+    """
+    Find the slowest launch that passes through a point.
+
+    Returns the exit speed and time of flight, or None if no launch speed
+    up to max_speed gets there.
+    """
+    speeds = np.linspace(0.5, max_speed, speed_steps)
+    heights, flight_times = crossing_at_range(
+        *simulate(speeds, elevation, drag_constant=drag_constant), target_range
+    )
+    error = heights - target_height
+    # Cubes fly higher at a given range the faster they go,
+    # so take the first speed that gets above the target
+    above = np.flatnonzero(error >= 0)
+    if len(above) == 0:
+        return None
+    hi = above[0]
+    if hi == 0 or np.isnan(error[hi - 1]):
+        return float(speeds[hi]), float(flight_times[hi])
+    lo = hi - 1
+    frac = -error[lo] / (error[hi] - error[lo])
+    speed = speeds[lo] + frac * (speeds[hi] - speeds[lo])
+    flight_time = flight_times[lo] + frac * (flight_times[hi] - flight_times[lo])
+    return float(speed), float(flight_time)
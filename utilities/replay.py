@@ -0,0 +1,256 @@
+"""
+Replay the odometry and camera frames logged by the robot through the pose
+estimator and vision filtering, faster than real time.
+
+Replaying the inputs logged by the chassis and the localisers (see
+utilities.input_log) with changed filtering shows how the changes would have
+done in a real match. Run with `python -m tools.replay <log>`.
+"""
+from __future__ import annotations
+
+import math
+import pathlib
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import numpy.typing as npt
+import wpilib
+from magicbot.magic_tunable import setup_tunables
+from wpimath.geometry import Pose2d, Rotation2d, Rotation3d, Translation3d
+from wpimath.kinematics import ChassisSpeeds, SwerveModulePosition
+
+from components.chassis import Chassis
+from components.vision import VisualLocaliser
+from utilities import wpilog
+from utilities.input_log import (
+    ESTIMATED_POSE,
+    ODOMETRY_INPUTS,
+    RESET_POSE,
+    VISION_FRAME_PREFIX,
+    ModulePositions,
+    decode_frame,
+    decode_odometry,
+    decode_reset,
+)
+from utilities.pose_history import PoseHistory
+from utilities.telemetry import FieldPublisher
+
+
+class ReplayTurret:
+    """Stands in for the turret, as far as the localisers use it."""
+
+    def __init__(self) -> None:
+        self.velocity = 0.0
+
+    def get_angle(self) -> float:
+        return 0.0
+
+    def get_velocity(self) -> float:
+        return self.velocity
+
+
+class ReplayChassis:
+    """Stands in for the chassis, as far as the localisers use it."""
+
+    def __init__(self, history_capacity: int = 500) -> None:
+        # The latest inputs, to reset the estimator with
+        self.gyro_angle = Rotation2d()
+        self.module_positions: ModulePositions = (SwerveModulePosition(),) * 4
+        # The estimator keeps a reference to the kinematics
+        self.kinematics = Chassis.create_kinematics()
+        self.estimator = Chassis.create_estimator(
+            self.kinematics, self.gyro_angle, self.module_positions, Pose2d()
+        )
+        self.pose_history = PoseHistory(history_capacity)
+        self.vision_measurements = 0
+
+    def reset(
+        self, pose: Pose2d, gyro_angle: Rotation2d, module_positions: ModulePositions
+    ) -> None:
+        self.gyro_angle = gyro_angle
+        self.module_positions = module_positions
+        self.estimator.resetPosition(gyro_angle, module_positions, pose)
+        self.pose_history.clear()
+
+    def set_pose(self, pose: Pose2d) -> None:
+        self.reset(pose, self.gyro_angle, self.module_positions)
+
+    def update(
+        self,
+        timestamp: float,
+        gyro_angle: Rotation2d,
+        module_positions: ModulePositions,
+    ) -> Pose2d:
+        self.gyro_angle = gyro_angle
+        self.module_positions = module_positions
+        pose = self.estimator.updateWithTime(timestamp, gyro_angle, module_positions)
+        self.pose_history.add(timestamp, pose, 0.0, ChassisSpeeds())
+        return pose
+
+    def get_pose(self) -> Pose2d:
+        return self.estimator.getEstimatedPosition()
+
+    def get_pose_at(self, timestamp: float) -> Pose2d:
+        pose = self.pose_history.pose_at(timestamp)
+        return self.get_pose() if pose is None else pose
+
+    def add_vision_measurement(
+        self, pose: Pose2d, timestamp: float, std_devs: tuple[float, float, float]
+    ) -> None:
+        self.estimator.addVisionMeasurement(pose, timestamp, std_devs)
+        self.vision_measurements += 1
+
+
+@dataclass
+class ReplayResult:
+    # FPGA timestamps (s) and poses (x, y, heading) after each odometry update
+    timestamps: npt.NDArray[np.float64]
+    poses: npt.NDArray[np.float64]
+    # Time (s) spent estimating and filtering each frame
+    frame_times: npt.NDArray[np.float64]
+    vision_measurements: int
+    # Time (s) the whole replay took, and the time the log covers
+    wall_time: float
+    log_duration: float
+    # Distance (m) and heading difference (rad) from the reference poses
+    translation_errors: npt.NDArray[np.float64] = field(
+        default_factory=lambda: np.zeros(0)
+    )
+    heading_errors: npt.NDArray[np.float64] = field(default_factory=lambda: np.zeros(0))
+
+    def report(self) -> str:
+        lines = [
+            f"replayed {self.log_duration:.1f} s of log in {self.wall_time:.2f} s"
+            f" ({self.log_duration / max(self.wall_time, 1e-9):.0f}x real time)",
+            f"{len(self.frame_times)} frames,"
+            f" {self.vision_measurements} vision measurements added",
+        ]
+        if len(self.frame_times):
+            us = self.frame_times * 1e6
+            lines.append(
+                f"per frame: mean {us.mean():.0f} us,"
+                f" 95th percentile {np.percentile(us, 95):.0f} us,"
+                f" max {us.max():.0f} us"
+            )
+        if len(self.translation_errors):
+            lines.append(
+                f"pose error: RMS {rms(self.translation_errors):.3f} m,"
+                f" max {self.translation_errors.max():.3f} m,"
+                f" heading RMS {rms(self.heading_errors):.3f} rad"
+            )
+        return "\n".join(lines)
+
+
+def rms(values: npt.NDArray[np.float64]) -> float:
+    return math.sqrt(float(np.mean(np.square(values))))
+
+
+def replay(
+    filename: str | pathlib.Path,
+    reference: str = ESTIMATED_POSE,
+    use_vision: bool = True,
+    use_multi_tag: bool = True,
+) -> ReplayResult:
+    """
+    Replay a log through a fresh estimator and a VisualLocaliser for every
+    camera in it, in the order things happened on the robot.
+
+    Args:
+        reference: the entry of (x, y, heading) poses to measure the replayed
+            poses against, by default those the robot estimated itself.
+        use_vision: add the cameras' measurements to the estimator.
+        use_multi_tag: combine every tag in a frame into one measurement.
+    """
+    records = sorted(
+        (
+            record
+            for record in wpilog.read_records(filename)
+            if record.name in (ODOMETRY_INPUTS, RESET_POSE, reference)
+            or record.name.startswith(VISION_FRAME_PREFIX)
+        ),
+        key=lambda record: record.timestamp,
+    )
+
+    chassis = ReplayChassis()
+    turret = ReplayTurret()
+    field_publisher = FieldPublisher(wpilib.Field2d())
+    localisers: dict[str, VisualLocaliser] = {}
+    timestamps = []
+    poses = []
+    frame_times = []
+    reference_timestamps = []
+    reference_poses = []
+
+    start = time.perf_counter()
+    for record in records:
+        timestamp = record.timestamp * 1e-6
+        if record.name == reference:
+            reference_timestamps.append(timestamp)
+            reference_poses.append(record.get_double_array()[:3])
+        elif record.name == ODOMETRY_INPUTS:
+            pose = chassis.update(
+                timestamp, *decode_odometry(record.get_double_array().tolist())
+            )
+            timestamps.append(timestamp)
+            poses.append((pose.x, pose.y, pose.rotation().radians()))
+        elif record.name == RESET_POSE:
+            chassis.reset(*decode_reset(record.get_double_array().tolist()))
+        else:
+            name = record.name.removeprefix(VISION_FRAME_PREFIX)
+            if (localiser := localisers.get(name)) is None:
+                localiser = localisers[name] = VisualLocaliser(
+                    name,
+                    Translation3d(),
+                    Rotation3d(),
+                    field_publisher,
+                    chassis,  # type: ignore[arg-type]
+                    turret,  # type: ignore[arg-type]
+                )
+                setup_tunables(localiser, f"replay/{name}")
+                localiser.add_to_estimator = use_vision
+                localiser.use_multi_tag = use_multi_tag
+            logged = decode_frame(record.get_double_array().tolist())
+            turret.velocity = logged.turret_velocity
+            frame_start = time.perf_counter()
+            frame = localiser.estimate_frame(
+                logged.timestamp, logged.camera_to_robot, logged.targets
+            )
+            localiser.process_frame(frame)
+            frame_times.append(time.perf_counter() - frame_start)
+    wall_time = time.perf_counter() - start
+
+    result = ReplayResult(
+        np.array(timestamps),
+        np.array(poses).reshape(-1, 3),
+        np.array(frame_times),
+        chassis.vision_measurements,
+        wall_time,
+        (records[-1].timestamp - records[0].timestamp) * 1e-6 if records else 0.0,
+    )
+    if reference_timestamps and timestamps:
+        result.translation_errors, result.heading_errors = compare_poses(
+            result.timestamps,
+            result.poses,
+            np.array(reference_timestamps),
+            np.array(reference_poses),
+        )
+    return result
+
+
+def compare_poses(
+    timestamps: npt.NDArray[np.float64],
+    poses: npt.NDArray[np.float64],
+    reference_timestamps: npt.NDArray[np.float64],
+    reference_poses: npt.NDArray[np.float64],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    The distances and heading differences between reference poses and the
+    poses interpolated at their timestamps.
+    """
+    x = np.interp(reference_timestamps, timestamps, poses[:, 0])
+    y = np.interp(reference_timestamps, timestamps, poses[:, 1])
+    heading = np.interp(reference_timestamps, timestamps, np.unwrap(poses[:, 2]))
+    translation_errors = np.hypot(x - reference_poses[:, 0], y - reference_poses[:, 1])
+    heading_errors = np.angle(np.exp(1j * (heading - reference_poses[:, 2])))
+    return translation_errors, heading_errors
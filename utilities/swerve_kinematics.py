@@ -0,0 +1,146 @@
+"""
+Swerve kinematics on NumPy arrays, for all modules at once.
+
+This follows wpimath's SwerveDrive4Kinematics and the chassis' module
+state handling, without building a wpimath object per module per loop.
+Every function also accepts a leading batch dimension, so offline tools
+can evaluate many chassis speed commands in one call.
+
+Module velocities are handled as complex numbers, vx + vy * 1j, which keeps
+the number of NumPy calls (and so the overhead for just four modules) down.
+"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import numpy.typing as npt
+
+FloatArray = npt.NDArray[np.float64]
+ComplexArray = npt.NDArray[np.complex128]
+
+
+def wrap_angles(angles: npt.ArrayLike) -> FloatArray:
+    """Wrap angles to the interval [-pi, pi]."""
+    angles = np.asarray(angles, dtype=np.float64)
+    return np.arctan2(np.sin(angles), np.cos(angles))
+
+
+def vector_angles(velocities: ComplexArray) -> FloatArray:
+    """Angles of velocities, taking tiny ones to be at 0 like Rotation2d does."""
+    return np.where(np.abs(velocities) > 1e-6, np.angle(velocities), 0.0)
+
+
+class SwerveKinematics:
+    """
+    Converts between chassis speeds and module states for any number of
+    modules, given their positions relative to the centre of the robot.
+
+    Chassis speeds are (vx, vy, omega) on the last axis, and module states
+    are a pair of arrays of module speeds and angles, with modules on the
+    last axis.
+    """
+
+    def __init__(self, translations: npt.ArrayLike) -> None:
+        self.translations = np.asarray(translations, dtype=np.float64)
+        x, y = self.translations.T
+        modules = len(self.translations)
+        # Maps chassis speeds to the velocity of each module
+        self.inverse = np.empty((3, modules), dtype=np.complex128)
+        self.inverse[0] = 1
+        self.inverse[1] = 1j
+        self.inverse[2] = -y + x * 1j
+        real_inverse = np.zeros((modules, 2, 3))
+        real_inverse[:, 0, 0] = 1
+        real_inverse[:, 0, 2] = -y
+        real_inverse[:, 1, 1] = 1
+        real_inverse[:, 1, 2] = x
+        self.forward = np.linalg.pinv(real_inverse.reshape(modules * 2, 3))
+        # Angles to leave the modules at when asked to stop
+        self.headings = np.zeros(modules)
+
+    def module_velocities(self, speeds: npt.ArrayLike) -> ComplexArray:
+        """Velocity of each module for chassis speeds, as vx + vy * 1j."""
+        return np.asarray(speeds, dtype=np.float64) @ self.inverse
+
+    def to_module_states(self, speeds: npt.ArrayLike) -> tuple[FloatArray, FloatArray]:
+        """
+        Get the module speeds and angles for chassis speeds.
+
+        Like wpimath, modules keep the angle they were last given when the
+        chassis speeds are all zero. Only unbatched calls update that angle.
+        """
+        speeds = np.asarray(speeds, dtype=np.float64)
+        velocities = self.module_velocities(speeds)
+        angles = vector_angles(velocities)
+
+        stopped = ~speeds.any(axis=-1)
+        if speeds.ndim == 1:
+            if stopped:
+                angles = self.headings
+            else:
+                self.headings = angles
+        elif stopped.any():
+            angles[stopped] = self.headings
+        return np.abs(velocities), angles
+
+    def to_chassis_speeds(
+        self, module_speeds: npt.ArrayLike, angles: npt.ArrayLike
+    ) -> FloatArray:
+        """Get the least squares chassis speeds for module states."""
+        velocities = np.multiply(module_speeds, np.exp(np.multiply(1j, angles)))
+        flat = velocities.view(np.float64)
+        return flat @ self.forward.T
+
+
+def desaturate(module_speeds: npt.ArrayLike, max_speed: float) -> FloatArray:
+    """Scale module speeds down together so none is faster than max_speed."""
+    module_speeds = np.asarray(module_speeds, dtype=np.float64)
+    peak = np.abs(module_speeds).max(axis=-1, keepdims=True)
+    return module_speeds * (max_speed / np.maximum(peak, max_speed))
+
+
+def rate_limit(
+    current_speeds: npt.ArrayLike,
+    current_angles: npt.ArrayLike,
+    target_speeds: npt.ArrayLike,
+    target_angles: npt.ArrayLike,
+    limit: npt.ArrayLike,
+    dt: float = 0.02,
+) -> tuple[FloatArray, FloatArray]:
+    """
+    Limit the change in each module's velocity vector to limit * dt,
+    as rate_limit_module does for a single module. The limit can be
+    given for each module.
+    """
+    current_angles = np.asarray(current_angles, dtype=np.float64)
+    current = np.multiply(current_speeds, np.exp(1j * current_angles))
+    error = np.multiply(target_speeds, np.exp(np.multiply(1j, target_angles)))
+    error -= current
+
+    max_change = np.multiply(limit, dt)
+    velocities = current + error * (max_change / np.maximum(np.abs(error), max_change))
+
+    new_speeds = np.abs(velocities)
+    new_angles = np.where(
+        new_speeds == 0, wrap_angles(current_angles), vector_angles(velocities)
+    )
+    return new_speeds, new_angles
+
+
+def optimize(
+    module_speeds: npt.ArrayLike,
+    angles: npt.ArrayLike,
+    current_angles: npt.ArrayLike,
+) -> tuple[FloatArray, FloatArray]:
+    """
+    Reverse modules that would otherwise turn more than 90 degrees,
+    as SwerveModuleState.optimize does for a single module.
+    """
+    module_speeds = np.asarray(module_speeds, dtype=np.float64)
+    angles = np.asarray(angles, dtype=np.float64)
+    flip = np.cos(angles - current_angles) < 0
+    return (
+        np.where(flip, -module_speeds, module_speeds),
+        np.where(flip, angles - np.copysign(math.pi, angles), angles),
+    )
@@ -0,0 +1,234 @@
+"""
+System identification of the robot's mechanisms.
+
+A SysIdRoutine drives a mechanism with quasistatic voltage ramps and
+dynamic voltage steps, logging the voltage applied and the position and
+velocity measured to the DataLog from a background thread, faster than the
+main loop runs. fit_feedforward then fits the feedforward gains to the
+logged samples by least squares; `python -m tools.fit_sysid` does this
+for a log pulled off the robot.
+"""
+from __future__ import annotations
+
+import enum
+import math
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+import wpiutil.log
+
+from utilities import wpilog
+
+QUASISTATIC_RAMP_RATE = 0.25  # V/s
+DYNAMIC_STEP_VOLTAGE = 7.0  # V
+SAMPLE_RATE = 200.0  # Hz
+
+
+class SysIdTest(enum.Enum):
+    QUASISTATIC_FORWARD = "quasistatic-forward"
+    QUASISTATIC_REVERSE = "quasistatic-reverse"
+    DYNAMIC_FORWARD = "dynamic-forward"
+    DYNAMIC_REVERSE = "dynamic-reverse"
+
+    def voltage(self, t: float) -> float:
+        """The voltage to apply t seconds into the test."""
+        if self in (SysIdTest.QUASISTATIC_FORWARD, SysIdTest.QUASISTATIC_REVERSE):
+            voltage = QUASISTATIC_RAMP_RATE * t
+        else:
+            voltage = DYNAMIC_STEP_VOLTAGE
+        if self in (SysIdTest.QUASISTATIC_REVERSE, SysIdTest.DYNAMIC_REVERSE):
+            return -voltage
+        return voltage
+
+
+@dataclass
+class Mechanism:
+    """How to drive a mechanism and measure its motion."""
+
+    set_voltage: Callable[[float], None]
+    get_position: Callable[[], float]
+    get_velocity: Callable[[], float] | None = None
+    # Stop a test before the mechanism moves outside these positions
+    min_position: float = -math.inf
+    max_position: float = math.inf
+    # Fit a gravity term proportional to the cosine of the position
+    is_arm: bool = False
+
+
+class SysIdRoutine:
+    """
+    Runs characterisation tests on a mechanism from a background thread.
+
+    Each sample is logged to "sysid/<name>/samples" as
+    [test time, voltage, position, velocity], with velocity NaN if the
+    mechanism can't measure it, and the name of the test running is logged
+    to "sysid/<name>/test" as it starts and stops. Whether the mechanism
+    is an arm is logged to "sysid/<name>/is_arm".
+    """
+
+    def __init__(
+        self,
+        data_log: wpiutil.log.DataLog,
+        name: str,
+        mechanism: Mechanism,
+        rate: float = SAMPLE_RATE,
+    ) -> None:
+        self.name = name
+        self.mechanism = mechanism
+        self.period = 1 / rate
+        self.samples_entry = wpiutil.log.DoubleArrayLogEntry(
+            data_log, f"sysid/{name}/samples"
+        )
+        self.test_entry = wpiutil.log.StringLogEntry(data_log, f"sysid/{name}/test")
+        wpiutil.log.BooleanLogEntry(data_log, f"sysid/{name}/is_arm").append(
+            mechanism.is_arm
+        )
+
+        self.test: SysIdTest | None = None
+        self.thread: threading.Thread | None = None
+        self.stop_event = threading.Event()
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, test: SysIdTest) -> None:
+        """Start a test, stopping any test already running."""
+        self.stop()
+        self.test = test
+        self.stop_event.clear()
+        self.test_entry.append(test.value)
+        self.thread = threading.Thread(
+            target=self._run, args=(test,), name=f"sysid_{self.name}", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+            self.test_entry.append("")
+        self.test = None
+        self.mechanism.set_voltage(0.0)
+
+    def sample(self, test: SysIdTest, t: float) -> bool:
+        """
+        Apply the voltage for a time into a test and log a sample.
+        Returns False once the mechanism is out of bounds.
+        """
+        mechanism = self.mechanism
+        position = mechanism.get_position()
+        if not mechanism.min_position <= position <= mechanism.max_position:
+            mechanism.set_voltage(0.0)
+            return False
+        if mechanism.get_velocity is None:
+            velocity = math.nan
+        else:
+            velocity = mechanism.get_velocity()
+        voltage = test.voltage(t)
+        mechanism.set_voltage(voltage)
+        self.samples_entry.append([t, voltage, position, velocity])
+        return True
+
+    def _run(self, test: SysIdTest) -> None:
+        start = time.monotonic()
+        next_time = start
+        while not self.stop_event.is_set():
+            if not self.sample(test, time.monotonic() - start):
+                break
+            next_time += self.period
+            self.stop_event.wait(max(next_time - time.monotonic(), 0.0))
+        self.mechanism.set_voltage(0.0)
+
+
+@dataclass
+class FeedforwardGains:
+    kS: float
+    kV: float
+    kA: float
+    kG: float
+    # Coefficient of determination of the fit
+    r_squared: float
+    samples: int
+
+
+def fit_feedforward(
+    runs: list[npt.NDArray[np.float64]],
+    is_arm: bool = False,
+    min_velocity: float = 1e-3,
+) -> FeedforwardGains:
+    """
+    Fit V = kS sgn(v) + kV v + kA a (+ kG cos(x) for an arm) by least squares.
+
+    Args:
+        runs: an (N, 4) array of [time, voltage, position, velocity] for each
+            test run. Velocity is taken from the change in position if it's
+            NaN. Acceleration is taken from the change in velocity.
+        min_velocity: samples slower than this are ignored, as static
+            friction holds the mechanism still rather than resisting motion.
+    """
+    rows = []
+    voltages = []
+    for run in runs:
+        run = np.asarray(run, dtype=np.float64)
+        if len(run) < 3:
+            continue
+        t, voltage, position, velocity = run.T
+        if np.isnan(velocity).any():
+            velocity = np.gradient(position, t)
+        acceleration = np.gradient(velocity, t)
+        moving = np.abs(velocity) > min_velocity
+        columns = [np.sign(velocity), velocity, acceleration]
+        if is_arm:
+            columns.append(np.cos(position))
+        rows.append(np.column_stack(columns)[moving])
+        voltages.append(voltage[moving])
+
+    if not rows or sum(len(v) for v in voltages) < 4:
+        raise ValueError("not enough samples of the mechanism moving to fit")
+    a = np.concatenate(rows)
+    b = np.concatenate(voltages)
+    gains, *_ = np.linalg.lstsq(a, b, rcond=None)
+    residuals = b - a @ gains
+    variance = np.sum((b - b.mean()) ** 2)
+    r_squared = 1 - np.sum(residuals**2) / variance if variance else 1.0
+    kS, kV, kA = gains[:3].tolist()
+    kG = float(gains[3]) if is_arm else 0.0
+    return FeedforwardGains(kS, kV, kA, kG, float(r_squared), len(b))
+
+
+@dataclass
+class MechanismLog:
+    # An (N, 4) array of [time, voltage, position, velocity] for each test run
+    runs: list[npt.NDArray[np.float64]]
+    is_arm: bool = False
+
+
+def read_sysid_log(filename: str) -> dict[str, MechanismLog]:
+    """Read every test run of every mechanism from a DataLog file."""
+    runs: dict[str, list[list[npt.NDArray[np.float64]]]] = {}
+    arms: set[str] = set()
+    for record in wpilog.read_records(filename):
+        if not record.name.startswith("sysid/"):
+            continue
+        mechanism, _, kind = record.name.removeprefix("sysid/").rpartition("/")
+        mechanism_runs = runs.setdefault(mechanism, [[]])
+        if kind == "test":
+            # Each test starts a new run
+            if record.get_string():
+                mechanism_runs.append([])
+        elif kind == "samples":
+            mechanism_runs[-1].append(record.get_double_array())
+        elif kind == "is_arm" and record.get_boolean():
+            arms.add(mechanism)
+    return {
+        mechanism: MechanismLog(
+            [np.array(run).reshape(-1, 4) for run in mechanism_runs if run],
+            mechanism in arms,
+        )
+        for mechanism, mechanism_runs in runs.items()
+    }
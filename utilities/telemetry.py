@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+import ntcore
+import wpilib
+from wpimath.geometry import Pose2d
+
+
+class FieldPublisher:
+    """
+    Publishes poses to the objects on a Field2d.
+
+    Poses are buffered as they're set, and only sent at most every period,
+    and only if they've moved by more than the tolerances since they were
+    last sent. This can also be done from a background thread.
+    """
+
+    def __init__(
+        self,
+        field: wpilib.Field2d,
+        period: float = 0.1,
+        translation_tolerance: float = 0.01,
+        rotation_tolerance: float = math.radians(0.5),
+    ) -> None:
+        self.field = field
+        # Time (s) between publishing
+        self.period = period
+        self.translation_tolerance = translation_tolerance
+        self.rotation_tolerance = rotation_tolerance
+
+        self.objects: dict[str, wpilib.FieldObject2d] = {}
+        # Poses are only unpacked when it's time to publish them
+        self.pending: dict[str, Pose2d | tuple[float, float, float]] = {}
+        # Held to set a pending pose or swap out the pending poses
+        self.pending_lock = threading.Lock()
+        self.published: dict[str, tuple[float, float, float]] = {}
+        self.last_publish_time = -math.inf
+
+        self.thread: threading.Thread | None = None
+        self.stop_event = threading.Event()
+
+        # Time (s) taken by the most recent publish, and the number of poses
+        # sent to NetworkTables by it
+        self.publish_duration = 0.0
+        self.publish_count = 0
+        table = ntcore.NetworkTableInstance.getDefault().getTable("telemetry")
+        self.duration_publisher = table.getDoubleTopic(
+            "field_publish_duration"
+        ).publish()
+        self.count_publisher = table.getIntegerTopic("field_publish_count").publish()
+
+    def set_pose(self, name: str, pose: Pose2d) -> None:
+        """Set the pose of a Field2d object, "Robot" being the robot itself."""
+        with self.pending_lock:
+            self.pending[name] = pose
+
+    def set_pose_xy(self, name: str, x: float, y: float, heading: float) -> None:
+        """Set the pose of a Field2d object without building a Pose2d."""
+        with self.pending_lock:
+            self.pending[name] = (x, y, heading)
+
+    def is_changed(self, name: str, pose: tuple[float, float, float]) -> bool:
+        if (published := self.published.get(name)) is None:
+            return True
+        x, y, heading = pose
+        last_x, last_y, last_heading = published
+        turn = math.remainder(heading - last_heading, math.tau)
+        return (
+            math.hypot(x - last_x, y - last_y) > self.translation_tolerance
+            or abs(turn) > self.rotation_tolerance
+        )
+
+    def publish(self, now: float, force: bool = False) -> int:
+        """
+        Send changed poses to NetworkTables if a period has passed since we
+        last did. Returns the number of poses sent.
+        """
+        if not force and now - self.last_publish_time < self.period:
+            return 0
+        self.last_publish_time = now
+        start = time.perf_counter()
+
+        # Swap rather than copy and clear, so poses set from another thread
+        # while we publish are kept for next time
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        count = 0
+        for name, value in pending.items():
+            if isinstance(value, Pose2d):
+                pose = (value.x, value.y, value.rotation().radians())
+            else:
+                pose = value
+            if not self.is_changed(name, pose):
+                continue
+            if (obj := self.objects.get(name)) is None:
+                obj = self.objects[name] = self.field.getObject(name)
+            obj.setPose(Pose2d(*pose))
+            self.published[name] = pose
+            count += 1
+
+        self.publish_duration = time.perf_counter() - start
+        self.publish_count = count
+        self.duration_publisher.set(self.publish_duration)
+        self.count_publisher.set(count)
+        return count
+
+    def start_thread(self) -> None:
+        """Publish from a background thread every period."""
+        self.stop_thread()
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run_thread, name="field_publisher", daemon=True
+        )
+        self.thread.start()
+
+    def stop_thread(self) -> None:
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def _run_thread(self) -> None:
+        while not self.stop_event.wait(self.period):
+            self.publish(time.monotonic(), force=True)
@@ -0,0 +1,128 @@
+"""
+Adapt the swerve modules' acceleration limits to the traction available.
+
+Each loop the robot's velocity is predicted from the IMU's acceleration,
+and corrected towards what the wheels measure: all of them while none are
+slipping, otherwise the median, so a bump that throws the prediction off
+doesn't leave every module looking like it's slipping. A module whose measured velocity differs from the velocity the
+robot's motion gives it at its position is slipping, and has its
+acceleration limit cut. A module accelerating close to its limit without
+slipping has its limit raised, and any other gripping module has its limit
+raised back to where it started.
+"""
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+
+from utilities.swerve_kinematics import ComplexArray, FloatArray
+
+GRAVITY = 9.81  # m/s^2
+
+
+class TractionController:
+    def __init__(
+        self,
+        translations: npt.ArrayLike,
+        initial_limit: float = 15.0,
+        min_limit: float = 6.0,
+        max_limit: float = 25.0,
+        slip_speed: float = 0.25,
+        decrease_factor: float = 0.7,
+        recovery_rate: float = 40.0,
+        recovery_fraction: float = 0.8,
+        correction_time: float = 0.3,
+    ) -> None:
+        """
+        Args:
+            translations: (N, 2) positions of the modules relative to the
+                centre of the robot.
+            initial_limit, min_limit, max_limit: module acceleration limits (m/s^2).
+            slip_speed: difference (m/s) between a module's measured and
+                predicted velocity at which it's taken to be slipping.
+            decrease_factor: the limit of a slipping module is multiplied by this.
+            recovery_rate: rate (m/s^2 per s) the limit of a gripping module grows.
+            recovery_fraction: how close to its limit a module must be
+                accelerating for its limit to grow.
+            correction_time: time constant (s) of correcting the predicted
+                velocity towards the wheels' measurement.
+        """
+        positions = np.asarray(translations, dtype=np.float64)
+        self.positions: ComplexArray = positions[:, 0] + positions[:, 1] * 1j
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.slip_speed = slip_speed
+        self.decrease_factor = decrease_factor
+        self.recovery_rate = recovery_rate
+        self.recovery_fraction = recovery_fraction
+        self.correction_time = correction_time
+        self.reset()
+
+    def reset(self, velocity: complex = 0j) -> None:
+        """Forget what we've learnt, e.g. when the robot is enabled."""
+        self.limits: FloatArray = np.full(len(self.positions), self.initial_limit)
+        self.slipping = np.zeros(len(self.positions), dtype=bool)
+        self.module_velocities: ComplexArray | None = None
+        # Robot relative velocity (m/s) of the centre of the robot, as vx + vy * 1j
+        self.velocity = velocity
+
+    def update(
+        self,
+        module_velocities: npt.ArrayLike,
+        acceleration: complex,
+        omega: float,
+        dt: float,
+    ) -> FloatArray:
+        """
+        Update the acceleration limits from one loop's measurements.
+
+        Args:
+            module_velocities: robot relative velocity of each module
+                measured by its encoders, as vx + vy * 1j.
+            acceleration: robot relative acceleration measured by the IMU (m/s^2).
+            omega: angular velocity (rad/s) of the robot, from the IMU.
+            dt: time (s) since the last update.
+
+        Returns:
+            The acceleration limit (m/s^2) of each module.
+        """
+        # Copied, as they're kept until the next update
+        measured = np.array(module_velocities, dtype=np.complex128)
+        # The velocity rotates backwards in the robot's frame as it turns
+        self.velocity = self.velocity * complex(np.exp(-1j * omega * dt))
+        self.velocity += acceleration * dt
+
+        predicted = self.velocity + 1j * omega * self.positions
+        self.slipping = np.abs(measured - predicted) > self.slip_speed
+        # Wheels don't drift, so trust them while they grip. While some slip,
+        # trust the median, which a minority of slipping wheels can't move.
+        wheel_velocities = measured - 1j * omega * self.positions
+        if self.slipping.any():
+            wheel_velocity = complex(
+                np.median(wheel_velocities.real), np.median(wheel_velocities.imag)
+            )
+        else:
+            wheel_velocity = complex(wheel_velocities.mean())
+        self.velocity += (wheel_velocity - self.velocity) * min(
+            dt / self.correction_time, 1.0
+        )
+
+        if self.module_velocities is None:
+            accelerating = np.zeros(len(measured), dtype=bool)
+        else:
+            module_accelerations = np.abs(measured - self.module_velocities) / dt
+            accelerating = module_accelerations > self.limits * self.recovery_fraction
+        self.module_velocities = measured
+
+        raised = self.limits + self.recovery_rate * dt
+        self.limits = np.where(
+            self.slipping,
+            np.maximum(self.limits * self.decrease_factor, self.min_limit),
+            np.where(
+                accelerating,
+                np.minimum(raised, self.max_limit),
+                np.maximum(np.minimum(raised, self.initial_limit), self.limits),
+            ),
+        )
+        return self.limits
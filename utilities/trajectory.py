@@ -0,0 +1,213 @@
+"""
+Time parameterised trajectories for the holonomic drivetrain.
+
+Trajectories are generated offline by `python -m tools.generate_trajectories`
+from the paths defined there, and stored as fixed rate samples in an
+uncompressed .npz, which the robot memory maps the first time it asks for
+one. Nothing is generated on the robot.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import math
+import pathlib
+import zipfile
+from collections.abc import Sequence
+
+import numpy as np
+import numpy.typing as npt
+from wpimath.geometry import Pose2d
+from wpimath.trajectory import (
+    TrajectoryConfig,
+    TrajectoryGenerator,
+    TrapezoidProfileRadians,
+)
+
+from utilities.ballistics import memmap_npz
+from utilities.functions import constrain_angle
+from utilities.game import FIELD_LENGTH
+from utilities.swerve_kinematics import wrap_angles
+
+logger = logging.getLogger(__name__)
+
+# Generated by `python -m tools.generate_trajectories`.
+# Bump the version whenever the layout of the file changes.
+TRAJECTORIES_PATH = pathlib.Path(__file__).with_name("trajectories.npz")
+TRAJECTORIES_VERSION = 1
+
+# Time (s) between samples of a generated trajectory
+SAMPLE_PERIOD = 0.02
+
+# Columns of each sample, all field relative
+X, Y, HEADING, VX, VY, OMEGA = range(6)
+
+
+class Trajectory:
+    """
+    A field relative path for a holonomic robot, with the robot's heading
+    and velocity at every point, sampled at a fixed period.
+
+    Trajectories are written for the blue alliance; use mirrored() to get
+    the red alliance's equivalent.
+    """
+
+    def __init__(self, samples: npt.ArrayLike, period: float = SAMPLE_PERIOD) -> None:
+        """
+        Args:
+            samples: an (N, 6) array of x, y, heading, vx, vy, omega, the
+                first at time 0 and each following period seconds later.
+        """
+        self.samples = np.asarray(samples)
+        if self.samples.ndim != 2 or self.samples.shape[1] != 6:
+            raise ValueError(f"expected (N, 6) samples, got {self.samples.shape}")
+        if not len(self.samples):
+            raise ValueError("a trajectory needs at least one sample")
+        self.period = period
+
+    @property
+    def duration(self) -> float:
+        return (len(self.samples) - 1) * self.period
+
+    def sample(self, t: float) -> tuple[float, float, float, float, float, float]:
+        """
+        Get the x, y, heading, vx, vy and omega at a time (s) since the start,
+        interpolating between samples. Beyond the end, the robot is at rest
+        at the final pose.
+        """
+        if t >= self.duration:
+            x, y, heading = self.samples[-1, :3].tolist()
+            return x, y, heading, 0.0, 0.0, 0.0
+        position = max(t, 0.0) / self.period
+        idx = int(position)
+        fraction = position - idx
+        before: list[float] = self.samples[idx].tolist()
+        after: list[float] = self.samples[idx + 1].tolist()
+        x, y, heading, vx, vy, omega = (
+            value + (next_value - value) * fraction
+            for value, next_value in zip(before, after)
+        )
+        heading = (
+            before[HEADING]
+            + constrain_angle(after[HEADING] - before[HEADING]) * fraction
+        )
+        return x, y, heading, vx, vy, omega
+
+    def initial_pose(self) -> Pose2d:
+        x, y, heading = self.samples[0, :3].tolist()
+        return Pose2d(x, y, heading)
+
+    def final_pose(self) -> Pose2d:
+        x, y, heading = self.samples[-1, :3].tolist()
+        return Pose2d(x, y, heading)
+
+    def mirrored(self) -> Trajectory:
+        """Mirror the trajectory onto the other alliance's half of the field."""
+        samples = np.array(self.samples, dtype=np.float64)
+        samples[:, X] = FIELD_LENGTH - samples[:, X]
+        samples[:, HEADING] = wrap_angles(math.pi - samples[:, HEADING])
+        samples[:, VX] *= -1
+        samples[:, OMEGA] *= -1
+        return Trajectory(samples, self.period)
+
+    def shifted_to(self, pose: Pose2d) -> Trajectory:
+        """
+        Move the trajectory, without rotating its path, so it starts at a pose.
+        Headings along it are offset by the change to the initial heading.
+        """
+        samples = np.array(self.samples, dtype=np.float64)
+        start = samples[0]
+        samples[:, X] += pose.x - start[X]
+        samples[:, Y] += pose.y - start[Y]
+        samples[:, HEADING] = wrap_angles(
+            samples[:, HEADING] + pose.rotation().radians() - start[HEADING]
+        )
+        return Trajectory(samples, self.period)
+
+
+def generate_trajectory(
+    waypoints: Sequence[Pose2d],
+    start_heading: float,
+    end_heading: float,
+    max_speed: float,
+    max_acceleration: float,
+    max_angular_speed: float,
+    max_angular_acceleration: float,
+    period: float = SAMPLE_PERIOD,
+) -> Trajectory:
+    """
+    Generate a trajectory through waypoints, whose rotations are the
+    direction of travel rather than the robot's heading.
+
+    The heading follows a trapezoidal profile from start_heading to
+    end_heading, starting with the path. The robot waits at the end of the
+    path for the heading profile to finish if it's the longer of the two.
+    """
+    config = TrajectoryConfig(max_speed, max_acceleration)
+    path = TrajectoryGenerator.generateTrajectory(list(waypoints), config)
+    heading_profile = TrapezoidProfileRadians(
+        TrapezoidProfileRadians.Constraints(
+            max_angular_speed, max_angular_acceleration
+        ),
+        TrapezoidProfileRadians.State(
+            start_heading + constrain_angle(end_heading - start_heading), 0
+        ),
+        TrapezoidProfileRadians.State(start_heading, 0),
+    )
+    duration = max(path.totalTime(), heading_profile.totalTime())
+
+    samples = np.empty((math.ceil(duration / period - 1e-9) + 1, 6))
+    for i, sample in enumerate(samples):
+        t = min(i * period, duration)
+        state = path.sample(t)
+        heading = heading_profile.calculate(t)
+        direction = state.pose.rotation()
+        sample[:] = (
+            state.pose.x,
+            state.pose.y,
+            constrain_angle(heading.position),
+            state.velocity * direction.cos(),
+            state.velocity * direction.sin(),
+            heading.velocity,
+        )
+    return Trajectory(samples, period)
+
+
+@functools.cache
+def load_trajectories(
+    path: pathlib.Path = TRAJECTORIES_PATH,
+) -> dict[str, Trajectory]:
+    """
+    Load every generated trajectory, memory mapped from disk. This only reads
+    the file the first time it's called.
+
+    Returns no trajectories if the file doesn't exist or can't be used.
+    """
+    if not path.exists():
+        logger.error("no trajectories at %s", path)
+        return {}
+    try:
+        arrays = memmap_npz(path)
+        version = int(arrays.pop("version"))
+        if version != TRAJECTORIES_VERSION:
+            logger.error(
+                "ignoring %s: version %d, expected %d",
+                path,
+                version,
+                TRAJECTORIES_VERSION,
+            )
+            return {}
+        period = float(arrays.pop("period"))
+        return {name: Trajectory(samples, period) for name, samples in arrays.items()}
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        logger.exception("could not load trajectories from %s", path)
+        return {}
+
+
+def get_trajectory(name: str, red: bool = False) -> Trajectory | None:
+    """Get a generated trajectory for an alliance, or None if it's missing."""
+    trajectory = load_trajectories().get(name)
+    if trajectory is None:
+        logger.error("no trajectory named %s", name)
+        return None
+    return trajectory.mirrored() if red else trajectory
@@ -0,0 +1,181 @@
+"""
+How uncertain a pose measured from an AprilTag is.
+
+A tag's pose is measured worse the further away it is, the more ambiguous
+its two candidate poses are, the more obliquely it's seen, the smaller it
+appears, and the faster the turret carrying the camera is turning. The
+standard deviation of a measurement is modelled as a weighted sum of these
+features, with weights that can be fitted to logged measurements with
+`python -m tools.fit_vision_uncertainty`.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from utilities import wpilog
+from utilities.game import apriltag_layout
+
+FEATURES = (
+    "constant",
+    "range_squared",
+    "ambiguity",
+    "skew",
+    "inverse_area",
+    "turret_rate",
+)
+
+# Columns of each logged target, as appended by VisualLocaliser.log_target
+(
+    BEST_X,
+    BEST_Y,
+    BEST_HEADING,
+    BEST_TRANSLATION_ERROR,
+    BEST_HEADING_ERROR,
+    ALT_X,
+    ALT_Y,
+    ALT_HEADING,
+    ALT_TRANSLATION_ERROR,
+    ALT_HEADING_ERROR,
+    TRUE_X,
+    TRUE_Y,
+    YAW,
+    SKEW,
+    AMBIGUITY,
+    AREA,
+    TAG_ID,
+    RANGE,
+    TURRET_RATE,
+) = range(19)
+# Targets logged before range and turret rate were added have fewer columns
+OLD_LOG_COLUMNS = 17
+
+
+def get_features(
+    range: float, ambiguity: float, skew: float, area: float, turret_rate: float
+) -> npt.NDArray[np.float64]:
+    """
+    Args:
+        range: distance (m) from the camera to the tag.
+        ambiguity: the ratio of reprojection errors of the tag's two poses.
+        skew: angle (rad) of the camera from straight out of the tag.
+        area: percentage of the image the tag covers.
+        turret_rate: angular velocity (rad/s) of the turret.
+    """
+    return np.array(
+        [
+            1.0,
+            range**2,
+            ambiguity,
+            abs(skew),
+            1 / max(area, 0.01),
+            abs(turret_rate),
+        ]
+    )
+
+
+@dataclass
+class UncertaintyModel:
+    # Weights of FEATURES in the standard deviation of the translation (m)
+    translation: tuple[float, ...] = (0.1, 0.04, 2.0, 0.2, 0.0, 0.2)
+    # Weights of FEATURES in the standard deviation of the heading (rad),
+    # which the gyro measures much better than a single tag does
+    heading: tuple[float, ...] = (0.3, 0.05, 4.0, 0.3, 0.0, 0.5)
+    # Standard deviations are kept within these bounds
+    min_translation: float = 0.05
+    max_translation: float = 5.0
+    min_heading: float = 0.02
+    max_heading: float = math.pi
+
+    def std_devs(
+        self, features: npt.NDArray[np.float64], tags: int = 1
+    ) -> tuple[float, float, float]:
+        """
+        Standard deviations (x, y, heading) of a measurement with these
+        features. A measurement combining several tags has its uncertainty
+        divided by the square root of the number of tags, as if they
+        were independent measurements.
+        """
+        scale = 1 / math.sqrt(tags)
+        translation = float(np.dot(self.translation, features)) * scale
+        translation = min(max(translation, self.min_translation), self.max_translation)
+        heading = float(np.dot(self.heading, features)) * scale
+        heading = min(max(heading, self.min_heading), self.max_heading)
+        return translation, translation, heading
+
+
+def _fit_nonnegative(
+    a: npt.NDArray[np.float64], b: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Least squares with every weight at least zero, dropping negative ones."""
+    active = np.ones(a.shape[1], dtype=bool)
+    weights = np.zeros(a.shape[1])
+    while active.any():
+        solution, *_ = np.linalg.lstsq(a[:, active], b, rcond=None)
+        if (solution >= 0).all():
+            weights[active] = solution
+            break
+        # Drop the most negative weight and fit again without it
+        indices = np.flatnonzero(active)
+        active[indices[np.argmin(solution)]] = False
+    return weights
+
+
+def fit_uncertainty_model(
+    features: npt.ArrayLike,
+    translation_errors: npt.ArrayLike,
+    heading_errors: npt.ArrayLike,
+) -> UncertaintyModel:
+    """
+    Fit the feature weights to the errors of measurements.
+
+    Args:
+        features: (N, len(FEATURES)) features of each measurement.
+        translation_errors: distance (m) of each measurement from the truth.
+        heading_errors: error (rad) of each measurement's heading.
+    """
+    a = np.asarray(features, dtype=np.float64)
+    # The distance of a 2D normal error with standard deviation s on each
+    # axis has mean s * sqrt(pi / 2); one dimension has mean s * sqrt(2 / pi)
+    translation = np.abs(translation_errors) / math.sqrt(math.pi / 2)
+    heading = np.abs(heading_errors) / math.sqrt(2 / math.pi)
+    return UncertaintyModel(
+        tuple(_fit_nonnegative(a, translation).tolist()),
+        tuple(_fit_nonnegative(a, heading).tolist()),
+    )
+
+
+def read_vision_log(filename: str) -> npt.NDArray[np.float64]:
+    """
+    Read every logged target from the "vision_pose_*" entries of a DataLog
+    file, as a (N, 19) array. Range is worked out from the true pose and
+    turret rate taken as zero for targets logged without them.
+    """
+    rows = []
+    for record in wpilog.read_records(filename):
+        if not record.name.startswith("vision_pose_"):
+            continue
+        row = record.get_double_array()
+        if len(row) == OLD_LOG_COLUMNS:
+            tag_pose = apriltag_layout.getTagPose(int(row[TAG_ID]))
+            if tag_pose is None:
+                continue
+            tag_range = math.hypot(row[TRUE_X] - tag_pose.x, row[TRUE_Y] - tag_pose.y)
+            row = np.append(row, (tag_range, 0.0))
+        rows.append(row[: TURRET_RATE + 1])
+    return np.array(rows, dtype=np.float64).reshape(-1, TURRET_RATE + 1)
+
+
+def get_log_features(rows: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """The features of each logged target read by read_vision_log."""
+    return np.array(
+        [
+            get_features(
+                row[RANGE], row[AMBIGUITY], row[SKEW], row[AREA], row[TURRET_RATE]
+            )
+            for row in rows
+        ]
+    ).reshape(-1, len(FEATURES))
@@ -0,0 +1,92 @@
+"""
+Read the records of a WPILib DataLog (.wpilog) file.
+
+This parses the file format directly rather than using
+wpiutil.log.DataLogReader, whose iterator runs past the end of the file,
+and stops cleanly at a record cut short by the robot losing power.
+"""
+from __future__ import annotations
+
+import pathlib
+import struct
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+HEADER = b"WPILOG"
+
+# Types of control record, in the first byte of their payload
+CONTROL_START = 0
+CONTROL_FINISH = 1
+CONTROL_SET_METADATA = 2
+
+
+class Record(NamedTuple):
+    name: str
+    # The entry's type string, e.g. "double[]"
+    type: str
+    # Microseconds since the FPGA started
+    timestamp: int
+    data: bytes
+
+    def get_double(self) -> float:
+        return struct.unpack("<d", self.data)[0]
+
+    def get_double_array(self) -> npt.NDArray[np.float64]:
+        return np.frombuffer(self.data, dtype="<f8").astype(np.float64)
+
+    def get_boolean(self) -> bool:
+        return self.data != b"\x00"
+
+    def get_integer(self) -> int:
+        return struct.unpack("<q", self.data)[0]
+
+    def get_string(self) -> str:
+        return self.data.decode()
+
+
+def _read_string(data: bytes, offset: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    return data[offset : offset + length].decode(), offset + length
+
+
+def read_records(filename: str | pathlib.Path) -> Iterator[Record]:
+    """Read the data records of a log, in the order they were written."""
+    data = pathlib.Path(filename).read_bytes()
+    if not data.startswith(HEADER) or len(data) < 12:
+        raise ValueError(f"{filename} is not a WPILib data log")
+    (extra_header_length,) = struct.unpack_from("<I", data, 8)
+    offset = 12 + extra_header_length
+
+    entries: dict[int, tuple[str, str]] = {}
+    while offset < len(data):
+        header = data[offset]
+        id_length = (header & 0x3) + 1
+        size_length = ((header >> 2) & 0x3) + 1
+        timestamp_length = ((header >> 4) & 0x7) + 1
+        start = offset + 1 + id_length + size_length + timestamp_length
+        if start > len(data):
+            return
+        fields = data[offset + 1 : start]
+        entry = int.from_bytes(fields[:id_length], "little")
+        size = int.from_bytes(fields[id_length : id_length + size_length], "little")
+        timestamp = int.from_bytes(fields[id_length + size_length :], "little")
+        payload = data[start : start + size]
+        if len(payload) < size:
+            return
+        offset = start + size
+
+        if entry != 0:
+            if (found := entries.get(entry)) is not None:
+                yield Record(found[0], found[1], timestamp, payload)
+        elif payload and payload[0] == CONTROL_START:
+            (started,) = struct.unpack_from("<I", payload, 1)
+            name, position = _read_string(payload, 5)
+            entry_type, _ = _read_string(payload, position)
+            entries[started] = (name, entry_type)
+        elif payload and payload[0] == CONTROL_FINISH:
+            (finished,) = struct.unpack_from("<I", payload, 1)
+            entries.pop(finished, None)